@@ -7,11 +7,15 @@ import networkx as nx
 from PIL import Image
 import math
 import json
+import hashlib
 import plotly.graph_objs as go
 import plotly.utils as pu
 from joblib import Parallel, delayed
 import igraph as ig
 import numpy as np
+import scipy.sparse as sp_sp
+from scipy.sparse import csgraph
+from scipy.sparse import linalg as sp_linalg
 import util
 
 
@@ -22,9 +26,29 @@ ANALYTICS_TABS = [
     "Shortest Path",
     "Eigenvector",
     "Mod-based Communities",
-    "Clustering Coefficient"
+    "Clustering Coefficient",
+    "PageRank",
+    "Katz"
 ]
 
+BFS_BATCH = 64  # sources of one multi-source BFS
+BFS_DEEP_LEVELS = 100  # blocks with a deeper BFS from a probe node are searched one source at a time (scipy)
+CLOSENESS_POOL_MIN_NODES = 20000  # smaller graphs run in process, starting the workers would dominate
+CLOSENESS_SAMPLE_MIN_NODES = 50000  # bigger graphs get sampled closeness
+CLOSENESS_PIVOTS = 512  # BFS sources per component of sampled closeness
+CLOSENESS_CONFIDENCE = 0.95  # probability that all sampled values are within the reported error
+N_JOBS = -1  # workers of the process pool, -1 = one per cpu
+CENTRALITY_TOLERANCE = 1e-10  # residual (eigenvector) or change (pagerank, katz) per unit norm to stop at
+CENTRALITY_MAX_ITERATIONS = 1000
+PAGERANK_DAMPING = 0.85
+KATZ_FACTOR = 0.85  # katz alpha relative to 1 / largest adjacency eigenvalue
+COMMUNITY_METHODS = ["leiden", "louvain"]
+COMMUNITY_RESOLUTION = 1.0  # modularity resolution, larger values give more and smaller communities
+LEIDEN_ITERATIONS = 2  # leiden passes, iterating until stable costs ~20x on big graphs for <0.02 modularity
+TRIANGLE_CHUNK = 20000000  # max. entries of the sparse products of one row chunk of triangle counting
+SHORTEST_PATH_CAP = 10000  # shortest paths the forward / backward buttons cycle through
+SHORTEST_PATH_DAGS = 4  # BFS predecessor DAGs (one per source node) kept in session_data
+
 
 
 
@@ -214,20 +238,189 @@ def update_network_colors(node_colors, link_colors=None):
         # return {"textures_created": False}
 
 
-def analytics_closeness(graph):
-    def _compute_closeness_igraph(graph):
-        g = ig.Graph.Adjacency((graph > 0).tolist(), mode="DIRECTED")
-        closeness_seq = g.closeness(mode="out")
-        closeness_seq = np.where(np.isnan(closeness_seq), 0, closeness_seq)  # Replace NaN values with 0
-        return closeness_seq
+def graph_adjacency(graph=None) -> sp_sp.csr_matrix:
+    """
+    returns the symmetric, unweighted adjacency matrix of a networkx graph as scipy CSR matrix without self loops,
+    row i is the i-th node of graph.nodes(), the dense matrix is never built
+    graph None: the cached matrix of the active project (util.graph_csr), row i is node id i
+    """
+    if graph is None:
+        return util.graph_csr()
+    adjacency = sp_sp.csr_matrix(nx.to_scipy_sparse_array(graph, nodelist=list(graph.nodes()), weight=None, format="csr"), dtype=np.float64)
+    adjacency = adjacency + adjacency.T
+    adjacency.setdiag(0)
+    adjacency.eliminate_zeros()
+    adjacency.data[:] = 1.0
+    return adjacency
+
+
+def node_order_rows(ordered_graph) -> np.ndarray:
+    # rows of graph_adjacency(ordered_graph) of the nodes in node_order, one dict lookup per node
+    row = {node: i for i, node in enumerate(ordered_graph.nodes())}
+    return np.fromiter((row[node] for node in ordered_graph.node_order), dtype=np.int64, count=len(ordered_graph.node_order))
 
-    if len(graph.nodes()) <= 10000 or len(graph.edges()) <= 80000:
-        closeness_seq = [nx.closeness_centrality(graph, node) for node in graph.nodes()]
-    else:
-        adjacency_matrix = nx.to_numpy_array(graph)
-        closeness_seq = _compute_closeness_igraph(adjacency_matrix)
-        closeness_seq = list(closeness_seq)  # Convert numpy array to list
-    return closeness_seq
+
+def multi_source_bfs(adjacency, sources, deep=False) -> tuple:
+    """
+    breadth first search from a batch of sources at once: the frontiers of all sources are the columns of one
+    boolean block, every level is one sparse product restricted to the rows of the current frontier
+    adjacency: scipy CSR, symmetric adjacency matrix
+    sources: int array of node ids
+    deep: bool, search one source at a time (scipy), for long chains where the levels would dominate
+    returns (sums, reached, eccentricity, column_sums): per source the sum of distances to and the count of the
+    reachable nodes (source excluded) and the largest distance, per node the sum of its distances to all sources
+    """
+    sources = np.asarray(sources, dtype=np.int64)
+    if deep:
+        distances = csgraph.shortest_path(adjacency, directed=False, unweighted=True, indices=sources)
+        reachable = np.isfinite(distances)
+        distances[~reachable] = 0
+        return distances.sum(axis=1), reachable.sum(axis=1) - 1, distances.max(axis=1).astype(np.int64), distances.sum(axis=0)
+
+    columns = np.arange(len(sources))
+    visited = np.zeros((adjacency.shape[0], len(sources)), dtype=bool)
+    visited[sources, columns] = True
+    active, position = np.unique(sources, return_inverse=True)
+    frontier = np.zeros((len(active), len(sources)), dtype=bool)
+    frontier[position, columns] = True
+    sums = np.zeros(len(sources))
+    reached = np.zeros(len(sources), dtype=np.int64)
+    eccentricity = np.zeros(len(sources), dtype=np.int64)
+    column_sums = np.zeros(adjacency.shape[0])
+    level = 0
+    while len(active) > 0:
+        level += 1
+        # links of the frontier rows only, columns renumbered to the touched nodes
+        rows = adjacency[active]
+        touched, inverse = np.unique(rows.indices, return_inverse=True)
+        step = sp_sp.csr_matrix(
+            (np.ones(len(rows.indices), dtype=np.float32), inverse.ravel(), rows.indptr), shape=(len(active), len(touched))
+        )
+        found = (step.T @ frontier.astype(np.float32)) > 0
+        found &= ~visited[touched]
+        keep = found.any(axis=1)
+        active, frontier = touched[keep], found[keep]
+        visited[active] |= frontier
+        counts = frontier.sum(axis=0)
+        sums += level * counts
+        reached += counts
+        eccentricity[counts > 0] = level
+        column_sums[active] += level * frontier.sum(axis=1)
+    return sums, reached, eccentricity, column_sums
+
+
+def is_deep(adjacency, node) -> bool:
+    # the eccentricity of any node is at least half the diameter
+    distances = csgraph.shortest_path(adjacency, directed=False, unweighted=True, indices=[node])
+    return distances[np.isfinite(distances)].max() > BFS_DEEP_LEVELS
+
+
+def closeness_task(adjacency, sources, deep) -> tuple:
+    # runs in a worker, one BFS batch inside a component block
+    return multi_source_bfs(adjacency, sources, deep)
+
+
+def analytics_closeness(graph, pivots=CLOSENESS_PIVOTS, n_jobs=None):
+    """
+    closeness centrality of every node in graph.nodes() order, as networkx (wf_improved):
+    C(u) = (r - 1) / (n - 1) * (r - 1) / sum of distances from u, r = size of the component of u
+
+    Components are searched with batched multi-source BFS, each batch on the block of its component, in a
+    process pool for big graphs. Above CLOSENESS_SAMPLE_MIN_NODES nodes, components with more than pivots nodes
+    are sampled (Eppstein and Wang, "Fast approximation of centrality", 2001): the distance sum of a node is
+    size / k times its distance sum to k random pivots. By Hoeffding (d in [0, diameter], diameter <= 2 ecc(pivot))
+    the average distance of every node is then within
+        error = diameter * sqrt(ln(2 size / delta) / (2 k))
+    with probability 1 - delta = CLOSENESS_CONFIDENCE. The bound is stored in session_data["analyticsCloseness"]:
+    {"exact": bool, "pivots": int, "confidence": float, "distanceError": float, "relativeError": float or None}
+    """
+    adjacency = graph_adjacency(graph)
+    n = adjacency.shape[0]
+    closeness_seq = np.zeros(n)
+    stats = {"exact": True, "pivots": 0, "confidence": 1.0, "distanceError": 0.0, "relativeError": 0.0}
+    if n < 2:
+        GD.session_data["analyticsCloseness"] = stats
+        return list(closeness_seq)
+
+    count, labels = csgraph.connected_components(adjacency, directed=False)
+    sizes = np.bincount(labels, minlength=count)
+    order = np.argsort(labels, kind="stable")
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    rank = np.empty(n, dtype=np.int64)
+    rank[order] = np.arange(n)
+    permuted = adjacency[order][:, order].tocsr()
+    sampled = sizes > pivots if n > CLOSENESS_SAMPLE_MIN_NODES else np.zeros(count, dtype=bool)
+    rng = np.random.default_rng(0)
+
+    # tasks (block start, block, local sources, deep), exact components batched in order of their nodes so that
+    # a batch only spans the components of its sources, big components get their own block
+    tasks = []
+    span = None
+    exact_nodes = np.flatnonzero(~sampled[labels[order]])
+    for batch in range(0, len(exact_nodes), BFS_BATCH):
+        nodes = exact_nodes[batch : batch + BFS_BATCH]
+        low = starts[labels[order[nodes[0]]]]
+        high = starts[labels[order[nodes[-1]]]] + sizes[labels[order[nodes[-1]]]]
+        if span != (low, high):
+            span = (low, high)
+            block = permuted[low:high, low:high]
+            deep = high - low > BFS_DEEP_LEVELS and is_deep(block, nodes[0] - low)
+        tasks.append((low, block, nodes - low, deep))
+    for component in np.flatnonzero(sampled):
+        low, high = starts[component], starts[component] + sizes[component]
+        block = permuted[low:high, low:high]
+        chosen = np.sort(rng.choice(high - low, size=pivots, replace=False))
+        deep = is_deep(block, chosen[0])
+        for batch in range(0, pivots, BFS_BATCH):
+            tasks.append((low, block, chosen[batch : batch + BFS_BATCH], deep))
+
+    if n_jobs is None:
+        n_jobs = N_JOBS if n >= CLOSENESS_POOL_MIN_NODES and len(tasks) > 1 else 1
+    results = Parallel(n_jobs=n_jobs, prefer="processes")(
+        delayed(closeness_task)(block, sources, deep) for low, block, sources, deep in tasks
+    )
+
+    # exact distance sums of all sources, sampled sums of the nodes of sampled components
+    distance_sums = np.zeros(n)
+    known = np.zeros(n, dtype=bool)
+    pivot_sums = np.zeros(n)
+    pivot_eccentricity = np.full(count, np.inf)
+    for (low, block, sources, deep), (sums, reached, eccentricity, column_sums) in zip(tasks, results):
+        distance_sums[low + sources] = sums
+        known[low + sources] = True
+        component = labels[order[low]]
+        if sampled[component]:
+            pivot_sums[low : low + block.shape[0]] += column_sums
+            pivot_eccentricity[component] = min(pivot_eccentricity[component], eccentricity.min())
+    estimate = ~known & sampled[labels[order]]
+    distance_sums[estimate] = pivot_sums[estimate] * sizes[labels[order]][estimate] / pivots
+
+    component_size = sizes[labels[order]]
+    linked = distance_sums > 0
+    reachable = component_size - 1
+    permuted_closeness = np.zeros(n)
+    permuted_closeness[linked] = reachable[linked] / (n - 1) * reachable[linked] / distance_sums[linked]
+    closeness_seq = permuted_closeness[rank]
+
+    if sampled.any():
+        delta = 1 - CLOSENESS_CONFIDENCE
+        distance_error, relative_error = 0.0, 0.0
+        for component in np.flatnonzero(sampled):
+            low, high = starts[component], starts[component] + sizes[component]
+            diameter = 2 * pivot_eccentricity[component]
+            error = diameter * np.sqrt(np.log(2 * sizes[component] / delta) / (2 * pivots))
+            smallest_average = distance_sums[low:high].min() / (sizes[component] - 1)
+            distance_error = max(distance_error, error)
+            relative_error = max(relative_error, error / (smallest_average - error) if smallest_average > error else np.inf)
+        stats = {
+            "exact": False,
+            "pivots": int(pivots),
+            "confidence": CLOSENESS_CONFIDENCE,
+            "distanceError": float(distance_error),
+            "relativeError": float(relative_error) if np.isfinite(relative_error) else None,
+        }
+    GD.session_data["analyticsCloseness"] = stats
+    return list(closeness_seq)
 
 
 def analytics_color_continuous(assignment_arr, highlight):
@@ -274,39 +467,151 @@ def analytics_color_continuous(assignment_arr, highlight):
         return {"textures_created": False}
     
 
-def analytics_shortest_path(graph, node_1, node_2):
+def shortest_path_graph(graph=None) -> dict:
+    """
+    adjacency and node names of a graph for the shortest path search, cached in session_data["shortestPathGraph"]
+    graph None: the active project, row i is node id i, names are str(i)
+    returns: {"graph": graph, "key": fingerprint, "adjacency": CSR, "names": list or None, "rows": dict or None}
+    """
+    cached = GD.session_data.get("shortestPathGraph")
+    if cached is not None and cached["graph"] is graph:
+        return cached
+    adjacency = graph_adjacency(graph)
+    if graph is None:
+        entry = {"graph": None, "key": util.graph_fingerprint(), "adjacency": adjacency, "names": None, "rows": None}
+    else:
+        names = [str(node) for node in graph.nodes()]
+        rows = {name: i for i, name in enumerate(names)}
+        entry = {"graph": graph, "key": adjacency_fingerprint(adjacency), "adjacency": adjacency, "names": names, "rows": rows}
+    GD.session_data["shortestPathGraph"] = entry
+    return entry
+
+
+def shortest_path_dag(adjacency, source) -> dict:
+    """
+    BFS predecessor DAG of all shortest paths from source
+    returns: {"source": int, "distance": int array (-1 = unreachable), "sigma": float array (number of shortest
+              paths from source), "predecessors": CSR, row v holds the predecessors of v (sorted)}
+    """
+    distance = csgraph.shortest_path(adjacency, directed=False, unweighted=True, indices=source)
+    distance = np.where(np.isfinite(distance), distance, -1).astype(np.int64)
+    coo = adjacency.tocoo()
+    links = (distance[coo.row] >= 0) & (distance[coo.col] == distance[coo.row] + 1)
+    node, predecessor = coo.col[links], coo.row[links]
+    predecessors = sp_sp.csr_matrix((np.ones(len(node)), (node, predecessor)), shape=adjacency.shape)
+    predecessors.sort_indices()
+
+    # path counts level by level: sigma(v) = sum of sigma(u) over the predecessors u of v
+    sigma = np.zeros(adjacency.shape[0])
+    sigma[source] = 1
+    by_level = np.argsort(distance[node], kind="stable")
+    node, predecessor = node[by_level], predecessor[by_level]
+    bounds = np.searchsorted(distance[node], np.arange(1, distance.max() + 2))
+    for level in range(len(bounds) - 1):
+        part = slice(bounds[level], bounds[level + 1])
+        sigma += np.bincount(node[part], weights=sigma[predecessor[part]], minlength=len(sigma))
+    return {"source": int(source), "distance": distance, "sigma": sigma, "predecessors": predecessors}
+
+
+def cached_shortest_path_dag(entry, source, target) -> tuple:
+    """
+    returns (dag, reverse): a cached DAG from source, else from target (paths reversed, the graph is undirected),
+    else a new DAG from source. The last SHORTEST_PATH_DAGS DAGs stay in session_data["shortestPathDags"]
+    """
+    dags = GD.session_data.setdefault("shortestPathDags", [])
+    for start, reverse in [(source, False), (target, True)]:
+        for dag_key, dag in dags:
+            if dag_key == (entry["key"], start):
+                return dag, reverse
+    dag = shortest_path_dag(entry["adjacency"], source)
+    dags.append(((entry["key"], source), dag))
+    del dags[:-SHORTEST_PATH_DAGS]
+    return dag, False
+
+
+def shortest_path_at(dag, target, index) -> list:
+    """
+    returns the index-th shortest path from the source of the dag to target as list of rows (source first),
+    by unranking with the path counts: at every node the predecessor whose cumulative count covers index is taken
+    0 <= index < sigma(target)
+    """
+    predecessors, sigma = dag["predecessors"], dag["sigma"]
+    path = [target]
+    node = target
+    while node != dag["source"]:
+        candidates = predecessors.indices[predecessors.indptr[node] : predecessors.indptr[node + 1]]
+        cumulative = np.cumsum(sigma[candidates])
+        choice = min(int(np.searchsorted(cumulative, index, side="right")), len(candidates) - 1)
+        index -= cumulative[choice - 1] if choice > 0 else 0
+        node = candidates[choice]
+        path.append(node)
+    return path[::-1]
+
+
+def iter_shortest_paths(dag, target, cap=None, reverse=False):
+    # lazy generator over the shortest paths to target (at most cap), every path is built on demand
+    count = int(dag["sigma"][target])
+    for index in range(count if cap is None else min(count, cap)):
+        path = shortest_path_at(dag, target, index)
+        yield path[::-1] if reverse else path
+
+
+def __shortest_path_search(graph, node_1, node_2) -> tuple:
+    """
+    returns (entry, dag, target row, reverse) for the paths from node_1 to node_2, or None if there is no path
+    (the reason is printed as before)
+    """
     node_1, node_2 = str(node_1), str(node_2)
-    if not graph.has_node(node_1):
-        print(f"ERROR: Node {GD.nodes['nodes'][int(node_1)]} not in network.")
-        return []
-    if not graph.has_node(node_2):
-        print(f"ERROR: Node {GD.nodes['nodes'][int(node_2)]} not in network.")
-        return []
-    try:
-        path = nx.shortest_path(graph, source=node_1, target=node_2, method="dijkstra")
-        return path
-    except nx.exception.NetworkXNoPath:
+    entry = shortest_path_graph(graph)
+    count = entry["adjacency"].shape[0]
+    rows = []
+    for node in [node_1, node_2]:
+        if entry["rows"] is None:
+            row = int(node) if node.isdigit() and int(node) < count else None
+        else:
+            row = entry["rows"].get(node)
+        if row is None:
+            print(f"ERROR: Node {GD.nodes['nodes'][int(node)]} not in network.")
+            return None
+        rows.append(row)
+    dag, reverse = cached_shortest_path_dag(entry, rows[0], rows[1])
+    target = rows[0] if reverse else rows[1]
+    if dag["distance"][target] < 0:
         print(f"ERROR: Node {GD.nodes['nodes'][int(node_1)]} and node {GD.nodes['nodes'][int(node_2)]} are not connected.")
-        return []
+        return None
+    return entry, dag, target, reverse
 
 
-# function to retreive all shortest paths
-def analytics_shortest_paths(graph, node_1, node_2):
-    node_1, node_2 = str(node_1), str(node_2)
-    if not graph.has_node(node_1):
-        print(f"ERROR: Node {GD.nodes['nodes'][int(node_1)]} not in network.")
-        return []
-    if not graph.has_node(node_2):
-        print(f"ERROR: Node {GD.nodes['nodes'][int(node_2)]} not in network.")
+def __path_names(entry, path) -> list:
+    if entry["names"] is None:
+        return [str(row) for row in path]
+    return [entry["names"][row] for row in path]
+
+
+def analytics_shortest_path(graph, node_1, node_2):
+    search = __shortest_path_search(graph, node_1, node_2)
+    if search is None:
         return []
-    try:
-        paths = list(nx.all_shortest_paths(graph, source=node_1, target=node_2, method="dijkstra"))
-        return paths
-    except nx.exception.NetworkXNoPath:
-        print(f"ERROR: Node {GD.nodes['nodes'][int(node_1)]} and node {GD.nodes['nodes'][int(node_2)]} are not connected.")
+    entry, dag, target, reverse = search
+    return __path_names(entry, next(iter_shortest_paths(dag, target, 1, reverse)))
+
+
+# function to retreive all shortest paths (at most cap, the count between hubs explodes combinatorially)
+def analytics_shortest_paths(graph, node_1, node_2, cap=SHORTEST_PATH_CAP):
+    search = __shortest_path_search(graph, node_1, node_2)
+    if search is None:
         return []
+    entry, dag, target, reverse = search
+    return [__path_names(entry, path) for path in iter_shortest_paths(dag, target, cap, reverse)]
 
 
+def analytics_shortest_path_count(graph, node_1, node_2):
+    # number of shortest paths from the path counts only, no path is built
+    search = __shortest_path_search(graph, node_1, node_2)
+    if search is None:
+        return 0
+    entry, dag, target, reverse = search
+    return int(dag["sigma"][target])
 
 
 def analytics_color_shortest_path(path):
@@ -370,34 +675,21 @@ def analytics_shortest_path_run(graph):
 
     # write session data
     if "analyticsShortestPath" not in GD.session_data.keys():  
-        GD.session_data["analyticsShortestPath"] = {}
-    if "node1" not in GD.session_data["analyticsShortestPath"].keys():
-        GD.session_data["analyticsShortestPath"]["node1"] = GD.pdata["analyticsData"]["shortestPathNode1"]["id"]
-    if "node2" not in GD.session_data["analyticsShortestPath"].keys():
-        GD.session_data["analyticsShortestPath"]["node2"] = GD.pdata["analyticsData"]["shortestPathNode2"]["id"]
-    if "paths" not in GD.session_data["analyticsShortestPath"].keys():
-        GD.session_data["analyticsShortestPath"]["paths"] = []
-    if "index" not in GD.session_data["analyticsShortestPath"].keys():
-        GD.session_data["analyticsShortestPath"]["index"] = 0
-
-    # run shortest paths algorithm and check if a path is existing
-
-    # check if node has changed or paths is empty -> new run
-    if GD.pdata["analyticsData"]["shortestPathNode1"]["id"] != GD.session_data["analyticsShortestPath"]["node1"] or GD.pdata["analyticsData"]["shortestPathNode2"]["id"] != GD.session_data["analyticsShortestPath"]["node2"] or GD.session_data["analyticsShortestPath"]["paths"] == []:
-        # update session data from pdata
-        GD.session_data["analyticsShortestPath"]["node1"] = GD.pdata["analyticsData"]["shortestPathNode1"]["id"]
-        GD.session_data["analyticsShortestPath"]["node2"] = GD.pdata["analyticsData"]["shortestPathNode2"]["id"]
-        # run 
-        node_1 = GD.session_data["analyticsShortestPath"]["node1"]
-        node_2 = GD.session_data["analyticsShortestPath"]["node2"]
-        path_data = analytics_shortest_paths(graph=graph, node_1=node_1, node_2=node_2)
-        # write results in session data
-        GD.session_data["analyticsShortestPath"]["paths"] = path_data
-        GD.session_data["analyticsShortestPath"]["index"] = 0
-    path_data = GD.session_data["analyticsShortestPath"]["paths"]
+        GD.session_data["analyticsShortestPath"] = {"node1": None, "node2": None, "count": 0, "index": 0}
+    session = GD.session_data["analyticsShortestPath"]
+
+    # check if a node has changed -> new search, the DAG of an unchanged source node is reused
+    node_1 = GD.pdata["analyticsData"]["shortestPathNode1"]["id"]
+    node_2 = GD.pdata["analyticsData"]["shortestPathNode2"]["id"]
+    if node_1 != session["node1"] or node_2 != session["node2"] or session["count"] == 0:
+        session.update({"node1": node_1, "node2": node_2, "count": 0, "index": 0})
+        search = __shortest_path_search(graph, node_1, node_2)
+        if search is not None:
+            entry, dag, target, reverse = search
+            session.update({"entry": entry, "dag": dag, "target": target, "reverse": reverse, "count": int(dag["sigma"][target])})
 
     # return results
-    if len(path_data) == 0:
+    if session["count"] == 0:
         return {"success": False, "error": "No Path found. If available check previous error message."}
     return {"success": True}
 
@@ -405,7 +697,7 @@ def analytics_shortest_path_run(graph):
 def analytics_shortest_path_backward():
     # retrieve and modify session data
     current_index = GD.session_data["analyticsShortestPath"]["index"]
-    path_count = len(GD.session_data["analyticsShortestPath"]["paths"])
+    path_count = min(GD.session_data["analyticsShortestPath"]["count"], SHORTEST_PATH_CAP)
     new_index = max(0, current_index - 1 if current_index > 0 else path_count - 1)
     GD.session_data["analyticsShortestPath"]["index"] = new_index
 
@@ -413,54 +705,154 @@ def analytics_shortest_path_backward():
 def analytics_shortest_path_forward():
     # retrieve and modify session data
     current_index = GD.session_data["analyticsShortestPath"]["index"]
-    path_count = len(GD.session_data["analyticsShortestPath"]["paths"])
+    path_count = min(GD.session_data["analyticsShortestPath"]["count"], SHORTEST_PATH_CAP)
     new_index = current_index + 1 if current_index < path_count - 1 else 0
     GD.session_data["analyticsShortestPath"]["index"] = new_index
 
 
 def analytics_shortest_path_display():
-    # modifies and retreive session data
-    all_paths = GD.session_data["analyticsShortestPath"]["paths"]
-    current_index = GD.session_data["analyticsShortestPath"]["index"]
-    current_path = all_paths[current_index]
+    # modifies and retreive session data, only the current path is built
+    session = GD.session_data["analyticsShortestPath"]
+    current_index = session["index"]
+    current_path = shortest_path_at(session["dag"], session["target"], current_index)
+    if session["reverse"]:
+        current_path = current_path[::-1]
+    current_path = __path_names(session["entry"], current_path)
 
     # generate textures
     generated_textures = analytics_color_shortest_path(path=current_path)
 
     # generate display information
-    generate_display = {"numPathsAll": len(all_paths), "numPathCurrent": current_index + 1, "pathLength": len(current_path) - 1}
+    generate_display = {"numPathsAll": session["count"], "numPathCurrent": current_index + 1, "pathLength": len(current_path) - 1}
 
     # return bundled object 
     generated_textures.update(generate_display)
     return generated_textures
 
-def analytics_eigenvector(graph):
-    def _compute_eigenvector_centrality_nx(graph):
-        centrality = nx.eigenvector_centrality_numpy(graph)
-        return list(centrality.values())
-
-    def _compute_eigenvector_centrality_igraph(graph):
-        g = ig.Graph.Adjacency((graph > 0).tolist(), mode="DIRECTED")
-        centrality = g.eigenvector_centrality(directed=True)
-        return centrality
-    def _scale(centrality_seq):
-        min_value = min(centrality_seq)
-        max_value = max(centrality_seq)
-        scaled_seq = [(x - min_value) / (max_value - min_value) for x in centrality_seq]
-        return scaled_seq
-
-    if len(graph.nodes()) <= 10000 or len(graph.edges()) <= 80000:
-        centrality_seq = _compute_eigenvector_centrality_nx(graph)
-    else:
-        adjacency_matrix = nx.to_numpy_array(graph)
-        centrality_seq = _compute_eigenvector_centrality_igraph(adjacency_matrix)
+def eigenvector_centrality(adjacency, tolerance=CENTRALITY_TOLERANCE, max_iterations=CENTRALITY_MAX_ITERATIONS) -> tuple:
+    """
+    principal eigenvector of a sparse symmetric adjacency matrix, unit norm and positive as in networkx
+    power iteration on A + I (same eigenvectors, bipartite graphs converge too), eigsh from the last iterate if the
+    spectral gap is too small to converge within max_iterations
+    returns (centrality, stats), stats: {"method", "iterations", "eigenvalue", "residual", "converged"}
+    """
+    n = adjacency.shape[0]
+    if n == 0 or adjacency.nnz == 0:
+        stats = {"method": "power", "iterations": 0, "eigenvalue": 0.0, "residual": 0.0, "converged": True}
+        return np.full(n, 1 / np.sqrt(max(n, 1))), stats
+
+    centrality = np.asarray(adjacency.sum(axis=1)).ravel() + 1
+    centrality /= np.linalg.norm(centrality)
+    method, converged = "power", False
+    for iteration in range(1, max_iterations + 1):
+        image = adjacency @ centrality
+        eigenvalue = centrality @ image
+        residual = np.linalg.norm(image - eigenvalue * centrality)
+        if residual <= tolerance * max(eigenvalue, 1.0):
+            converged = True
+            break
+        centrality = image + centrality
+        centrality /= np.linalg.norm(centrality)
+    if not converged:
+        values, vectors = sp_linalg.eigsh(adjacency, k=1, which="LA", v0=centrality, tol=tolerance)
+        method, eigenvalue, centrality = "eigsh", values[0], vectors[:, 0]
+        residual = np.linalg.norm(adjacency @ centrality - eigenvalue * centrality)
+        converged = residual <= np.sqrt(tolerance) * max(eigenvalue, 1.0)
+
+    centrality = centrality * (1 if centrality.sum() >= 0 else -1)
+    stats = {
+        "method": method,
+        "iterations": iteration,
+        "eigenvalue": float(eigenvalue),
+        "residual": float(residual),
+        "converged": bool(converged),
+    }
+    return centrality, stats
+
+
+def pagerank(adjacency, damping=PAGERANK_DAMPING, tolerance=CENTRALITY_TOLERANCE, max_iterations=CENTRALITY_MAX_ITERATIONS) -> tuple:
+    """
+    pagerank by power iteration as networkx (uniform teleport, dangling nodes jump uniformly), sums to 1
+    returns (rank, stats), stats: {"method", "iterations", "residual", "converged"}, residual = L1 change of the last step
+    """
+    n = adjacency.shape[0]
+    if n == 0:
+        return np.zeros(0), {"method": "power", "iterations": 0, "residual": 0.0, "converged": True}
+    degree = np.asarray(adjacency.sum(axis=1)).ravel()
+    inverse_degree = np.zeros(n)
+    inverse_degree[degree > 0] = 1 / degree[degree > 0]
+    dangling = degree == 0
+    transposed = adjacency.T.tocsr()
+    rank = np.full(n, 1 / n)
+    converged = False
+    for iteration in range(1, max_iterations + 1):
+        updated = damping * (transposed @ (rank * inverse_degree)) + (damping * rank[dangling].sum() + 1 - damping) / n
+        residual = np.abs(updated - rank).sum()
+        rank = updated
+        if residual <= tolerance:
+            converged = True
+            break
+    stats = {"method": "power", "iterations": iteration, "residual": float(residual), "converged": converged}
+    return rank, stats
+
+
+def katz_centrality(adjacency, factor=KATZ_FACTOR, tolerance=CENTRALITY_TOLERANCE, max_iterations=CENTRALITY_MAX_ITERATIONS) -> tuple:
+    """
+    katz centrality x = alpha A x + 1 with alpha = factor / largest eigenvalue of A, unit norm as in networkx
+    fixed point iteration, converges like factor^iterations
+    returns (centrality, stats), stats: {"method", "iterations", "alpha", "residual", "converged"}
+    """
+    n = adjacency.shape[0]
+    eigenvalue = eigenvector_centrality(adjacency, tolerance=1e-6)[1]["eigenvalue"]
+    alpha = factor / eigenvalue if eigenvalue > 0 else 0.0
+    centrality = np.ones(n)
+    residual, converged = 0.0, True
+    for iteration in range(1, max_iterations + 1):
+        updated = alpha * (adjacency @ centrality) + 1
+        residual = np.linalg.norm(updated - centrality) / max(np.linalg.norm(updated), 1e-300)
+        centrality = updated
+        converged = residual <= tolerance
+        if converged:
+            break
+    centrality = centrality / max(np.linalg.norm(centrality), 1e-300)
+    stats = {"method": "power", "iterations": iteration if n else 0, "alpha": float(alpha), "residual": float(residual), "converged": bool(converged)}
+    return centrality, stats
+
+
+def analytics_eigenvector(graph=None):
+    """
+    eigenvector centrality of every node (graph.nodes() order, node ids for the active project if graph is None),
+    convergence stats in session_data["analyticsEigenvector"]
+    """
+    centrality_seq, stats = eigenvector_centrality(graph_adjacency(graph))
+    GD.session_data["analyticsEigenvector"] = stats
+    return list(centrality_seq)
 
-    #visual_centrality_seq = _scale(centrality_seq)
-    
-    return centrality_seq  #(centrality_seq, visual_centrality_seq)
+
+def analytics_pagerank(graph=None):
+    # as analytics_eigenvector, stats in session_data["analyticsPageRank"]
+    rank_seq, stats = pagerank(graph_adjacency(graph))
+    GD.session_data["analyticsPageRank"] = stats
+    return list(rank_seq)
 
 
-def plotly_eigenvector(assignment_list, highlighted_bar=None):
+def analytics_katz(graph=None):
+    # as analytics_eigenvector, stats in session_data["analyticsKatz"]
+    centrality_seq, stats = katz_centrality(graph_adjacency(graph))
+    GD.session_data["analyticsKatz"] = stats
+    return list(centrality_seq)
+
+
+def convergence_title(stats):
+    # one line summary of the stats of an iterative centrality for the plot title
+    if stats is None:
+        return None
+    state = "converged" if stats["converged"] else "not converged"
+    return f"{stats['method']}: {stats['iterations']} iterations, residual {stats['residual']:.1e}, {state}"
+
+
+def __plotly_centrality(assignment_list, name, highlighted_bar=None, stats=None):
+    # histogram of a centrality, title: selected range or convergence stats
     num_bins, bin_width, min_value = __compute_histogram_bins(assignment_list)
 
     highlighted_assignments = [highlighted_bar]
@@ -477,10 +869,10 @@ def plotly_eigenvector(assignment_list, highlighted_bar=None):
         highlighted_assignments = [min_assignment_selected, max_assignment_selected]
 
     layout = go.Layout(
-        xaxis=dict(title='Eigenvector Value Range', fixedrange=True),
+        xaxis=dict(title=f'{name} Value Range', fixedrange=True),
         yaxis=dict(title='Number of Nodes', fixedrange=True, type='log'),
         bargap=0.1,
-        title=None if highlighted_bar is None else f"Selected Eigenvector: {min_assignment_selected:.3f} to {max_assignment_selected:.3f}",
+        title=convergence_title(stats) if highlighted_bar is None else f"Selected {name}: {min_assignment_selected:.3f} to {max_assignment_selected:.3f}",
         title_y=0.97
     )
     
@@ -495,6 +887,18 @@ def plotly_eigenvector(assignment_list, highlighted_bar=None):
     return (plotly_json, highlighted_assignments)
 
 
+def plotly_eigenvector(assignment_list, highlighted_bar=None, stats=None):
+    return __plotly_centrality(assignment_list, "Eigenvector", highlighted_bar, stats)
+
+
+def plotly_pagerank(assignment_list, highlighted_bar=None, stats=None):
+    return __plotly_centrality(assignment_list, "PageRank", highlighted_bar, stats)
+
+
+def plotly_katz(assignment_list, highlighted_bar=None, stats=None):
+    return __plotly_centrality(assignment_list, "Katz", highlighted_bar, stats)
+
+
 def plotly_closeness(assignment_list, highlighted_bar=None):
     num_bins, bin_width, min_value = __compute_histogram_bins(assignment_list)
     print(">>",num_bins, bin_width, min_value)
@@ -530,23 +934,76 @@ def plotly_closeness(assignment_list, highlighted_bar=None):
     return (plotly_json, highlighted_assignments)
 
 
-def modularity_community_detection(ordered_graph):
-    if not isinstance(ordered_graph, util.OrderedGraph):
-        raise TypeError("The graph should be an instance of OrderedGraph.")
-
-    communities = nx.algorithms.community.modularity_max.greedy_modularity_communities(ordered_graph)
+def adjacency_fingerprint(adjacency) -> str:
+    # hash of the structure of a sparse adjacency matrix, the partition cache key of graphs outside the project
+    digest = hashlib.sha1()
+    digest.update(str(adjacency.shape).encode())
+    digest.update(np.ascontiguousarray(adjacency.indptr).tobytes())
+    digest.update(np.ascontiguousarray(adjacency.indices).tobytes())
+    return digest.hexdigest()
 
-    community_assignment = [0] * len(ordered_graph.node_order)
 
-    for i, comm in enumerate(communities):
-        for node in comm:
-            node_index = ordered_graph.node_order.index(node)
-            community_assignment[node_index] = i + 1
+def community_partition(adjacency, method="leiden", resolution=COMMUNITY_RESOLUTION) -> np.ndarray:
+    """
+    modularity communities with igraph (leiden or louvain) on integer node ids
+    adjacency: scipy CSR, symmetric adjacency matrix
+    returns: int array, community of every node, 1 = biggest community, 2 = second biggest, ...
+    """
+    if method not in COMMUNITY_METHODS:
+        raise ValueError("unknown community method " + str(method))
+    n = adjacency.shape[0]
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    upper = sp_sp.triu(adjacency, k=1).tocoo()
+    graph = ig.Graph(n=n, edges=np.stack([upper.row, upper.col], axis=1).tolist(), directed=False)
+    if method == "leiden":
+        clustering = graph.community_leiden(objective_function="modularity", resolution=resolution, n_iterations=LEIDEN_ITERATIONS)
+    else:
+        clustering = graph.community_multilevel(resolution=resolution)
+    membership = np.asarray(clustering.membership, dtype=np.int64)
+    # renumber by size, as networkx returns the communities
+    sizes = np.bincount(membership)
+    renumber = np.empty(len(sizes), dtype=np.int64)
+    renumber[np.argsort(-sizes, kind="stable")] = np.arange(1, len(sizes) + 1)
+    return renumber[membership]
 
-    return community_assignment
 
+def modularity_community_detection(ordered_graph=None, method="leiden", resolution=COMMUNITY_RESOLUTION):
+    """
+    community of every node in node_order (node ids of the active project if ordered_graph is None), 1-based
+    partitions are cached in session_data["analyticsCommunities"] by graph fingerprint, method and resolution
+    """
+    if ordered_graph is not None and not isinstance(ordered_graph, util.OrderedGraph):
+        raise TypeError("The graph should be an instance of OrderedGraph.")
 
-def color_mod_community_det(communities_arr):
+    adjacency = graph_adjacency(ordered_graph)
+    fingerprint = util.graph_fingerprint() if ordered_graph is None else adjacency_fingerprint(adjacency)
+    key = (fingerprint, method, float(resolution))
+    if "analyticsCommunities" not in GD.session_data.keys():
+        GD.session_data["analyticsCommunities"] = {"partitions": {}, "last": None}
+    cache = GD.session_data["analyticsCommunities"]
+    if key not in cache["partitions"].keys():
+        cache["partitions"][key] = community_partition(adjacency, method, resolution)
+    community_assignment = cache["partitions"][key]
+
+    if ordered_graph is not None:
+        community_assignment = community_assignment[node_order_rows(ordered_graph)]
+    cache["last"] = community_assignment.tolist()
+    return cache["last"]
+
+
+def cached_communities():
+    # the result of the last modularity_community_detection call, for the active project if there is none yet
+    cache = GD.session_data.get("analyticsCommunities", {})
+    if cache.get("last") is not None:
+        return cache["last"]
+    return modularity_community_detection()
+
+
+def color_mod_community_det(communities_arr=None):
+    # communities_arr: community per node as returned by modularity_community_detection, default the cached one
+    if communities_arr is None:
+        communities_arr = cached_communities()
     num_communities = max(communities_arr)
     colors = util.generate_colors(n=num_communities)
     colors.insert(0, (55, 55, 55, 100))  # grey out all non community nodes
@@ -554,52 +1011,31 @@ def color_mod_community_det(communities_arr):
     return node_colors
 
 
-def generate_layout_community_det(communities_arr, ordered_graph, min_distance=0, max_distance=2):
-    if not isinstance(ordered_graph, util.OrderedGraph):
+def generate_layout_community_det(communities_arr=None, ordered_graph=None, min_distance=0, max_distance=2):
+    """
+    positions in [0, 1] clustering every community around a random seed position, aligned to communities_arr
+    communities_arr: community per node as returned by modularity_community_detection, default the cached one
+    """
+    if ordered_graph is not None and not isinstance(ordered_graph, util.OrderedGraph):
         raise TypeError("The graph should be an instance of OrderedGraph.")
+    if communities_arr is None:
+        communities_arr = cached_communities()
 
-    layout = {}
-    seed_positions = {}
-
-    for i, node in enumerate(ordered_graph.node_order):
-        community_label = communities_arr[i]
-
-        # distance from the current node to the seed position of the community
-        if community_label not in seed_positions:
-            # random seed position for new community
-            seed_positions[community_label] = (
-                np.random.uniform(-10, 10),
-                np.random.uniform(-10, 10),
-                np.random.uniform(-10, 10),
-            )
-
-        seed_position = seed_positions[community_label]
-        distance_to_seed = np.random.uniform(min_distance, max_distance) 
-
-        # layout position based on the community seed and distance
-        x = seed_position[0] + np.random.uniform(-distance_to_seed, distance_to_seed)
-        y = seed_position[1] + np.random.uniform(-distance_to_seed, distance_to_seed)
-        z = seed_position[2] + np.random.uniform(-distance_to_seed, distance_to_seed)
+    communities = np.asarray(communities_arr, dtype=np.int64)
+    if len(communities) == 0:
+        return []
+    # random seed position per community, nodes scattered around it within a random distance
+    seed_positions = np.random.uniform(-10, 10, (communities.max() + 1, 3))
+    distance_to_seed = np.random.uniform(min_distance, max_distance, len(communities))
+    offsets = np.random.uniform(-1, 1, (len(communities), 3)) * distance_to_seed[:, None]
+    layout = seed_positions[communities] + offsets
 
-        # Add the layout position to the dictionary
-        layout[node] = (x, y, z)
-    
     # normalize
-    x, y, z = [], [], []
-    for node_id in range(len(communities_arr)):
-        x.append(layout[str(node_id)][0])
-        y.append(layout[str(node_id)][1])
-        z.append(layout[str(node_id)][2])
-    max_x, min_x = max(x), min(x)
-    max_y, min_y = max(y), min(y)
-    max_z, min_z = max(z), min(z)
-    positions = [[
-        (x[node_id] - min_x) / (max_x - min_x),
-        (y[node_id] - min_y) / (max_y - min_y),
-        (z[node_id] - min_z) / (max_z - min_z)
-    ] for node_id in range(len(communities_arr))]
-    
-    return positions
+    low = layout.min(axis=0)
+    extent = layout.max(axis=0) - low
+    extent[extent == 0] = 1
+    positions = (layout - low) / extent
+    return positions.tolist()
 
 
 def generate_temp_layout(positions):
@@ -647,15 +1083,77 @@ def generate_temp_layout(positions):
         return {"layout_created": False} 
     
 
-def analytics_clustering_coefficient(ordered_graph):
-    if not isinstance(ordered_graph, util.OrderedGraph):
+def triangle_counts(adjacency) -> np.ndarray:
+    """
+    number of triangles through every node of a symmetric sparse adjacency matrix without self loops
+    Links are oriented from lower to higher (degree, id) rank, U is the oriented matrix. Every triangle a < b < c is
+    found once, at its long link (a, c) in U o (U U) (b in the middle) and at its short top link (b, c) in
+    U o (U^T U) (a below). Out degrees in U are below sqrt(2 links), so both products stay near O(links^1.5) even
+    with hubs, rows are processed in chunks of at most TRIANGLE_CHUNK product entries.
+    """
+    n = adjacency.shape[0]
+    degree = np.diff(adjacency.indptr)
+    rank = np.empty(n, dtype=np.int64)
+    rank[np.lexsort((np.arange(n), degree))] = np.arange(n)
+    coo = sp_sp.triu(adjacency, k=1).tocoo()
+    low = np.where(rank[coo.row] < rank[coo.col], coo.row, coo.col)
+    high = np.where(rank[coo.row] < rank[coo.col], coo.col, coo.row)
+    oriented = sp_sp.csr_matrix((np.ones(len(low)), (low, high)), shape=(n, n))
+    transposed = oriented.T.tocsr()
+
+    # product entries per row: sum of the out degrees of the out (U U) and in (U^T U) neighbors
+    out_degree = np.diff(oriented.indptr).astype(np.float64)
+    cost = np.cumsum(oriented @ out_degree + transposed @ out_degree)
+    triangles = np.zeros(n)
+    start = 0
+    while start < n:
+        done = cost[start - 1] if start > 0 else 0
+        end = max(start + 1, int(np.searchsorted(cost, done + TRIANGLE_CHUNK, side="right")))
+        rows = slice(start, end)
+        long_links = oriented[rows].multiply(oriented[rows] @ oriented).tocsr()
+        top_links = oriented[rows].multiply(transposed[rows] @ oriented).tocsr()
+        # long link (a, c): a and c, top link (b, c): b
+        triangles[start:end] += np.asarray(long_links.sum(axis=1)).ravel() + np.asarray(top_links.sum(axis=1)).ravel()
+        triangles += np.asarray(long_links.sum(axis=0)).ravel()
+        start = end
+    return triangles
+
+
+def clustering_coefficients(adjacency) -> tuple:
+    """
+    local clustering coefficient of every node and graph transitivity from one triangle count
+    returns (clustering, stats), stats: {"triangles": int, "transitivity": float, "averageClustering": float}
+    """
+    triangles = triangle_counts(adjacency)
+    degree = np.diff(adjacency.indptr).astype(np.float64)
+    pairs = degree * (degree - 1) / 2
+    clustering = np.zeros(len(degree))
+    clustering[pairs > 0] = triangles[pairs > 0] / pairs[pairs > 0]
+    stats = {
+        "triangles": int(round(triangles.sum() / 3)),
+        "transitivity": float(triangles.sum() / pairs.sum()) if pairs.sum() > 0 else 0.0,
+        "averageClustering": float(clustering.mean()) if len(clustering) else 0.0,
+    }
+    return clustering, stats
+
+
+def analytics_clustering_coefficient(ordered_graph=None):
+    """
+    clustering coefficient of every node in node_order (node ids of the active project if ordered_graph is None),
+    triangles, transitivity and average in session_data["analyticsClustering"]
+    """
+    if ordered_graph is not None and not isinstance(ordered_graph, util.OrderedGraph):
         raise TypeError("The graph should be an instance of OrderedGraph.")
-    
-    clustering_coefficients = [nx.clustering(ordered_graph, node) for node in ordered_graph.node_order]
-    return clustering_coefficients
+
+    clustering_coefficients_seq, stats = clustering_coefficients(graph_adjacency(ordered_graph))
+    GD.session_data["analyticsClustering"] = stats
+    if ordered_graph is not None:
+        clustering_coefficients_seq = clustering_coefficients_seq[node_order_rows(ordered_graph)]
+    return clustering_coefficients_seq.tolist()
 
 
-def plotly_clustering_coefficient(assignment_list, highlighted_bar=None):
+def plotly_clustering_coefficient(assignment_list, highlighted_bar=None, stats=None):
+    # stats: as in session_data["analyticsClustering"], shown in the title while no bar is selected
     num_bins, bin_width, min_value = __compute_histogram_bins(assignment_list)
 
     highlighted_assignments = [highlighted_bar]
@@ -675,7 +1173,7 @@ def plotly_clustering_coefficient(assignment_list, highlighted_bar=None):
         xaxis=dict(title='Clustering Coefficient Range', fixedrange=True),
         yaxis=dict(title='Number of Nodes', fixedrange=True, type='log'),
         bargap=0.1,
-        title=None if highlighted_bar is None else f"Selected Cluster Coefficients: {min_assignment_selected:.3f} to {max_assignment_selected:.3f}",
+        title=(None if stats is None else f"Transitivity {stats['transitivity']:.3f}, {stats['triangles']} triangles") if highlighted_bar is None else f"Selected Cluster Coefficients: {min_assignment_selected:.3f} to {max_assignment_selected:.3f}",
         title_y=0.97
     )
     
@@ -1,3 +1,6 @@
+# has to be imported first, monkey patches the standard library in eventlet/gevent mode
+import async_mode
+
 import base64
 import csv
 import json
@@ -44,8 +47,12 @@ import chatGPTTest
 import GlobalData as GD
 import layout_module
 import load_extensions
+import morph
 import plotlyExamples as PE
+import query
 import search
+import spatial
+import textures
 
 # load audio and pad/trim it to fit 30 seconds
 import TextToSpeech
@@ -63,24 +70,32 @@ app = Flask(__name__)
 app.debug = False
 app.config["SECRET_KEY"] = "secret"
 app.config["SESSION_TYPE"] = "filesystem"
+app.config["EVENT_COALESCE_HZ"] = 30  # max persist/broadcast rate per (room, id) for "sli" and "sel" events
 
-socketio = SocketIO(app, manage_session=False)
+socketio = SocketIO(app, manage_session=False, async_mode=async_mode.ASYNC_MODE)
 app, extensions = load_extensions.load(app)
 
 ### HTML ROUTES ###
 sockets = [];
 
-### Execute code before first request ###
-@app.before_first_request
-def execute_before_first_request():
-    uploader.check_ProjectFolder()
-    util.create_dynamic_links(app)
+def load_project():
+    """loads GD.json and all files of the active project into GlobalData"""
     GD.loadGD()
     GD.loadPFile()
     GD.loadPD()
     GD.loadColor()
     GD.loadLinks()
     GD.load_annotations()
+    search.build_index()
+    query.build_store()
+
+
+### Execute code before first request ###
+@app.before_first_request
+def execute_before_first_request():
+    uploader.check_ProjectFolder()
+    util.create_dynamic_links(app)
+    load_project()
 
 
 @app.route("/")
@@ -191,19 +206,36 @@ def uploadJSON():
     )
 
 
+def reload_uploaded_project(project_name):
+    """
+    reloads the active project after an upload wrote into its folder
+    load_project reads the new nodes and links and empties session_data (fingerprint, csr, layout results), otherwise
+    the persistent layout cache would be keyed by the previous graph
+    """
+    if project_name == GD.data.get("actPro"):
+        async_mode.run_blocking(load_project)
+
+
 @app.route("/uploadfiles", methods=["GET", "POST"])
 def upload_files():
-    return uploader.upload_files(flask.request)
+    state = uploader.upload_files(flask.request)
+    form = flask.request.form
+    reload_uploaded_project(form.get("new_name") if form.get("namespace") == "New" else form.get("existing_namespace"))
+    return state
 
 
 @app.route("/uploadfilesNew", methods=["GET", "POST"])
 def upload_filesNew():
-    return uploader.upload_filesNew(flask.request)
+    state = uploader.upload_filesNew(flask.request)
+    reload_uploaded_project(flask.request.form.get("new_name"))
+    return state
 
 
 @app.route("/uploadfilesJSON", methods=["GET", "POST"])
 def upload_filesJSON():
-    return uploaderGraph.upload_filesJSON(flask.request)
+    state = uploaderGraph.upload_filesJSON(flask.request)
+    reload_uploaded_project(flask.request.form.get("namespaceJSON"))
+    return state
 
 
 @app.route("/delpro", methods=["GET", "POST"])
@@ -230,6 +262,59 @@ def nodeinfo():
         return nodes["nodes"][int(id)]
 
 
+# attribute filter queries, see query.py for the syntax
+# GET /query?q=degree >= 5 and default:"x" or POST {"query": "..."}
+@app.route("/query", methods=["GET", "POST"])
+def node_query():
+    if flask.request.method == "POST":
+        text = (flask.request.get_json(silent=True) or {}).get("query", "")
+    else:
+        text = flask.request.args.get("q", "")
+    return jsonify(async_mode.run_blocking(query.run, text))
+
+
+# spatial queries on the active layout, see spatial.py for the query object
+# GET /spatial?query=knn&point=x,y,z&k=10 or POST {"query": "box", "min": [x, y, z], "max": [x, y, z]}
+@app.route("/spatial", methods=["GET", "POST"])
+def spatial_query():
+    if flask.request.method == "POST":
+        params = flask.request.get_json(silent=True) or {}
+    else:
+        params = flask.request.args.to_dict()
+    return jsonify(async_mode.run_blocking(spatial.query, params))
+
+
+# GET /morph?a=<layout>&b=<layout>&n=30&mode=procrustes or POST {"a": ..., "b": ..., "n": ..., "mode": ...}
+@app.route("/morph", methods=["GET", "POST"])
+def morph_layouts():
+    if flask.request.method == "POST":
+        params = flask.request.get_json(silent=True) or {}
+    else:
+        params = flask.request.args.to_dict()
+    return jsonify(async_mode.run_blocking(morph.morph, params))
+
+
+# scale of a protein structure, /structure_scale?uniprot=<UniProtID>&mode=<cartoon|electrostatic>
+@app.route("/structure_scale", methods=["GET"])
+def structure_scale():
+    scale = search.get_structure_scale(flask.request.args.get("uniprot"), flask.request.args.get("mode"))
+    return str(scale)
+
+
+# scales of many protein structures at once
+# GET /structure_scales?uniprot=<id>,<id>,...&mode=<mode> or POST {"uniprots": [...], "mode": <mode>}
+@app.route("/structure_scales", methods=["GET", "POST"])
+def structure_scales():
+    if flask.request.method == "POST":
+        request_data = flask.request.get_json(silent=True) or {}
+        uniprots = request_data.get("uniprots", [])
+        mode = request_data.get("mode")
+    else:
+        uniprots = [uniprot for uniprot in flask.request.args.get("uniprot", "").split(",") if uniprot != ""]
+        mode = flask.request.args.get("mode")
+    return jsonify(search.get_structure_scales(uniprots, mode))
+
+
 @app.route("/home")
 def home():
     if not flask.session.get("username"):
@@ -284,6 +369,122 @@ def loadProjectAnnotations(name):
 ###SocketIO ROUTES###
 
 
+def flush_slider(room, message):
+    """persists and broadcasts the last slider value of a coalescing tick"""
+    GD.pdata[message["id"]] = message["val"]
+    async_mode.run_blocking(GD.savePD)
+    response = {}
+    response["usr"] = message["usr"]
+    response["fn"] = "sli"
+    response["id"] = message["id"]
+    response["val"] = message["val"]
+    socketio.emit("ex", response, room=room, namespace="/main")
+
+
+def flush_selection(room, message):
+    """persists and broadcasts the last selection of a coalescing tick"""
+    GD.pdata[message["id"]] = message["opt"]
+    async_mode.run_blocking(GD.savePD)
+    socketio.emit("ex", message, room=room, namespace="/main")
+
+
+def colorize_clipboard_texture(color):
+    """
+    generates the active node color texture with all clipboard nodes set to color
+    returns the texture object for updateTempTex (saved to layoutsRGB/temp1.png or inline)
+    """
+    ids = [int(n["id"]) for n in GD.pdata["cbnode"]]
+    return textures.node_highlight(ids, color)
+
+
+def apply_layout(engine, message, room, params=None):
+    """
+    runs a registered layout (layout_module.LAYOUT_ENGINES) for an apply button and sends log, buttons and textures
+    engines that stream send intermediate positions to the room while they run
+    params: dict, optional, overrides of the engine parameters (button variant and client "params")
+    """
+    # write log starting
+    response_log = {}
+    response_log["usr"] = message["usr"]
+    response_log["id"] = "addLog"
+    response_log["fn"] = "layout"
+    response_log["log"] = {
+        "type": "log",
+        "msg": "Generating "
+        + engine.name
+        + engine.estimate(len(GD.nodes["nodes"]), len(GD.links["links"]))
+        + " ...",
+    }
+    emit("ex", response_log, room=room)
+
+    progress = None
+    relay = None
+    if engine.streams:
+        def send_progress(texture_list):
+            response_progress = {}
+            response_progress["usr"] = message["usr"]
+            response_progress["fn"] = "updateTempTex"
+            response_progress["textures"] = texture_list
+            socketio.emit("ex", response_progress, room=room, namespace="/main")
+
+        # frames are produced in the worker thread of run_blocking and emitted from the hub
+        relay = async_mode.HubRelay(socketio, send_progress)
+        relay.start()
+        progress = layout_module.ProgressStream(relay.put)
+
+    # retreive data and get layout positions (session, layout cache or run)
+    try:
+        result_obj = async_mode.run_blocking(
+            layout_module.generate_layout, engine, params, progress
+        )
+    finally:
+        if relay is not None:
+            relay.close()
+    if result_obj["success"] is False:
+        print("ERROR: ", result_obj["error"])
+        response_log["log"] = result_obj["log"]
+        emit("ex", response_log, room=room)
+        return
+
+    # generate layout textures
+    result_obj = async_mode.run_blocking(layout_module.pos_to_textures, result_obj["content"])
+    if result_obj["success"] is False:
+        print("ERROR: ", result_obj["error"])
+        response_log["log"] = result_obj["log"]
+        emit("ex", response_log, room=room)
+        return
+
+    # write log finish
+    response_log["log"] = {
+        "type": "log",
+        "msg": "Generated " + engine.name + " successfully.",
+    }
+    emit("ex", response_log, room=room)
+
+    # display rerun and save buttons
+    response_layout_exists = {}
+    response_layout_exists["usr"] = message["usr"]
+    response_layout_exists["fn"] = "layout"
+    response_layout_exists["id"] = "layoutExists"
+    response_layout_exists["val"] = layout_module.check_layout_exists()
+    emit("ex", response_layout_exists, room=room)
+
+    # update temp layout
+    response = {}
+    response["usr"] = message["usr"]
+    response["fn"] = "updateTempTex"
+    response["textures"] = result_obj["textures"]
+    emit("ex", response, room=room)
+
+
+slider_events = webfunc.EventCoalescer(
+    socketio, flush_slider, tick=1 / app.config["EVENT_COALESCE_HZ"]
+)
+selection_events = webfunc.EventCoalescer(
+    socketio, flush_selection, tick=1 / app.config["EVENT_COALESCE_HZ"]
+)
+
+
 @socketio.on("join", namespace="/main")
 def join(message):
     room = flask.session.get("room")
@@ -320,12 +521,9 @@ def ex(message):
 
 
     if message["fn"] == "sel":
-        if (
-            not message["id"] in GD.pdata.keys()
-        ):  # check if selection exists in pdata.json
-            GD.pdata[message["id"]] = ""
-        GD.pdata[message["id"]] = message["opt"]
-        GD.savePD()
+        # persisted and broadcasted once per tick with the latest selection
+        selection_events.push(room, message)
+        return
 
     if message["id"] == "protLoad":
         response = {}
@@ -339,9 +537,88 @@ def ex(message):
         if len(message["val"]) > 1:
             x = '{"id": "search", "val":[], "fn": "makeNodeButton", "parent":"scrollbox2"}'
             results = json.loads(x)
-            results["val"] = search.search(message["val"])
+            mode = message.get("mode", "substring")
+            ids = search.search_ids(message["val"], mode=mode, client=message.get("usr"))
+            if len(ids) == 0 and mode != "fuzzy":
+                # no literal match, probably a typo
+                mode = "fuzzy"
+                ids = search.search_ids(message["val"], mode=mode)
+            results["mode"] = mode
+            results.update(util.node_button_page("search", ids=ids, room=room))
             emit("ex", results, room=room)
 
+    # attribute filter query, message: "val" query text (see query.py), optional "parent" and "highlight" [r, g, b, a]
+    if message["fn"] == "query":
+        result = async_mode.run_blocking(query.run, message["val"])
+        if result["success"] is False:
+            response = {}
+            response["usr"] = message["usr"]
+            response["id"] = message["id"]
+            response["fn"] = "query"
+            response["error"] = result["error"]
+            emit("ex", response)  # only the sender needs to see the syntax error
+            return
+        response = {}
+        response["usr"] = message["usr"]
+        response["id"] = "query"
+        response["fn"] = "makeNodeButton"
+        response["parent"] = message.get("parent", "scrollbox2")
+        response.update(util.node_button_page("query", ids=result["ids"], room=room))
+        emit("ex", response, room=room)
+
+        if message.get("highlight") is not None:
+            texture = async_mode.run_blocking(textures.node_highlight, result["ids"], message["highlight"])
+            response = {}
+            response["usr"] = message["usr"]
+            response["fn"] = "updateTempTex"
+            response["textures"] = [texture]
+            emit("ex", response, room=room)
+        return
+
+    # spatial selection, message: query object (see spatial.py), optional "parent" and "highlight" [r, g, b, a]
+    if message["fn"] == "spatial":
+        result = async_mode.run_blocking(spatial.query, message)
+        if result["success"] is False:
+            print("ERROR: ", result["error"])
+            return
+        response = {}
+        response["usr"] = message["usr"]
+        response["id"] = "spatial"
+        response["fn"] = "makeNodeButton"
+        response["parent"] = message.get("parent", "scrollbox2")
+        response.update(util.node_button_page("spatial", ids=result["ids"], room=room))
+        emit("ex", response, room=room)
+
+        if message.get("highlight") is not None:
+            texture = async_mode.run_blocking(textures.node_highlight, result["ids"], message["highlight"])
+            response = {}
+            response["usr"] = message["usr"]
+            response["fn"] = "updateTempTex"
+            response["textures"] = [texture]
+            emit("ex", response, room=room)
+        return
+
+    if message["fn"] == "morph":
+        # frames of a morph between two layouts, clients play them as temp layout textures
+        result = async_mode.run_blocking(morph.morph, message)
+        if result["success"] is False:
+            print("ERROR: ", result["error"])
+            response = {}
+            response["usr"] = message["usr"]
+            response["fn"] = "morph"
+            response["error"] = result["error"]
+            emit("ex", response)
+            return
+        response = {}
+        response["usr"] = message["usr"]
+        response["fn"] = "morphFrames"
+        response["a"] = result["a"]
+        response["b"] = result["b"]
+        response["mode"] = result["mode"]
+        response["frames"] = result["frames"]
+        emit("ex", response, room=room)
+        return
+
     # Chat text message
     if message["fn"] == "chatmessage":
         response = {}
@@ -394,16 +671,6 @@ def ex(message):
 
     elif message["fn"] == "colorbox":
         if message["id"] == "cbColorInput":
-            # copy active color texture
-            im1 = Image.open(
-                "static/projects/"
-                + GD.data["actPro"]
-                + "/layoutsRGB/"
-                + GD.pfile["layoutsRGB"][int(GD.pdata["layoutsRGBDD"])]
-                + ".png",
-                "r",
-            )
-            im2 = im1.copy()
             # convert rgb to hex string
             color = (
                 int(message["r"]),
@@ -411,34 +678,13 @@ def ex(message):
                 int(message["b"]),
                 int(message["a"] * 255),
             )
-            pix_val = list(im1.getdata())
-
-            # colorize clipboard selection
-            for n in GD.pdata["cbnode"]:
-                id = int(n["id"])
-                pix_val[id] = color
-            im2.putdata(pix_val)
-
-            # save temp texture
-
-            path = "static/projects/" + GD.data["actPro"] + "/layoutsRGB/temp1.png"
-            im2.save(path)
-            im1.close()
-            im2.close()
+            texture = async_mode.run_blocking(colorize_clipboard_texture, color)
             # send update signal to clients
 
             response = {}
             response["usr"] = message["usr"]
             response["fn"] = "updateTempTex"
-            response["textures"] = []
-            response["textures"].append(
-                {
-                    "channel": "nodeRGB",
-                    "path": "static/projects/"
-                    + GD.data["actPro"]
-                    + "/layoutsRGB/temp1.png",
-                }
-            )
+            response["textures"] = [texture]
 
             emit("ex", response, room=room)
         emit("ex", message, room=room)
@@ -527,371 +773,20 @@ def ex(message):
             response["val"] = False
             emit("ex", response, room=room)
 
-        # layout algorithms
-        if message["id"] == "layoutRandomApply":
-            layout_id = layout_module.LAYOUT_IDS[0]  # 0 -> random layout
-
-            # write log starting
-            response_log = {}
-            response_log["usr"] = message["usr"]
-            response_log["id"] = "addLog"
-            response_log["fn"] = "layout"
-            response_log["log"] = {
-                "type": "log",
-                "msg": "Random layout generation running ...",
-            }
-            emit("ex", response_log, room=room)
-
-            # retreive data and get layout positions
-            if layout_id not in GD.session_data["layout"]["results"].keys():
-                if "graph" not in GD.session_data.keys():
-                    GD.session_data["graph"] = util.project_to_graph(GD.data["actPro"])
-                graph = GD.session_data["graph"]
-                result_obj = layout_module.layout_random(ordered_graph=graph)
-                if result_obj["success"] is False:
-                    print("ERROR: ", result_obj["error"])
-                    response_log["log"] = result_obj["log"]
-                    emit("ex", response_log, room=room)
-                    return
-
-                GD.session_data["layout"]["results"][layout_id] = result_obj["content"]
-
-            # generate layout textures
-            positions = GD.session_data["layout"]["results"][layout_id]
-            result_obj = layout_module.pos_to_textures(positions)
-            if result_obj["success"] is False:
-                print("ERROR: ", result_obj["error"])
-
-                response_log["log"] = result_obj["log"]
-                emit("ex", response_log, room=room)
+        # layout algorithms, one generic pipeline for all engines of layout_module.LAYOUT_ENGINES
+        engine, params = layout_module.get_layout_engine(message["id"])
+        if engine is not None:
+            client_params = message.get("params") or {}
+            if not isinstance(client_params, dict):
+                response = {}
+                response["usr"] = message["usr"]
+                response["id"] = "addLog"
+                response["fn"] = "layout"
+                response["log"] = {"type": "warning", "msg": "Invalid layout parameters, expected an object."}
+                emit("ex", response)  # only the sender needs to see the refusal
                 return
-
-            # write log finish
-            response_log["log"] = {
-                "type": "log",
-                "msg": "Generated random layout successfully.",
-            }
-            emit("ex", response_log, room=room)
-
-            # display rerun and save buttons
-            response_layout_exists = {}
-            response_layout_exists["usr"] = message["usr"]
-            response_layout_exists["fn"] = "layout"
-            response_layout_exists["id"] = "layoutExists"
-            response_layout_exists["val"] = layout_module.check_layout_exists()
-            emit("ex", response_layout_exists, room=room)
-
-            # update temp layout
-            response = {}
-            response["usr"] = message["usr"]
-            response["fn"] = "updateTempTex"
-            response["textures"] = result_obj["textures"]
-            emit("ex", response, room=room)
-            return
-
-        if message["id"] == "layoutEigenApply":
-            layout_id = layout_module.LAYOUT_IDS[1]  # 1 -> eigen layout
-
-            # write log starting
-            response_log = {}
-            response_log["usr"] = message["usr"]
-            response_log["id"] = "addLog"
-            response_log["fn"] = "layout"
-            response_log["log"] = {
-                "type": "log",
-                "msg": "Eigenlayout generation running ...",
-            }
-            emit("ex", response_log, room=room)
-
-            # retreive data and get layout positions
-            if layout_id not in GD.session_data["layout"]["results"].keys():
-                if "graph" not in GD.session_data.keys():
-                    GD.session_data["graph"] = util.project_to_graph(GD.data["actPro"])
-                graph = GD.session_data["graph"]
-                result_obj = layout_module.layout_eigen(ordered_graph=graph)
-                if result_obj["success"] is False:
-                    print("ERROR: ", result_obj["error"])
-                    response_log["log"] = result_obj["log"]
-                    emit("ex", response_log, room=room)
-                    return
-
-                GD.session_data["layout"]["results"][layout_id] = result_obj["content"]
-
-            # generate layout textures
-            positions = GD.session_data["layout"]["results"][layout_id]
-            result_obj = layout_module.pos_to_textures(positions)
-            if result_obj["success"] is False:
-                print("ERROR: ", result_obj["error"])
-
-                response_log["log"] = result_obj["log"]
-                emit("ex", response_log, room=room)
-                return
-
-            # write log finish
-            response_log["log"] = {
-                "type": "log",
-                "msg": "Generated Eigenlayout successfully.",
-            }
-            emit("ex", response_log, room=room)
-
-            # display rerun and save buttons
-            response_layout_exists = {}
-            response_layout_exists["usr"] = message["usr"]
-            response_layout_exists["fn"] = "layout"
-            response_layout_exists["id"] = "layoutExists"
-            response_layout_exists["val"] = layout_module.check_layout_exists()
-            emit("ex", response_layout_exists, room=room)
-
-            # update temp layout
-            response = {}
-            response["usr"] = message["usr"]
-            response["fn"] = "updateTempTex"
-            response["textures"] = result_obj["textures"]
-            emit("ex", response, room=room)
-            return
-
-        if message["id"] == "layoutCartoLocalApply":
-            layout_id = layout_module.LAYOUT_IDS[2]  # 2 -> local layout
-
-            # write log starting
-            response_log = {}
-            response_log["usr"] = message["usr"]
-            response_log["id"] = "addLog"
-            response_log["fn"] = "layout"
-            response_log["log"] = {
-                "type": "log",
-                "msg": "cartoGRAPHS Local layout generation running ...",
-            }
-            emit("ex", response_log, room=room)
-
-            # retreive data and get layout positions
-            if layout_id not in GD.session_data["layout"]["results"].keys():
-                if "graph" not in GD.session_data.keys():
-                    GD.session_data["graph"] = util.project_to_graph(GD.data["actPro"])
-                graph = GD.session_data["graph"]
-                result_obj = layout_module.layout_carto_local(ordered_graph=graph)
-                if result_obj["success"] is False:
-                    print("ERROR: ", result_obj["error"])
-                    response_log["log"] = result_obj["log"]
-                    emit("ex", response_log, room=room)
-                    return
-
-                GD.session_data["layout"]["results"][layout_id] = result_obj["content"]
-
-            # generate layout textures
-            positions = GD.session_data["layout"]["results"][layout_id]
-            result_obj = layout_module.pos_to_textures(positions)
-            if result_obj["success"] is False:
-                print("ERROR: ", result_obj["error"])
-
-                response_log["log"] = result_obj["log"]
-                emit("ex", response_log, room=room)
-                return
-
-            # write log finish
-            response_log["log"] = {
-                "type": "log",
-                "msg": "Generated cartoGRAPHS Local layout successfully.",
-            }
-            emit("ex", response_log, room=room)
-
-            # display rerun and save buttons
-            response_layout_exists = {}
-            response_layout_exists["usr"] = message["usr"]
-            response_layout_exists["fn"] = "layout"
-            response_layout_exists["id"] = "layoutExists"
-            response_layout_exists["val"] = layout_module.check_layout_exists()
-            emit("ex", response_layout_exists, room=room)
-
-            # update temp layout
-            response = {}
-            response["usr"] = message["usr"]
-            response["fn"] = "updateTempTex"
-            response["textures"] = result_obj["textures"]
-            emit("ex", response, room=room)
-            return
-
-        if message["id"] == "layoutCartoGlobalApply":
-            layout_id = layout_module.LAYOUT_IDS[3]  # 3 -> global layout
-
-            # write log starting
-            response_log = {}
-            response_log["usr"] = message["usr"]
-            response_log["id"] = "addLog"
-            response_log["fn"] = "layout"
-            response_log["log"] = {
-                "type": "log",
-                "msg": "cartoGRAPHS Global layout generation running ...",
-            }
-            emit("ex", response_log, room=room)
-
-            # retreive data and get layout positions
-            if layout_id not in GD.session_data["layout"]["results"].keys():
-                if "graph" not in GD.session_data.keys():
-                    GD.session_data["graph"] = util.project_to_graph(GD.data["actPro"])
-                graph = GD.session_data["graph"]
-                result_obj = layout_module.layout_carto_global(ordered_graph=graph)
-                if result_obj["success"] is False:
-                    print("ERROR: ", result_obj["error"])
-                    response_log["log"] = result_obj["log"]
-                    emit("ex", response_log, room=room)
-                    return
-
-                GD.session_data["layout"]["results"][layout_id] = result_obj["content"]
-
-            # generate layout textures
-            positions = GD.session_data["layout"]["results"][layout_id]
-            result_obj = layout_module.pos_to_textures(positions)
-            if result_obj["success"] is False:
-                print("ERROR: ", result_obj["error"])
-
-                response_log["log"] = result_obj["log"]
-                emit("ex", response_log, room=room)
-                return
-
-            # write log finish
-            response_log["log"] = {
-                "type": "log",
-                "msg": "Generated cartoGRAPHS Global layout successfully.",
-            }
-            emit("ex", response_log, room=room)
-
-            # display rerun and save buttons
-            response_layout_exists = {}
-            response_layout_exists["usr"] = message["usr"]
-            response_layout_exists["fn"] = "layout"
-            response_layout_exists["id"] = "layoutExists"
-            response_layout_exists["val"] = layout_module.check_layout_exists()
-            emit("ex", response_layout_exists, room=room)
-
-            # update temp layout
-            response = {}
-            response["usr"] = message["usr"]
-            response["fn"] = "updateTempTex"
-            response["textures"] = result_obj["textures"]
-            emit("ex", response, room=room)
-            return
-
-        if message["id"] == "layoutCartoImportanceApply":
-            layout_id = layout_module.LAYOUT_IDS[4]  # 4 -> importance layout
-
-            # write log starting
-            response_log = {}
-            response_log["usr"] = message["usr"]
-            response_log["id"] = "addLog"
-            response_log["fn"] = "layout"
-            response_log["log"] = {
-                "type": "log",
-                "msg": "cartoGRAPHS Importance layout generation running ...",
-            }
-            emit("ex", response_log, room=room)
-
-            # retreive data and get layout positions
-            if layout_id not in GD.session_data["layout"]["results"].keys():
-                if "graph" not in GD.session_data.keys():
-                    GD.session_data["graph"] = util.project_to_graph(GD.data["actPro"])
-                graph = GD.session_data["graph"]
-                result_obj = layout_module.layout_carto_importance(ordered_graph=graph)
-                if result_obj["success"] is False:
-                    print("ERROR: ", result_obj["error"])
-                    response_log["log"] = result_obj["log"]
-                    emit("ex", response_log, room=room)
-                    return
-
-                GD.session_data["layout"]["results"][layout_id] = result_obj["content"]
-
-            # generate layout textures
-            positions = GD.session_data["layout"]["results"][layout_id]
-            result_obj = layout_module.pos_to_textures(positions)
-            if result_obj["success"] is False:
-                print("ERROR: ", result_obj["error"])
-
-                response_log["log"] = result_obj["log"]
-                emit("ex", response_log, room=room)
-                return
-
-            # write log finish
-            response_log["log"] = {
-                "type": "log",
-                "msg": "Generated cartoGRAPHS Importance layout successfully.",
-            }
-            emit("ex", response_log, room=room)
-
-            # display rerun and save buttons
-            response_layout_exists = {}
-            response_layout_exists["usr"] = message["usr"]
-            response_layout_exists["fn"] = "layout"
-            response_layout_exists["id"] = "layoutExists"
-            response_layout_exists["val"] = layout_module.check_layout_exists()
-            emit("ex", response_layout_exists, room=room)
-
-            # update temp layout
-            response = {}
-            response["usr"] = message["usr"]
-            response["fn"] = "updateTempTex"
-            response["textures"] = result_obj["textures"]
-            emit("ex", response, room=room)
-            return
-
-        if message["id"] == "layoutSpectralApply":
-            layout_id = layout_module.LAYOUT_IDS[5]  # 5 -> random layout
-
-            # write log starting
-            response_log = {}
-            response_log["usr"] = message["usr"]
-            response_log["id"] = "addLog"
-            response_log["fn"] = "layout"
-            response_log["log"] = {
-                "type": "log",
-                "msg": "Spectral layout generation running ...",
-            }
-            emit("ex", response_log, room=room)
-
-            # retreive data and get layout positions
-            if layout_id not in GD.session_data["layout"]["results"].keys():
-                if "graph" not in GD.session_data.keys():
-                    GD.session_data["graph"] = util.project_to_graph(GD.data["actPro"])
-                graph = GD.session_data["graph"]
-                result_obj = layout_module.layout_spectral(ordered_graph=graph)
-                if result_obj["success"] is False:
-                    print("ERROR: ", result_obj["error"])
-                    response_log["log"] = result_obj["log"]
-                    emit("ex", response_log, room=room)
-                    return
-
-                GD.session_data["layout"]["results"][layout_id] = result_obj["content"]
-
-            # generate layout textures
-            positions = GD.session_data["layout"]["results"][layout_id]
-            result_obj = layout_module.pos_to_textures(positions)
-            if result_obj["success"] is False:
-                print("ERROR: ", result_obj["error"])
-
-                response_log["log"] = result_obj["log"]
-                emit("ex", response_log, room=room)
-                return
-
-            # write log finish
-            response_log["log"] = {
-                "type": "log",
-                "msg": "Generated spectral layout successfully.",
-            }
-            emit("ex", response_log, room=room)
-
-            # display rerun and save buttons
-            response_layout_exists = {}
-            response_layout_exists["usr"] = message["usr"]
-            response_layout_exists["fn"] = "layout"
-            response_layout_exists["id"] = "layoutExists"
-            response_layout_exists["val"] = layout_module.check_layout_exists()
-            emit("ex", response_layout_exists, room=room)
-
-            # update temp layout
-            response = {}
-            response["usr"] = message["usr"]
-            response["fn"] = "updateTempTex"
-            response["textures"] = result_obj["textures"]
-            emit("ex", response, room=room)
+            params.update(client_params)
+            apply_layout(engine, message, room, params)
             return
 
 
@@ -1053,12 +948,7 @@ def ex(message):
                 if message["id"] == "projDD":  # PROJECT CHANGE
                     GD.data["actPro"] = GD.plist[int(message["val"])]
                     GD.saveGD()
-                    GD.loadGD()
-                    GD.loadPFile()
-                    GD.loadPD()
-                    GD.loadColor()
-                    GD.loadLinks()
-                    GD.load_annotations()
+                    async_mode.run_blocking(load_project)
 
                     response["sel"] = message["val"]
                     response["name"] = message["msg"]
@@ -1100,14 +990,8 @@ def ex(message):
                     response2["id"] = message["id"]
                     response2["parent"] = "scrollbox1"
                     response2["fn"] = "makeNodeButton"
-                    response2["val"] = []
                     ids = GD.pfile["selections"][int(message["val"])]["nodes"]
-                    for d in ids:
-                        node = {}
-                        node["name"] = GD.nodes["nodes"][int(d)]["n"]
-                        node["color"] = GD.pixel_valuesc[int(d)]
-                        node["id"] = d
-                        response2["val"].append(node)
+                    response2.update(util.node_button_page(message["id"], ids=ids, room=room))
                     emit("ex", response2, room=room)
 
                 if message["id"] == "layoutModule":
@@ -1172,8 +1056,9 @@ def ex(message):
             GD.pdata[message["id"]] = ""
             print("newGD Variable created")
         if message["val"] != "init":
-            GD.pdata[message["id"]] = message["val"]
-            GD.savePD()
+            # persisted and broadcasted once per tick with the latest value
+            slider_events.push(room, message)
+            return
         response = {}
         response["usr"] = message["usr"]
         response["fn"] = "sli"
@@ -1221,17 +1106,27 @@ def ex(message):
         response2["parent"] = "scrollbox3"
         response2["fn"] = "makeNodeButton"
         response2["nid"] = GD.nodes["nodes"][int(GD.pdata["activeNode"])]["n"]
-        response2["val"] = []
 
         ids = GD.nchildren[int(GD.pdata["activeNode"])]
-        for d in ids:
-            node = {}
-            node["name"] = GD.nodes["nodes"][int(d)]["n"]
-            node["color"] = GD.pixel_valuesc[int(d)]
-            node["id"] = d
-            response2["val"].append(node)
-        print(response2)
+        response2.update(util.node_button_page("children", ids=ids, room=room))
         emit("ex", response2, room=room)
+
+    elif message["fn"] == "nodeButtonPage":
+        # next page of a node button list, requested by a single client when scrolling down its panel
+        response = {}
+        response["usr"] = message["usr"]
+        response["id"] = message["id"]
+        response["parent"] = message["parent"]
+        page = util.node_button_page(message["id"], offset=message["offset"], room=room, token=message.get("token"))
+        if page["success"] is False:
+            # the list was replaced while the client was scrolling, its panel gets the new list with the broadcast
+            response["fn"] = "nodeButtonPage"
+            response["error"] = page["error"]
+            emit("ex", response)
+            return
+        response["fn"] = "makeNodeButton"
+        response.update(page)
+        emit("ex", response)
     else:
         emit("ex", message, room=room)
 
@@ -0,0 +1,101 @@
+"""
+Serving mode of the socket server
+
+The mode is selected with the environment variable DATADIVR_ASYNC_MODE:
+    "threading" (default): Flask-SocketIO threading server, one OS thread per request
+    "eventlet": green threads, thousands of concurrent clients on one worker
+    "gevent": green threads via gevent
+
+This module has to be imported before flask and everything else in app.py, since eventlet and gevent
+monkey patch the standard library (sockets, threading, time) on import.
+
+Blocking work (file I/O, layout algorithms, PIL texture generation) must not run on a green thread,
+otherwise it stalls every connected client until it returns. Wrap it into run_blocking() which hands it
+to a native thread pool in the green modes and simply calls it in threading mode.
+"""
+import collections
+import os
+
+ASYNC_MODES = ["threading", "eventlet", "gevent"]
+
+ASYNC_MODE = os.environ.get("DATADIVR_ASYNC_MODE", "threading")
+if ASYNC_MODE not in ASYNC_MODES:
+    print("Unknown DATADIVR_ASYNC_MODE '" + ASYNC_MODE + "', falling back to 'threading'.")
+    ASYNC_MODE = "threading"
+
+if ASYNC_MODE == "eventlet":
+    import eventlet
+    import eventlet.tpool
+
+    eventlet.monkey_patch()
+elif ASYNC_MODE == "gevent":
+    import gevent
+    from gevent import monkey
+
+    monkey.patch_all()
+
+
+def run_blocking(fn, *args, **kwargs):
+    """
+    executes fn(*args, **kwargs) without blocking the event loop and returns its result
+    exceptions raised by fn are re-raised in the caller
+    """
+    if ASYNC_MODE == "eventlet":
+        return eventlet.tpool.execute(fn, *args, **kwargs)
+    if ASYNC_MODE == "gevent":
+        return gevent.get_hub().threadpool.apply(fn, args, kwargs)
+    return fn(*args, **kwargs)
+
+
+class HubRelay:
+    """
+    hands calls from the native threads of run_blocking() back to a green thread of the hub
+    Emitting through socket.io from a native thread is unsafe in the green modes (it can deadlock or lose
+    messages), so put() only queues the arguments (deque appends are thread safe) and a background task of the
+    socketio server calls fn(*args) for them on the hub. In threading mode put() calls fn directly.
+    socketio: flask_socketio.SocketIO, starts and paces the background task
+    fn: function, called on the hub with the arguments of put()
+    interval: float, seconds between two polls of the queue
+    usage: relay.start(), run_blocking(work using relay.put), relay.close() (flushes the rest and stops the task)
+    """
+    def __init__(self, socketio, fn, interval=0.05):
+        self.socketio = socketio
+        self.fn = fn
+        self.interval = interval
+        self.items = collections.deque()
+        self.running = False
+        self.task = None
+
+    def put(self, *args):
+        if ASYNC_MODE == "threading":
+            self.fn(*args)
+            return
+        self.items.append(args)
+
+    def flush(self):
+        while len(self.items) > 0:
+            args = self.items.popleft()
+            try:
+                self.fn(*args)
+            except Exception as e:
+                print("ERROR: relayed call failed:", e)
+
+    def drain(self):
+        while self.running:
+            self.flush()
+            self.socketio.sleep(self.interval)
+        self.flush()
+
+    def start(self):
+        if ASYNC_MODE == "threading":
+            return
+        self.running = True
+        self.task = self.socketio.start_background_task(self.drain)
+
+    def close(self):
+        # called on the hub after the blocking work returned, every queued call is done when it returns
+        self.running = False
+        if self.task is not None:
+            self.task.join()
+            self.task = None
+        self.flush()
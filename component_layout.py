@@ -0,0 +1,178 @@
+"""
+Per-component 3D layout with packing
+
+Biological networks are often one giant component plus thousands of small islands. Laying them out as one graph
+lets the islands drift to the border and squashes them when the result is normalized to [0, 1]. Instead:
+
+    split:   connected components (scipy csgraph), nodes grouped by component
+    layout:  components with up to TRIVIAL_SIZE nodes get fixed shapes (point, pair)
+             components with up to DENSE_SIZE nodes are laid out in batches of equal size with a dense
+             spring-electrical model (all pairs, vectorized over the batch)
+             bigger components use the multilevel force layout (force_layout.py), one task each
+             tasks run in a process pool (joblib) if the graph is big enough to pay for the worker start
+    packing: all layouts use the natural spring length force_layout.K, so their sizes are comparable. Every
+             layout is turned flat along z, the bounding boxes are packed tallest first into rows, rows into
+             layers (shelf packing in 3D), so the giant component sits in the first layer and islands do not
+             get squashed when the result is normalized
+
+Works on a scipy CSR adjacency matrix, node i is row i.
+"""
+import numpy as np
+import scipy.sparse as sp_sp
+from joblib import Parallel, delayed
+from scipy.sparse import csgraph
+
+import force_layout
+
+K = force_layout.K
+TRIVIAL_SIZE = 2  # components up to this many nodes get fixed shapes
+DENSE_SIZE = 64  # components up to this many nodes are laid out with the dense batch layout
+DENSE_CHUNK = 2000000  # max. node pairs of one dense batch
+DENSE_ITERATIONS = 100
+DENSE_COOLING = 0.95
+MARGIN = 2 * K  # space between the bounding boxes of two components
+PACK_WIDTH = 1.2  # width of a packing layer relative to the cube root of the total box volume
+POOL_MIN_NODES = 20000  # smaller graphs are laid out in process, starting the workers would dominate
+N_JOBS = -1  # workers of the process pool, -1 = one per cpu
+
+
+def split_components(adjacency) -> tuple:
+    """
+    returns (labels, order, starts, sizes):
+    component label per node, node ids grouped by component, start of every component in order, component sizes
+    """
+    count, labels = csgraph.connected_components(adjacency, directed=False)
+    order = np.argsort(labels, kind="stable")
+    sizes = np.bincount(labels, minlength=count)
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    return labels, order, starts, sizes
+
+
+def trivial_layout(size) -> np.ndarray:
+    if size == 1:
+        return np.zeros((1, 3))
+    return np.array([[0, 0, 0], [K, 0, 0]], dtype=np.float64)
+
+
+def dense_layouts(adjacency, seed) -> np.ndarray:
+    """
+    spring-electrical layout of a batch of equally sized components
+    adjacency: (batch, m, m) array of link weights
+    returns: (batch, m, 3) array of positions
+    """
+    rng = np.random.default_rng(seed)
+    batch, m, _ = adjacency.shape
+    positions = rng.random((batch, m, 3)) * K * m ** (1 / 3)
+    others = ~np.eye(m, dtype=bool)
+    scale = force_layout.REPULSION * K * K
+    step = K
+    for iteration in range(DENSE_ITERATIONS):
+        # pair distances and forces by matrix products, the (batch, m, m, 3) differences are never built
+        squared = np.einsum("bik,bik->bi", positions, positions)
+        distance2 = squared[:, :, None] + squared[:, None, :] - 2 * positions @ positions.transpose(0, 2, 1)
+        distance2 = np.maximum(distance2, 1e-9)
+        # repulsion C K^2 / d and attraction d^2 / K along (p_i - p_j) / d
+        strength = np.where(others, scale / distance2, 0) - adjacency * np.sqrt(distance2) / K
+        force = positions * strength.sum(axis=2)[:, :, None] - strength @ positions
+        norm = np.sqrt(np.einsum("bik,bik->bi", force, force))
+        positions = positions + step * force / np.maximum(norm, 1e-12)[:, :, None]
+        step *= DENSE_COOLING
+    return positions
+
+
+def component_task(kind, data, seed) -> list:
+    # runs in a worker, returns the list of positions of the components of the task
+    if kind == "dense":
+        return list(dense_layouts(data, seed))
+    return [force_layout.multilevel_layout(data, seed=seed)]
+
+
+def pack(extents) -> np.ndarray:
+    """
+    shelf packing of boxes: tallest first into rows along x, rows along y into layers, layers along z
+    extents: (c, 3) array of box sizes (margin included), flattest along z for dense layers
+    returns: (c, 3) array of the min. corners of the boxes
+    """
+    offsets = np.zeros_like(extents)
+    if len(extents) == 0:
+        return offsets
+    # layers a bit wider than the cube of the total volume come out about cubic, the layers are not filled up
+    width = max(extents[:, :2].max(), PACK_WIDTH * np.prod(extents, axis=1).sum() ** (1 / 3))
+    x = y = z = 0.0
+    row_depth = layer_height = 0.0
+    for i in np.lexsort((-extents[:, 1], -extents[:, 2])):
+        size_x, size_y, size_z = extents[i]
+        if x > 0 and x + size_x > width:
+            x, y, row_depth = 0.0, y + row_depth, 0.0
+            if y + size_y > width:
+                y, z, layer_height = 0.0, z + layer_height, 0.0
+        offsets[i] = (x, y, z)
+        x += size_x
+        row_depth = max(row_depth, size_y)
+        layer_height = max(layer_height, size_z)
+    return offsets
+
+
+def component_layout(adjacency, seed=None, n_jobs=None) -> np.ndarray:
+    """
+    adjacency: scipy sparse, symmetric adjacency matrix
+    seed: int, optional, random seed
+    n_jobs: int, optional, workers of the process pool, default N_JOBS for graphs of POOL_MIN_NODES or more
+    returns: (n, 3) array of positions (not scaled)
+    """
+    rng = np.random.default_rng(seed)
+    adjacency = sp_sp.csr_matrix(adjacency, dtype=np.float64)
+    n = adjacency.shape[0]
+    if n == 0:
+        return np.zeros((0, 3))
+    labels, order, starts, sizes = split_components(adjacency)
+
+    # local index of every node inside its component
+    rank = np.empty(n, dtype=np.int64)
+    rank[order] = np.arange(n)
+    local = rank - starts[labels]
+
+    layouts = [None] * len(sizes)
+    for component in np.flatnonzero(sizes <= TRIVIAL_SIZE):
+        layouts[component] = trivial_layout(sizes[component])
+
+    # tasks as (kind, data, seed, components), biggest first so that the pool ends evenly
+    tasks = []
+    coo = adjacency.tocoo()
+    link_sizes = sizes[labels[coo.row]]
+    for size in np.unique(sizes[(sizes > TRIVIAL_SIZE) & (sizes <= DENSE_SIZE)])[::-1]:
+        components = np.flatnonzero(sizes == size)
+        batch_index = np.full(len(sizes), -1, dtype=np.int64)
+        batch_index[components] = np.arange(len(components))
+        dense = np.zeros((len(components), size, size))
+        links = link_sizes == size
+        dense[batch_index[labels[coo.row[links]]], local[coo.row[links]], local[coo.col[links]]] = coo.data[links]
+        per_chunk = max(1, DENSE_CHUNK // (size * size))
+        for chunk in range(0, len(components), per_chunk):
+            tasks.append(
+                ("dense", dense[chunk : chunk + per_chunk], rng.integers(2**32), components[chunk : chunk + per_chunk])
+            )
+    for component in np.flatnonzero(sizes > DENSE_SIZE):
+        nodes = order[starts[component] : starts[component] + sizes[component]]
+        tasks.append(("multilevel", adjacency[nodes][:, nodes], rng.integers(2**32), [component]))
+    tasks.sort(key=lambda task: -task[1].shape[0] if task[0] == "multilevel" else 0)
+
+    if n_jobs is None:
+        n_jobs = N_JOBS if n >= POOL_MIN_NODES and len(tasks) > 1 else 1
+    results = Parallel(n_jobs=n_jobs, prefer="processes")(
+        delayed(component_task)(kind, data, task_seed) for kind, data, task_seed, components in tasks
+    )
+    for (kind, data, task_seed, components), positions in zip(tasks, results):
+        for component, component_positions in zip(components, positions):
+            layouts[component] = component_positions
+
+    # turn every layout so that its extent is largest along x and smallest along z, then pack the bounding boxes
+    for component, layout in enumerate(layouts):
+        layouts[component] = layout[:, np.argsort(layout.min(axis=0) - layout.max(axis=0), kind="stable")]
+    lows = np.array([layout.min(axis=0) for layout in layouts])
+    extents = np.array([layout.max(axis=0) for layout in layouts]) - lows + MARGIN
+    offsets = pack(extents) - lows
+    grouped = np.concatenate(layouts) + np.repeat(offsets, sizes, axis=0)
+    positions = np.empty((n, 3))
+    positions[order] = grouped
+    return positions
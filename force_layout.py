@@ -0,0 +1,293 @@
+"""
+Multilevel force directed 3D layout for large graphs
+
+Spring-electrical model (attraction d^2 / K along links, repulsion C K^2 / d between all nodes) as in
+Hu, "Efficient and high quality force-directed graph drawing" (2005), vectorized in numpy:
+
+    coarsening: every node points to the neighbour with the highest random priority (or itself), pointer
+                jumping collapses the pointer trees into clusters, the clusters form the next coarser graph
+                (link weights and node masses are summed), repeated until the graph is small
+    layout:     the coarsest graph starts random, every finer level starts from the positions of its cluster
+                and is relaxed with few iterations and an adaptive step length
+    repulsion:  Barnes-Hut on an octree given by Morton codes. Far field is evaluated leaf cell to cell
+                (pairs expanded level by level, in chunks), near field between the nodes of a leaf
+                (exact for small leaves, sampled for big ones)
+
+Works on a scipy CSR adjacency matrix, node i is row i. Nodes without links are placed randomly afterwards.
+"""
+import numpy as np
+import scipy.sparse as sp_sp
+
+COARSEST_SIZE = 100  # stop coarsening below this many nodes
+STALL_RATIO = 0.95  # stop coarsening if a level removes less than 5% of the nodes
+MAX_LEVELS = 40
+
+K = 1.0  # natural spring length
+REPULSION = 0.2  # C of the spring-electrical model
+THETA = 1.2  # Barnes-Hut opening criterion, cell size / distance
+LEAF_SIZE = 16  # average nodes per octree leaf, sets the octree depth
+MAX_DEPTH = 10  # 30 bit morton codes
+NEAR_SAMPLES = 16  # near field partners per node, exact for leaves up to NEAR_SAMPLES + 1 nodes
+PAIR_CHUNK = 2000000  # max. (leaf, cell) pairs held at once
+
+ITERATION_BUDGET = 3e7  # iterations per level ~ budget / (nodes + links)
+MIN_ITERATIONS = 10
+MAX_ITERATIONS = 300
+COOLING = 0.9
+
+
+def coarsen(adjacency, mass, rng) -> tuple:
+    """
+    returns (mapping, coarse adjacency, coarse mass), mapping: cluster index of every node
+    """
+    n = adjacency.shape[0]
+    priority = rng.permutation(n)
+    node_of_priority = np.argsort(priority)
+
+    # highest priority among each node and its neighbours
+    best = priority.copy()
+    has_neighbours = np.diff(adjacency.indptr) > 0
+    if adjacency.nnz > 0:
+        row_max = np.maximum.reduceat(priority[adjacency.indices], adjacency.indptr[:-1][has_neighbours])
+        best[has_neighbours] = np.maximum(best[has_neighbours], row_max)
+    parent = node_of_priority[best]
+
+    # priorities increase along the pointers, jumping ends at the local maxima (roots)
+    while True:
+        grandparent = parent[parent]
+        if np.array_equal(grandparent, parent):
+            break
+        parent = grandparent
+    _, mapping = np.unique(parent, return_inverse=True)
+    count = int(mapping.max()) + 1
+
+    assign = sp_sp.csr_matrix((np.ones(n), (np.arange(n), mapping)), shape=(n, count))
+    coarse = (assign.T @ adjacency @ assign).tocoo()
+    off_diagonal = coarse.row != coarse.col
+    coarse = sp_sp.csr_matrix(
+        (coarse.data[off_diagonal], (coarse.row[off_diagonal], coarse.col[off_diagonal])), shape=(count, count)
+    )
+    return mapping, coarse, np.bincount(mapping, weights=mass, minlength=count)
+
+
+def spread_bits(values) -> np.ndarray:
+    # inserts two zero bits between the lowest 21 bits of values
+    values = values.astype(np.int64) & 0x1FFFFF
+    values = (values | values << 32) & 0x1F00000000FFFF
+    values = (values | values << 16) & 0x1F0000FF0000FF
+    values = (values | values << 8) & 0x100F00F00F00F00F
+    values = (values | values << 4) & 0x10C30C30C30C30C3
+    values = (values | values << 2) & 0x1249249249249249
+    return values
+
+
+class Octree:
+    """
+    octree levels 1..depth over positions given by Morton codes
+    per level: sorted cell codes, mass, center of mass and range of child cells in the next level
+    """
+
+    def __init__(self, positions, mass):
+        n = len(positions)
+        self.depth = int(np.clip(np.ceil(np.log(max(n / LEAF_SIZE, 1)) / np.log(8)), 1, MAX_DEPTH))
+        low = positions.min(axis=0)
+        self.size = max(float((positions.max(axis=0) - low).max()), 1e-9) * (1 + 1e-6)
+        grid = np.clip(((positions - low) / self.size * 2**self.depth).astype(np.int64), 0, 2**self.depth - 1)
+        codes = spread_bits(grid[:, 0]) | spread_bits(grid[:, 1]) << 1 | spread_bits(grid[:, 2]) << 2
+
+        # nodes sorted along the curve, leaves are runs of equal codes
+        self.order = np.argsort(codes, kind="stable")
+        sorted_codes = codes[self.order]
+        leaf_starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+        self.leaf_starts = leaf_starts
+        self.leaf_sizes = np.diff(np.r_[leaf_starts, n])
+        self.node_leaf = np.repeat(np.arange(len(leaf_starts)), self.leaf_sizes)  # per sorted node
+
+        weighted = positions[self.order] * mass[self.order, None]
+        self.codes = {self.depth: sorted_codes[leaf_starts]}
+        self.mass = {self.depth: np.add.reduceat(mass[self.order], leaf_starts)}
+        self.moment = {self.depth: np.add.reduceat(weighted, leaf_starts, axis=0)}
+        self.children = {}
+        for level in range(self.depth - 1, 0, -1):
+            parents = self.codes[level + 1] >> 3
+            starts = np.flatnonzero(np.r_[True, parents[1:] != parents[:-1]])
+            self.codes[level] = parents[starts]
+            self.mass[level] = np.add.reduceat(self.mass[level + 1], starts)
+            self.moment[level] = np.add.reduceat(self.moment[level + 1], starts, axis=0)
+            self.children[level] = (starts, np.r_[starts[1:], len(parents)])
+        self.center = {level: self.moment[level] / self.mass[level][:, None] for level in self.mass.keys()}
+
+    def far_field(self, scale) -> np.ndarray:
+        """returns the repulsive field (force per unit mass) at every leaf from all other leaves"""
+        leaf_center = self.center[self.depth]
+        leaf_codes = self.codes[self.depth]
+        field = np.zeros_like(leaf_center)
+        leaf_count = len(leaf_codes)
+        top = len(self.codes[1])
+        chunk = max(1, PAIR_CHUNK // max(top, 8) // 8)
+
+        for chunk_start in range(0, leaf_count, chunk):
+            targets = np.arange(chunk_start, min(chunk_start + chunk, leaf_count))
+            pair_targets = np.repeat(targets, top)
+            pair_cells = np.tile(np.arange(top), len(targets))
+            for level in range(1, self.depth + 1):
+                delta = leaf_center[pair_targets] - self.center[level][pair_cells]
+                distance2 = np.maximum(np.einsum("ij,ij->i", delta, delta), 1e-12)
+                own = (leaf_codes[pair_targets] >> (3 * (self.depth - level))) == self.codes[level][pair_cells]
+                if level == self.depth:
+                    accept = ~own  # own leaf is near field
+                else:
+                    cell_size = self.size / 2**level
+                    accept = ~own & (cell_size * cell_size < THETA * THETA * distance2)
+                strength = scale * self.mass[level][pair_cells[accept]] / distance2[accept]
+                for axis in range(3):
+                    field[:, axis] += np.bincount(
+                        pair_targets[accept], weights=strength * delta[accept, axis], minlength=leaf_count
+                    )
+                if level == self.depth:
+                    break
+
+                # open the remaining cells
+                open_targets = pair_targets[~accept]
+                open_cells = pair_cells[~accept]
+                starts, ends = self.children[level]
+                counts = ends[open_cells] - starts[open_cells]
+                offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+                pair_targets = np.repeat(open_targets, counts)
+                pair_cells = np.repeat(starts[open_cells], counts) + offsets
+        return field
+
+    def near_field(self, positions, mass, scale, rng) -> np.ndarray:
+        """returns the repulsive field at every node from the other nodes of its leaf (sorted node order)"""
+        n = len(positions)
+        sorted_positions = positions[self.order]
+        sorted_mass = mass[self.order]
+        starts = self.leaf_starts[self.node_leaf]
+        sizes = self.leaf_sizes[self.node_leaf]
+        local = np.arange(n) - starts
+        field = np.zeros((n, 3))
+        exact = sizes - 1 <= NEAR_SAMPLES
+        weight = np.where(exact, 1.0, (sizes - 1) / NEAR_SAMPLES)
+        for offset in range(1, NEAR_SAMPLES + 1):
+            shift = np.where(exact, offset, rng.integers(1, np.maximum(sizes, 2)))
+            valid = shift < sizes
+            partners = starts + (local + shift) % np.maximum(sizes, 1)
+            delta = sorted_positions - sorted_positions[partners]
+            distance2 = np.einsum("ij,ij->i", delta, delta)
+            coincident = distance2 < 1e-12
+            if np.any(coincident):
+                delta[coincident] = rng.normal(scale=1e-3, size=(int(coincident.sum()), 3))
+                distance2[coincident] = np.einsum("ij,ij->i", delta[coincident], delta[coincident])
+            strength = np.where(valid, scale * weight * sorted_mass[partners] / distance2, 0)
+            field += strength[:, None] * delta
+        unsorted = np.empty_like(field)
+        unsorted[self.order] = field
+        return unsorted
+
+
+def relax(adjacency, mass, positions, iterations, step, rng, progress=None, to_full=None) -> np.ndarray:
+    """
+    force directed iterations with Hu's adaptive step length
+    progress: object with due() and update(positions), optional, receives to_full(positions) when due
+    """
+    coo = adjacency.tocoo()
+    rows, cols, weights = coo.row, coo.col, coo.data
+    n = len(positions)
+    scale = REPULSION * K * K
+    energy = np.inf
+    improved = 0
+    for iteration in range(iterations):
+        octree = Octree(positions, mass)
+        force = octree.far_field(scale)[octree.node_leaf]
+        unsorted_force = np.empty_like(force)
+        unsorted_force[octree.order] = force
+        force = (unsorted_force + octree.near_field(positions, mass, scale, rng)) * mass[:, None]
+
+        # attraction along links, every link appears in both directions
+        delta = positions[cols] - positions[rows]
+        length = np.sqrt(np.einsum("ij,ij->i", delta, delta))
+        strength = weights * length / K
+        for axis in range(3):
+            force[:, axis] += np.bincount(rows, weights=strength * delta[:, axis], minlength=n)
+
+        norm = np.sqrt(np.einsum("ij,ij->i", force, force))
+        positions = positions + step * force / np.maximum(norm, 1e-12)[:, None]
+
+        previous_energy, energy = energy, float(np.dot(norm, norm))
+        if energy < previous_energy:
+            improved += 1
+            if improved >= 5:
+                improved = 0
+                step /= COOLING
+        else:
+            improved = 0
+            step *= COOLING
+        if progress is not None and progress.due():
+            progress.update(to_full(positions))
+    return positions
+
+
+def iterations_for(adjacency) -> int:
+    return int(np.clip(ITERATION_BUDGET / (adjacency.shape[0] + adjacency.nnz), MIN_ITERATIONS, MAX_ITERATIONS))
+
+
+def multilevel_layout(adjacency, seed=None, progress=None) -> np.ndarray:
+    """
+    adjacency: scipy sparse, symmetric adjacency matrix (weights are used as spring strengths)
+    seed: int, optional, random seed
+    progress: object with due() -> bool and update(positions), optional, receives intermediate (n, 3) positions
+              of all nodes (coarse levels shown at full size) whenever due() returns True
+    returns: (n, 3) array of positions (not scaled)
+    """
+    rng = np.random.default_rng(seed)
+    adjacency = sp_sp.csr_matrix(adjacency, dtype=np.float64)
+    n = adjacency.shape[0]
+    connected = np.flatnonzero(np.diff(adjacency.indptr) > 0)
+    isolated = np.flatnonzero(np.diff(adjacency.indptr) == 0)
+    isolated_offsets = rng.random((len(isolated), 3))
+    positions = np.empty((n, 3))
+    if len(connected) == 0:
+        positions[:] = isolated_offsets * K * max(n, 1) ** (1 / 3)
+        return positions
+
+    # coarsening
+    graphs = [adjacency[connected][:, connected]]
+    masses = [np.ones(len(connected))]
+    mappings = []
+    while graphs[-1].shape[0] > COARSEST_SIZE and len(graphs) < MAX_LEVELS:
+        mapping, coarse, coarse_mass = coarsen(graphs[-1], masses[-1], rng)
+        if coarse.shape[0] > STALL_RATIO * graphs[-1].shape[0]:
+            break
+        mappings.append(mapping)
+        graphs.append(coarse)
+        masses.append(coarse_mass)
+
+    # cluster of every connected node per level
+    clusters = [np.arange(len(connected))]
+    for mapping in mappings:
+        clusters.append(mapping[clusters[-1]])
+
+    def to_full(layout, level):
+        # positions of all nodes from the layout of a level, nodes without links spread over the bounding box
+        full = np.empty((n, 3))
+        full[connected] = layout[clusters[level]]
+        if len(isolated) > 0:
+            low, high = layout.min(axis=0), layout.max(axis=0)
+            full[isolated] = low + isolated_offsets * (high - low)
+        return full
+
+    # layout from coarse to fine
+    coarsest = len(graphs) - 1
+    layout = rng.random((graphs[-1].shape[0], 3)) * K * max(masses[-1].sum(), 1) ** (1 / 3)
+    layout = relax(
+        graphs[-1], masses[-1], layout, iterations_for(graphs[-1]), K, rng, progress,
+        lambda positions: to_full(positions, coarsest),
+    )
+    for level in range(len(mappings) - 1, -1, -1):
+        layout = layout[mappings[level]] + rng.normal(scale=0.1 * K, size=(graphs[level].shape[0], 3))
+        layout = relax(
+            graphs[level], masses[level], layout, iterations_for(graphs[level]), 0.5 * K, rng, progress,
+            lambda positions, level=level: to_full(positions, level),
+        )
+
+    return to_full(layout, 0)
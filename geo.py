@@ -0,0 +1,146 @@
+"""
+Vectorized geographic projections for "_geo" layouts
+
+Latitude / longitude in degrees are projected to 3D node positions in [0, 1]:
+
+    "geocentric":      points on the WGS84 ellipsoid (globe), every axis scaled to [0, 1] on its own
+    "equirectangular": plate carree map, x = longitude, y = latitude, flat at z = 0.5
+    "mercator":        Web Mercator map (EPSG:3857), latitudes clipped to +-85.0511 degrees, flat at z = 0.5
+
+Maps keep their aspect ratio (both axes share one scale and are centered). All functions work on numpy arrays,
+millions of points project in well under a second.
+
+The coordinates of a project are stored as (n, 2) array (lat, lon) in GEO_FILE of the project folder, written on
+upload. Projects without the file fall back to the "lat" / "lon" fields of the nodes, missing values are NaN.
+"""
+import os
+
+import numpy as np
+
+import GlobalData as GD
+
+PROJECTIONS = ["geocentric", "equirectangular", "mercator"]
+GEO_FILE = "geo.npy"
+
+WGS84_A = 6378137.0  # semi major axis in metres
+WGS84_RF = 298.257223563  # reciprocal flattening
+HEIGHT = 124.0  # height above the ellipsoid in metres
+MERCATOR_MAX_LAT = 85.0511287798
+
+
+def parse_latlon(data) -> tuple:
+    """
+    returns (lat, lon) float arrays of a list of [lat, lon, ...] rows (numbers or strings)
+    """
+    if len(data) == 0:
+        return np.zeros(0), np.zeros(0)
+    try:
+        values = np.asarray([row[:2] for row in data], dtype=np.float64)
+    except ValueError:
+        values = np.array([[float(row[0]), float(row[1])] for row in data])
+    return values[:, 0], values[:, 1]
+
+
+def geocentric(lat, lon, height=HEIGHT) -> np.ndarray:
+    # (n, 3) cartesian coordinates on the WGS84 ellipsoid in metres, y mirrored as the textures expect
+    phi = np.radians(lat)
+    lam = np.radians(lon)
+    sin_phi = np.sin(phi)
+    e2 = 1 - (1 - 1 / WGS84_RF) ** 2  # eccentricity squared
+    n = WGS84_A / np.sqrt(1 - e2 * sin_phi**2)  # prime vertical radius
+    r = (n + height) * np.cos(phi)  # distance from the z axis
+    return np.stack([r * np.cos(lam), -r * np.sin(lam), (n * (1 - e2) + height) * sin_phi], axis=1)
+
+
+def equirectangular(lat, lon) -> np.ndarray:
+    return np.stack([np.asarray(lon, dtype=np.float64), np.asarray(lat, dtype=np.float64), np.zeros(len(lat))], axis=1)
+
+
+def mercator(lat, lon) -> np.ndarray:
+    phi = np.radians(np.clip(lat, -MERCATOR_MAX_LAT, MERCATOR_MAX_LAT))
+    x = WGS84_A * np.radians(lon)
+    y = WGS84_A * np.log(np.tan(np.pi / 4 + phi / 2))
+    return np.stack([x, y, np.zeros(len(phi))], axis=1)
+
+
+def normalize(points, keep_aspect=False) -> np.ndarray:
+    """
+    scales (n, 3) points into [0, 1], NaN rows stay NaN
+    keep_aspect: one scale for all axes, centered, otherwise every axis on its own (constant axes at 0.5)
+    """
+    points = np.asarray(points, dtype=np.float64)
+    if len(points) == 0 or np.all(np.isnan(points)):
+        return points
+    low = np.nanmin(points, axis=0)
+    extent = np.nanmax(points, axis=0) - low
+    if keep_aspect:
+        scale = extent.max() if extent.max() > 0 else 1.0
+        return (points - low) / scale + (1 - extent / scale) / 2
+    scaled = np.full(points.shape, 0.5)
+    varying = extent > 0
+    scaled[:, varying] = (points[:, varying] - low[varying]) / extent[varying]
+    scaled[np.isnan(points)] = np.nan
+    return scaled
+
+
+def project(lat, lon, projection="geocentric") -> np.ndarray:
+    """
+    returns the (n, 3) node positions in [0, 1] of lat / lon in degrees
+    projection: str, one of PROJECTIONS
+    """
+    if projection not in PROJECTIONS:
+        raise ValueError("unknown projection " + str(projection))
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    if projection == "geocentric":
+        return normalize(geocentric(lat, lon))
+    if projection == "equirectangular":
+        return normalize(equirectangular(lat, lon), keep_aspect=True)
+    return normalize(mercator(lat, lon), keep_aspect=True)
+
+
+def to_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def save_latlon(project_name, lat, lon):
+    # stores the coordinates of a project, called on upload
+    np.save("static/projects/" + project_name + "/" + GEO_FILE, np.stack([lat, lon], axis=1).astype(np.float64))
+    forget_latlon(project_name)
+
+
+def remove_latlon(project_name):
+    # deletes stored coordinates, called on uploads without geo layout so a re-upload does not keep stale ones
+    path = "static/projects/" + project_name + "/" + GEO_FILE
+    if os.path.exists(path):
+        os.remove(path)
+    forget_latlon(project_name)
+
+
+def forget_latlon(project_name):
+    # drops the cached coordinates if the project is active
+    if GD.data.get("actPro") == project_name:
+        GD.session_data.pop("geo", None)
+
+
+def load_latlon() -> tuple:
+    """
+    returns (lat, lon) arrays of all nodes of the active project (NaN where unknown), cached in session_data
+    """
+    if "geo" not in GD.session_data.keys():
+        count = len(GD.nodes["nodes"])
+        path = "static/projects/" + GD.data["actPro"] + "/" + GEO_FILE
+        values = np.full((count, 2), np.nan)
+        if os.path.exists(path):
+            stored = np.load(path)
+            values[: min(count, len(stored))] = stored[:count]
+        else:
+            for column, key in enumerate(["lat", "lon"]):
+                values[:, column] = np.fromiter(
+                    (to_float(node.get(key)) for node in GD.nodes["nodes"]), dtype=np.float64, count=count
+                )
+        GD.session_data["geo"] = (values[:, 0], values[:, 1])
+    return GD.session_data["geo"]
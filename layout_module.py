@@ -2,21 +2,35 @@
 Functions for Layout  Module
 """
 import GlobalData as GD
+import hashlib
+import json
+import os
 import networkx as nx
 from PIL import Image
 import util
+import textures
+import spatial
+import force_layout
+import component_layout
+import spectral_layout
+import geo
 import numpy as np
 import scipy.sparse as sp_sp
 import umap
 from cartoGRAPHs import generate_layout as carto_gen_layout
 import random
+import time
 
 
 
-# constants, important to keep the order
-LAYOUT_IDS = ["random", "eigen", "local", "global", "importance", "spectral"] # ids used in session data
-LAYOUT_NAMES = ["Random Layout", "EigenUMAPLayout", "cartoGRAPHsLocal", "cartoGRAPHsImportance", "Spectral"] # names used for texture generation  !!! not implemented yet !!!
-LAYOUT_TABS = ["Random", "Eigenlayout", "cartoGRAPHs Local", "cartoGRAPHs Global", "cartoGRAPHs Importance", "Spectral"] # names used in panel display and in connect_socketIO_main.js to switch tabs
+# constants LAYOUT_IDS, LAYOUT_NAMES and LAYOUT_TABS are derived from the registry LAYOUT_ENGINES at the end of the file
+
+
+LAYOUT_CACHE_DIR = "layoutCache" # folder in the project holding persistent layout results (.npy)
+LAYOUT_CACHE_VERSION = 3 # increase when an algorithm changes, invalidates all cached results
+UNCACHED_LAYOUTS = ["random", "geo"] # computing is cheaper than reading
+RECOMPUTED_LAYOUTS = ["geo"] # results are not reused within the session either, coordinates change on re-upload
+SPECTRAL_NX_MAX_NODES = 2000 # bigger graphs use the randomized sparse spectral embedding
 
 
 
@@ -36,7 +50,7 @@ The return object will look like this:
     [
         {
             "channel": str, ("nodeRGB", "linkRGB", "layoutNodeHi", "layoutNodeLow"), type of texture
-            "path": str, path to texture
+            "path": str, path to texture (or "data", "format", "size" if sent inline, see textures.py)
         }
     ],
     "content": misc, any result data 
@@ -97,6 +111,44 @@ def hide_log():
 def save_layout_temp():...
 
 
+def layout_cache_path(layout_id: str, params: dict = None)->str:
+    """
+    path of the persistent result of a layout algorithm on the active graph
+    keyed by graph fingerprint (node count and links), algorithm and its parameters
+    """
+    key = json.dumps(
+        {"graph": util.graph_fingerprint(), "layout": layout_id, "params": params or {}, "version": LAYOUT_CACHE_VERSION},
+        sort_keys=True,
+    )
+    digest = hashlib.sha1(key.encode()).hexdigest()
+    return "static/projects/" + GD.data["actPro"] + "/" + LAYOUT_CACHE_DIR + "/" + layout_id + "_" + digest + ".npy"
+
+def load_cached_layout(layout_id: str, params: dict = None)->list:
+    # returns scaled positions of an earlier run on the same graph or None
+    if layout_id in UNCACHED_LAYOUTS:
+        return None
+    path = layout_cache_path(layout_id, params)
+    if not os.path.exists(path):
+        return None
+    try:
+        positions = np.load(path)
+    except (OSError, ValueError):
+        return None
+    if positions.shape != (len(GD.nodes["nodes"]), 3):
+        return None
+    return positions.tolist()
+
+def save_cached_layout(layout_id: str, positions: list, params: dict = None):
+    # stores scaled positions of a layout run in the project folder
+    if layout_id in UNCACHED_LAYOUTS:
+        return
+    path = layout_cache_path(layout_id, params)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = path[:-len(".npy")] + ".tmp.npy"
+    np.save(temp_path, np.asarray(positions, dtype=np.float64))
+    os.replace(temp_path, path) # never leave a half written result behind
+
+
 def adjust_point_positions(points, displacement_factor=3e-2):
     return {key: [coord + random.gauss(0, displacement_factor) for coord in coords]
             for key, coords in points.items()}
@@ -126,57 +178,223 @@ def scale_positions(positions, node_order: list, pos_type: type = int)->list:
     ] for node_id in node_order]
     return scaled_positions
 
+def scale_position_array(positions: np.ndarray)->np.ndarray:
+    # vectorized scale_positions for (n, 3) arrays ordered by node id
+    low = positions.min(axis=0)
+    extent = positions.max(axis=0) - low
+    extent[extent == 0] = 1
+    return (positions - low) / extent
+
+def layout_textures(positions)->list:
+    """
+    encodes scaled positions into layout textures (based on the active layout) and saves them or sends them inline
+    returns the texture objects [low, hi] for updateTempTex
+    """
+    ### low refers to the texture layoutsl !!!!
+    current_layout_low = Image.open("static/projects/"+ GD.data["actPro"] + "/layoutsl/"+ GD.pfile["layouts"][int(GD.pdata["layoutsDD"])]+"l.bmp","r")
+    current_layout_hi = Image.open("static/projects/"+ GD.data["actPro"] + "/layouts/"+ GD.pfile["layouts"][int(GD.pdata["layoutsDD"])]+".bmp","r")
+    updated_layout_hi, updated_layout_low = textures.position_images(positions, current_layout_hi, current_layout_low)
+
+    # save new layouts (or send them inline)
+    path_low = "static/projects/"+ GD.data["actPro"]  + "/layoutsl/templ.bmp"
+    path_hi = "static/projects/"+ GD.data["actPro"]  + "/layouts/temp.bmp"
+    texture_low = textures.temp_texture(updated_layout_low, path_low, "layoutNodesLow", "BMP")
+    texture_hi = textures.temp_texture(updated_layout_hi, path_hi, "layoutNodesHi", "BMP")
+
+    # close images
+    current_layout_low.close()
+    current_layout_hi.close()
+    updated_layout_low.close()
+    updated_layout_hi.close()
+    return [texture_low, texture_hi]
+
 def pos_to_textures(positions)->dict:
     # takes scaled positions list and generates layout textures for nodes
     try:
-        ### low refers to the texture layoutsl !!!!
-        # copy old layouts
-        current_layout_low = Image.open("static/projects/"+ GD.data["actPro"] + "/layoutsl/"+ GD.pfile["layouts"][int(GD.pdata["layoutsDD"])]+"l.bmp","r")
-        current_layout_hi = Image.open("static/projects/"+ GD.data["actPro"] + "/layouts/"+ GD.pfile["layouts"][int(GD.pdata["layoutsDD"])]+".bmp","r")
-        updated_layout_low = current_layout_low.copy()
-        updated_layout_hi = current_layout_hi.copy()
-
-        # decompose positions
-        pos_low = []
-        pos_hi = []
-        for node_pos in positions:
-            x = int(float(node_pos[0]) * 65280)
-            y = int(float(node_pos[1]) * 65280)
-            z = int(float(node_pos[2]) * 65280)
-            x_hi = int(x / 255)
-            y_hi = int(y / 255)
-            z_hi = int(z / 255)
-            x_low = x % 255
-            y_low = y % 255
-            z_low = z % 255
-            pos_low.append((x_low, y_low, z_low))
-            pos_hi.append((x_hi, y_hi, z_hi))
-
-        # save new layouts
-        updated_layout_low.putdata(pos_low)
-        updated_layout_hi.putdata(pos_hi)
-        path_low = "static/projects/"+ GD.data["actPro"]  + "/layoutsl/templ.bmp"
-        path_hi = "static/projects/"+ GD.data["actPro"]  + "/layouts/temp.bmp"
-        updated_layout_low.save(path_low, "BMP")
-        updated_layout_hi.save(path_hi, "BMP")
-
-        # close images
-        current_layout_low.close()
-        current_layout_hi.close()
-        updated_layout_low.close()
-        updated_layout_hi.close()
-
-        # output texture dictionary
-        return {"success": True, "textures":
-            [
-                {"channel": "layoutNodesLow", "path": path_low}, 
-                {"channel": "layoutNodesHi", "path": path_hi}
-            ]
-        }
-    
+        layout_texture_list = layout_textures(positions)
     except: 
         return {"success": False, "error": "Texture generation failed.", "log": {"type": "warning", "msg": "Layout texture generation failed."}} 
 
+    # spatial queries follow the displayed layout, a failing index does not fail the written textures
+    try:
+        spatial.update_positions(positions)
+    except Exception as e:
+        print("ERROR: spatial index update failed:", e)
+
+    # output texture dictionary
+    return {"success": True, "textures": layout_texture_list}
+
+
+class ProgressStream:
+    """
+    streams intermediate positions of iterative layouts to the clients as temp layout textures
+    send: function(texture objects), emits the updateTempTex message
+    min_interval: float, min. seconds between two frames, grows so that encoding takes at most max_share of the time
+    iterative algorithms ask due() before assembling positions and call update(positions) if it returns True
+    """
+    def __init__(self, send, min_interval=1.0, max_share=0.1):
+        self.send = send
+        self.min_interval = min_interval
+        self.max_share = max_share
+        self.interval = min_interval
+        self.last = time.perf_counter()
+        self.frames = 0
+
+    def due(self)->bool:
+        return time.perf_counter() - self.last >= self.interval
+
+    def update(self, positions):
+        start = time.perf_counter()
+        try:
+            self.send(layout_textures(util.place_label_nodes(scale_position_array(np.asarray(positions, dtype=np.float64)))))
+            self.frames += 1
+        except Exception as e:
+            print("ERROR: layout progress frame failed:", e)
+        cost = time.perf_counter() - start
+        self.interval = max(self.min_interval, cost / self.max_share)
+        self.last = time.perf_counter()
+
+
+class LayoutEngine:
+    """
+    a layout algorithm of the layout module, registered in LAYOUT_ENGINES
+    layout_id: str, key of the results in session data and in the layout cache
+    tab: str, name of the panel tab, the buttons are "layout" + button + "Apply" (see templates/mLayout.html)
+    button: str
+    name: str, name used in log messages
+    texture_name: str, name used for texture generation
+    run: function(ordered_graph=None, [progress,] **params) -> layout return object (see above)
+    params: dict, parameters of run with their defaults, clients may override them (cast to the default's type)
+    graph_max_nodes: int, the networkx graph is built for run up to this many nodes (None = always, 0 = never)
+    max_nodes, max_links: int, optional, bigger networks are refused without running
+    cost: function(nodes, links) -> float, expected seconds, shown in the log
+    streams: bool, run takes a ProgressStream as progress
+    variants: dict, optional, further apply buttons "layout" + button + variant + "Apply" -> params they set
+    """
+    def __init__(self, layout_id, tab, button, name, texture_name, run, params=None, graph_max_nodes=0, max_nodes=None, max_links=None, cost=None, streams=False, variants=None):
+        self.layout_id = layout_id
+        self.tab = tab
+        self.button = button
+        self.name = name
+        self.texture_name = texture_name
+        self.run = run
+        self.params = params or {}
+        self.graph_max_nodes = graph_max_nodes
+        self.max_nodes = max_nodes
+        self.max_links = max_links
+        self.cost = cost
+        self.streams = streams
+        self.variants = variants or {}
+
+    def parameters(self, overrides: dict = None)->dict:
+        """
+        defaults updated by known client parameters, each cast to the type of its default
+        raises ValueError naming the parameter if a client value does not fit (not a number, not finite, ...)
+        """
+        params = dict(self.params)
+        for key, value in (overrides or {}).items():
+            if key not in params.keys():
+                continue
+            default = params[key]
+            try:
+                if isinstance(default, bool):
+                    if str(value).lower() not in ["true", "false", "1", "0"]:
+                        raise ValueError(value)
+                    params[key] = str(value).lower() in ["true", "1"]
+                elif isinstance(default, (int, float)):
+                    number = float(value)
+                    if isinstance(value, bool) or not np.isfinite(number):
+                        raise ValueError(value)
+                    if isinstance(default, int):
+                        if not number.is_integer():
+                            raise ValueError(value)
+                        number = int(number)
+                    params[key] = number
+                else:
+                    params[key] = type(default)(value)
+            except (TypeError, ValueError, OverflowError):
+                raise ValueError("Invalid value " + repr(value)[:40] + " for parameter " + key + " of " + self.name + ".")
+        return params
+
+    def check_limits(self, n_nodes: int, n_links: int)->dict:
+        # returns None or the return object refusing the network
+        if (self.max_nodes is not None and n_nodes >= self.max_nodes) or (self.max_links is not None and n_links >= self.max_links):
+            return {"success": False, "error": "Network too large for real-time computation of " + self.name + ". (No error!)", "log": {"type": "warning", "msg": "Network too large for real-time computation of " + self.name + ", use the Spectral layout instead."}}
+        return None
+
+    def estimate(self, n_nodes: int, n_links: int)->str:
+        # expected run time for the log, empty if unknown
+        if self.cost is None:
+            return ""
+        seconds = self.cost(n_nodes, n_links)
+        if seconds < 1:
+            return " (expected: less than a second)"
+        if seconds < 120:
+            return " (expected: about " + str(int(round(seconds))) + " s)"
+        return " (expected: about " + str(int(round(seconds / 60))) + " min)"
+
+
+def get_layout_engine(button_id: str)->tuple:
+    # returns (engine, params) of an apply button id ("layout" + button + [variant] + "Apply") or (None, None)
+    for engine in LAYOUT_ENGINES:
+        if button_id == "layout" + engine.button + "Apply":
+            return engine, {}
+        for variant, params in engine.variants.items():
+            if button_id == "layout" + engine.button + variant + "Apply":
+                return engine, dict(params)
+    return None, None
+
+def generate_layout(engine: LayoutEngine, params: dict = None, progress: ProgressStream = None)->dict:
+    """
+    runs a registered layout on the active project, the common pipeline of all layout algorithms:
+    session results, size limits, persistent cache, networkx graph if needed, run, store results
+    params: dict, optional, client overrides of engine.params
+    progress: ProgressStream, optional, used if the engine streams
+    returns the layout return object, "content" holds the scaled positions
+    """
+    if "layout" not in GD.session_data.keys():
+        GD.session_data["layout"] = {}
+    for key in ["results", "params"]:
+        if key not in GD.session_data["layout"].keys():
+            GD.session_data["layout"][key] = {}
+    results = GD.session_data["layout"]["results"]
+    try:
+        params = engine.parameters(params)
+    except ValueError as e:
+        return {"success": False, "error": str(e), "log": {"type": "warning", "msg": str(e)}}
+
+    # results of this session
+    reusable = engine.layout_id not in RECOMPUTED_LAYOUTS and engine.layout_id in results.keys()
+    if reusable and GD.session_data["layout"]["params"].get(engine.layout_id) == params:
+        return {"success": True, "content": results[engine.layout_id]}
+
+    n_nodes = len(GD.nodes["nodes"])
+    refusal = engine.check_limits(n_nodes, len(GD.links["links"]))
+    if refusal is not None:
+        return refusal
+
+    # persistent result of an earlier run on the same graph
+    cached = load_cached_layout(engine.layout_id, params)
+    if cached is None:
+        kwargs = dict(params)
+        if engine.graph_max_nodes is None or n_nodes <= engine.graph_max_nodes:
+            if "graph" not in GD.session_data.keys():
+                GD.session_data["graph"] = util.project_to_graph(GD.data["actPro"])
+            kwargs["ordered_graph"] = GD.session_data["graph"]
+        if engine.streams:
+            kwargs["progress"] = progress
+        result_obj = engine.run(**kwargs)
+        if result_obj["success"] is False:
+            return result_obj
+        cached = result_obj["content"]
+        save_cached_layout(engine.layout_id, cached, params)
+
+    # label nodes sit at the centroids of their clusters (also for results cached before labels were placed)
+    cached = util.place_label_nodes(cached).tolist()
+    results[engine.layout_id] = cached
+    GD.session_data["layout"]["params"][engine.layout_id] = params
+    return {"success": True, "content": cached}
+
 
 def layout_random(ordered_graph)->dict:
     """
@@ -205,110 +423,99 @@ def layout_random(ordered_graph)->dict:
     except:
         return {"success": False, "error": "Random layout algorithm failed.", "log": {"type": "log", "msg": "Random layout generation failed."}}
 
-def layout_eigen(ordered_graph)->dict:
+EIGEN_SOLVERS = ["eigsh", "lobpcg"]
+
+def eigen_features(n_lam: int = 18, solver: str = "eigsh")->np.ndarray:
     """
-    Random Layout Generation Function
+    returns the (n_nodes, n_lam) feature matrix of the eigenlayout: eigenvectors of I - L (L: normalized Laplacian)
+    for the n_lam largest eigenvalues, largest first, rows in node id order
+    built from the cached sparse adjacency, cached in session_data and in the layout cache folder so that UMAP
+    parameter changes reuse it
+    solver: str, "eigsh" (ARPACK) or "lobpcg" (faster on very large graphs)
     """
-    def eigenlayout(G, dim=3, n_lam=18, n_neighs=10, spread=1.0, method="cosine"):
-        """
-        Compute the UMAP layout of a graph based on its normalized Laplacian matrix.
-
-        Parameters:
-        -----------
-        G : NetworkX graph object
-            The input graph.
-        dim : int, optional (default=3)
-            The number of dimensions in the UMAP projection.
-        n_lam : int, optional (default=18)
-            The number of eigenvalues and eigenvectors to use in the spectral dimensionality reduction.
-        n_neighs : int, optional (default=10)
-            The number of nearest neighbors to use in the UMAP algorithm.
-        spread : float, optional (default=1.0)
-            The spread of the UMAP projection.
-        method: : str, default: 'cosine', also possible "manhattan", "euclidean"
-        Returns:
-        --------
-        d_umap_pos : dictionary with graph nodes as keys and aray - shape: (n_nodes, dim) as values
-            The UMAP projection of the graph nodes as a numpy array.
-        """
-        if n_lam > G.number_of_nodes()-1:
-            print('The number of Eigenvectors must be smaller than the number of nodes - 1!')
-            print('Please provide a smaller number. (Not more than 0.1xnumber_of_nodes recommended)')
-
-        # Compute the normalized Laplacian matrix
-        M_laplace = nx.normalized_laplacian_matrix(G, sorted(G.nodes()))
-
-        # Construct the matrix M_ImL = I - L where L is the normalized Laplacian matrix and I is the identity matrix
-        n_nodes = G.number_of_nodes()
-        Id = sp_sp.identity(n_nodes)
-        M_ImL = Id - M_laplace
-
-        # Compute the n_lam smallest eigenvalues and eigenvectors of M_ImL
-        # M_V: #rows = #nodes and #cols = #eigenvls 
-        Lam,M_V = sp_sp.linalg.eigsh(M_ImL,k=n_lam)
-
-        # FEATURE VECTOR
-        # re-sort M_V by desc Lam - 1st column: eigenvec for largest Eigenvalue ...
-        N = n_lam
-
-        rev_ordered_idx = np.argsort(Lam)
-        # spectral dimensional reduction:
-        f_vec_1 = [x.real for x in M_V[:,rev_ordered_idx[-1]]]
-        arr = f_vec_1
-
-        for m in range(2,N+1):
-            f_vec_2 = [x.real for x in M_V[:,rev_ordered_idx[-m]]]
-            arr = np.vstack((arr,f_vec_2))
-
-        # # UMAP
-        FX = arr.transpose().astype(np.float64)
-        mind = .2
+    key = (util.graph_fingerprint(), n_lam, solver)
+    if "eigen" in GD.session_data.keys() and GD.session_data["eigen"]["key"] == key:
+        return GD.session_data["eigen"]["features"]
+
+    path = layout_cache_path("eigenvectors", {"n_lam": n_lam, "solver": solver})
+    features = None
+    if os.path.exists(path):
+        try:
+            features = np.load(path)
+        except (OSError, ValueError):
+            features = None
+    if features is None:
+        adjacency = util.graph_csr()
+        n_nodes = adjacency.shape[0]
+        degree = np.asarray(adjacency.sum(axis=1)).ravel()
+        inv_sqrt_degree = np.zeros(n_nodes)
+        inv_sqrt_degree[degree > 0] = 1 / np.sqrt(degree[degree > 0])
+        # I - L = D^-1/2 A D^-1/2
+        M_ImL = sp_sp.diags(inv_sqrt_degree) @ adjacency @ sp_sp.diags(inv_sqrt_degree)
+
+        k = max(1, min(n_lam, n_nodes - 2))
+        if n_nodes <= 5 * k + 1:
+            # too small for the iterative solvers
+            Lam, M_V = np.linalg.eigh(M_ImL.toarray())
+            Lam, M_V = Lam[-k:], M_V[:, -k:]
+        elif solver == "lobpcg":
+            rng = np.random.default_rng(0)
+            Lam, M_V = sp_sp.linalg.lobpcg(M_ImL, rng.normal(size=(n_nodes, k)), largest=True, tol=1e-5, maxiter=500)
+        else:
+            Lam, M_V = sp_sp.linalg.eigsh(M_ImL, k=k, which="LA")
+
+        # FEATURE VECTOR: eigenvectors by descending eigenvalue
+        features = np.ascontiguousarray(M_V[:, np.argsort(Lam)[::-1]].real, dtype=np.float64)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = path[:-len(".npy")] + ".tmp.npy"
+        np.save(temp_path, features)
+        os.replace(temp_path, path) # an interrupted write never leaves a truncated cache file
+
+    GD.session_data["eigen"] = {"key": key, "features": features}
+    return features
+
+def layout_eigen(ordered_graph=None, n_lam=18, n_neighs=10, spread=1.0, min_dist=0.2, method="cosine", solver="eigsh")->dict:
+    """
+    Eigenlayout: UMAP projection of the top eigenvectors of I - L (L: normalized Laplacian)
+    works on the cached sparse adjacency of the active project, ordered_graph is not needed
+    n_lam: int, number of eigenvectors (features)
+    n_neighs, spread, min_dist: UMAP parameters
+    method: str, UMAP metric, "cosine", "manhattan" or "euclidean"
+    solver: str, see EIGEN_SOLVERS
+    """
+    def umap_layout(features, dim, metric):
         reducer = umap.UMAP(
             n_components=dim,
             n_neighbors=n_neighs,
-            metric=method,
-            min_dist=mind,
+            metric=metric,
+            min_dist=min_dist,
             spread=spread,
             low_memory=True,
             force_approximation_algorithm=True,
             verbose=True
         )
+        return reducer.fit_transform(features)
 
-        umap_pos = reducer.fit_transform(FX)
-        d_node_pos = {}
-
-        for i, node in enumerate(sorted(G.nodes())):
-            d_node_pos[node] = umap_pos[i,:]
-
-        return d_node_pos
-
-
-    # integrety checks
-    if not isinstance(ordered_graph, util.OrderedGraph):
-        return {"success": False, "error": "Graph is not instance of OrderedGraph class."}
-    
     # boundary checks
-    # no check set yet
+    if solver not in EIGEN_SOLVERS:
+        return {"success": False, "error": "Unknown eigensolver " + str(solver) + ".", "log": {"type": "warning", "msg": "Unknown eigensolver."}}
+    if n_lam > len(GD.nodes["nodes"]) - 1:
+        print('The number of Eigenvectors must be smaller than the number of nodes - 1!')
+        print('Please provide a smaller number. (Not more than 0.1xnumber_of_nodes recommended)')
 
     # actual layout to get node positions
     try:
-        method = "cusine"
+        features = eigen_features(n_lam=n_lam, solver=solver)
         try:
-            layout = eigenlayout(G=ordered_graph, dim=3, n_lam=18, n_neighs=10, spread=1.0, method=method)
+            positions = umap_layout(features, 3, method)
         except:
-            method = "euclidean"
-            layout = eigenlayout(G=ordered_graph, dim=3, n_lam=18, n_neighs=10, spread=1.0, method=method)
-        
-        positions = []
-        for node in ordered_graph.node_order:
-            pos = layout[node]
-            positions.append([pos[0], pos[1], pos[2]])
-        
-        # scale positions
-        scaled_pos = scale_positions(positions=positions, node_order=ordered_graph.node_order)
+            positions = umap_layout(features, 3, "euclidean")
+
+        # scale positions, rows are in node id order already
+        scaled_pos = scale_position_array(np.asarray(positions, dtype=np.float64))
 
         # return positions
-        return {"success": True, "content": scaled_pos}
+        return {"success": True, "content": scaled_pos.tolist()}
     except:
         return {"success": False, "error": "Eigenlayout algorithm failed.", "log": {"type": "warning", "msg": "Eigenlayout generation failed."}}
     
@@ -322,8 +529,7 @@ def layout_carto_local(ordered_graph)->dict:
         return {"success": False, "error": "Graph is not instance of OrderedGraph class."}
     
     # boundary checks
-    if len(ordered_graph.nodes()) >= 15000 or len(ordered_graph.edges()) >= 80000:
-        return {"success": False, "error": "Network too large for real-time computation of cartoGRAPHs Importance layout. (No error!)", "log": {"type": "warning", "msg": "Network too large for real-time computation of cartoGRAPHs Importance layout."}}
+    # see max_nodes and max_links in LAYOUT_ENGINES
     
     # actual layout to get node positions
     try:
@@ -349,8 +555,7 @@ def layout_carto_global(ordered_graph)->dict:
         return {"success": False, "error": "Graph is not instance of OrderedGraph class."}
     
     # boundary checks
-    if len(ordered_graph.nodes()) >= 15000 or len(ordered_graph.edges()) >= 80000:
-        return {"success": False, "error": "Network too large for real-time computation of cartoGRAPHs Importance layout. (No error!)", "log": {"type": "warning", "msg": "Network too large for real-time computation of cartoGRAPHs Importance layout."}}
+    # see max_nodes and max_links in LAYOUT_ENGINES
 
     # actual layout to get node positions
     try:
@@ -377,8 +582,7 @@ def layout_carto_importance(ordered_graph)->dict:
         return {"success": False, "error": "Graph is not instance of OrderedGraph class."}
     
     # boundary checks
-    if len(ordered_graph.nodes()) >= 15000 or len(ordered_graph.edges()) >= 80000:
-        return {"success": False, "error": "Network too large for real-time computation of cartoGRAPHs Importance layout. (No error!)", "log": {"type": "warning", "msg": "Network too large for real-time computation of cartoGRAPHs Importance layout."}}
+    # see max_nodes and max_links in LAYOUT_ENGINES
     
     # actual layout to get node positions
     try:
@@ -396,19 +600,25 @@ def layout_carto_importance(ordered_graph)->dict:
 
 
 
-def layout_spectral(ordered_graph: util.OrderedGraph)->dict:
+def layout_spectral(ordered_graph: util.OrderedGraph = None)->dict:
     """
     Spectral Layout Generation Function
+    networkx spectral layout for small graphs, randomized sparse spectral embedding (see spectral_layout.py) on the
+    cached adjacency for graphs with more than SPECTRAL_NX_MAX_NODES nodes or if ordered_graph is None
     """
     # integrety checks
-    if not isinstance(ordered_graph, util.OrderedGraph):
+    if ordered_graph is not None and not isinstance(ordered_graph, util.OrderedGraph):
         return {"success": False, "error": "Graph is not instance of OrderedGraph class."}
     
     # boundary checks
-    # no check set yet
+    # none, the randomized embedding needs O(nodes * dimensions) memory
 
     # actual layout to get node positions
     try:
+        if ordered_graph is None or len(ordered_graph.nodes()) > SPECTRAL_NX_MAX_NODES:
+            positions = spectral_layout.spectral_embedding(util.graph_csr(), dim=3, seed=0)
+            return {"success": True, "content": scale_position_array(positions).tolist()}
+
         layout = nx.spectral_layout(G=ordered_graph, dim=3)
         positions = []
         for node in ordered_graph.node_order:
@@ -417,8 +627,106 @@ def layout_spectral(ordered_graph: util.OrderedGraph)->dict:
         
         # scale positions
         scaled_pos = scale_positions(positions=positions, node_order=ordered_graph.node_order)
-        print(scaled_pos)
         # return positions
         return {"success": True, "content": scaled_pos}
     except:
         return {"success": False, "error": "Spectral layout algorithm failed.", "log": {"type": "log", "msg": "Spectral layout generation failed."}}
+
+
+
+def layout_geo(ordered_graph=None, projection: str = "geocentric")->dict:
+    """
+    Geographic layout: projection of the lat / lon coordinates of the nodes (see geo.py)
+    nodes without coordinates are placed at the center, ordered_graph is not needed
+    projection: str, see geo.PROJECTIONS
+    """
+    # boundary checks
+    if projection not in geo.PROJECTIONS:
+        return {"success": False, "error": "Unknown projection " + str(projection) + ".", "log": {"type": "warning", "msg": "Unknown projection."}}
+    lat, lon = geo.load_latlon()
+    known = ~(np.isnan(lat) | np.isnan(lon))
+    if not np.any(known):
+        return {"success": False, "error": "Project has no geographic coordinates.", "log": {"type": "warning", "msg": "Project has no geographic coordinates (lat, lon)."}}
+
+    # actual layout to get node positions
+    try:
+        positions = np.full((len(lat), 3), 0.5)
+        positions[known] = geo.project(lat[known], lon[known], projection)
+
+        # return positions, already in [0, 1], maps keep their aspect ratio
+        return {"success": True, "content": positions.tolist()}
+    except:
+        return {"success": False, "error": "Geographic layout failed.", "log": {"type": "warning", "msg": "Geographic layout generation failed."}}
+
+
+
+def layout_multilevel(ordered_graph=None, progress: ProgressStream = None)->dict:
+    """
+    Multilevel force directed layout (Barnes-Hut, see force_layout.py) for large graphs
+    works on the cached sparse adjacency of the active project, ordered_graph is not needed
+    progress: ProgressStream, optional, receives intermediate positions
+    """
+    # boundary checks
+    # none, scales to millions of nodes
+
+    # actual layout to get node positions
+    try:
+        positions = force_layout.multilevel_layout(util.graph_csr(), progress=progress)
+
+        # scale positions
+        scaled_pos = scale_position_array(positions)
+
+        # return positions
+        return {"success": True, "content": scaled_pos.tolist()}
+    except:
+        return {"success": False, "error": "Multilevel force layout algorithm failed.", "log": {"type": "warning", "msg": "Multilevel force layout generation failed."}}
+
+
+
+def layout_components(ordered_graph=None)->dict:
+    """
+    Per-component layout (see component_layout.py), connected components are laid out separately in a process pool
+    and packed in 3D by size, works on the cached sparse adjacency of the active project, ordered_graph is not needed
+    """
+    # boundary checks
+    # none, big components use the multilevel force layout
+
+    # actual layout to get node positions
+    try:
+        positions = component_layout.component_layout(util.graph_csr())
+
+        # scale positions
+        scaled_pos = scale_position_array(positions)
+
+        # return positions
+        return {"success": True, "content": scaled_pos.tolist()}
+    except:
+        return {"success": False, "error": "Component layout algorithm failed.", "log": {"type": "warning", "msg": "Component layout generation failed."}}
+
+
+
+# registry of layout algorithms, the order is the order of the panel tabs (GD.pdata["layoutModule"]), important to keep
+# cost: rough seconds on one core, cartoGRAPHs and UMAP dominate their layouts
+LAYOUT_ENGINES = [
+    LayoutEngine("random", "Random", "Random", "random layout", "Random Layout", layout_random, graph_max_nodes=None, cost=lambda n, m: 1e-5 * n),
+    LayoutEngine(
+        "eigen", "Eigenlayout", "Eigen", "Eigenlayout", "EigenUMAPLayout", layout_eigen,
+        params={"n_lam": 18, "n_neighs": 10, "spread": 1.0, "min_dist": 0.2, "method": "cosine", "solver": "eigsh"},
+        cost=lambda n, m: 5 + 2e-4 * n + 2e-6 * m,
+    ),
+    LayoutEngine("local", "cartoGRAPHs Local", "CartoLocal", "cartoGRAPHS Local layout", "cartoGRAPHsLocal", layout_carto_local, graph_max_nodes=None, max_nodes=15000, max_links=80000, cost=lambda n, m: 10 + 5e-3 * n),
+    LayoutEngine("global", "cartoGRAPHs Global", "CartoGlobal", "cartoGRAPHS Global layout", "cartoGRAPHsGlobal", layout_carto_global, graph_max_nodes=None, max_nodes=15000, max_links=80000, cost=lambda n, m: 10 + 5e-3 * n),
+    LayoutEngine("importance", "cartoGRAPHs Importance", "CartoImportance", "cartoGRAPHS Importance layout", "cartoGRAPHsImportance", layout_carto_importance, graph_max_nodes=None, max_nodes=15000, max_links=80000, cost=lambda n, m: 10 + 5e-3 * n),
+    LayoutEngine("spectral", "Spectral", "Spectral", "spectral layout", "Spectral", layout_spectral, graph_max_nodes=SPECTRAL_NX_MAX_NODES, cost=lambda n, m: 3e-5 * (n + m)),
+    LayoutEngine("multilevel", "Multilevel Force", "Multilevel", "multilevel force layout", "MultilevelForceLayout", layout_multilevel, cost=lambda n, m: 2e-5 * (n + m), streams=True),
+    LayoutEngine("components", "Components", "Components", "component layout", "ComponentLayout", layout_components, cost=lambda n, m: 2e-5 * (n + m)),
+    LayoutEngine(
+        "geo", "Geo", "Geo", "geographic layout", "GeoLayout", layout_geo,
+        params={"projection": "geocentric"},
+        cost=lambda n, m: 1e-6 * n,
+        variants={"Globe": {"projection": "geocentric"}, "Map": {"projection": "equirectangular"}, "Mercator": {"projection": "mercator"}},
+    ),
+]
+LAYOUT_IDS = [engine.layout_id for engine in LAYOUT_ENGINES] # ids used in session data
+LAYOUT_NAMES = [engine.texture_name for engine in LAYOUT_ENGINES] # names used for texture generation  !!! not implemented yet !!!
+LAYOUT_TABS = [engine.tab for engine in LAYOUT_ENGINES] # names used in panel display and in connect_socketIO_main.js to switch tabs
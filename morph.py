@@ -0,0 +1,171 @@
+"""
+Morph sequences between two stored layouts
+
+Switching layouts makes the nodes jump. A morph is a sequence of n intermediate layouts between layout a and b
+(pfile["layouts"]) that clients play as temp layout textures:
+
+    "linear":     p(t) = (1 - t) a + t b
+    "procrustes": a is aligned to b by the rigid motion + scale R, s, c minimizing |s R a + c - b| (Kabsch), the
+                  motion is interpolated (slerp of R, s^t, t c) and the aligned positions are blended with b:
+                  p(t) = (1 - t) T_t(a) + t b, T_0 = identity, T_1 = R, s, c
+                  a layout that is mostly a rotated copy of the other turns instead of collapsing through the center
+
+Frames are encoded with the vectorized layout texture codec (textures.position_images) and saved to the "morphs"
+folder of the project, one folder per (a, b, n, mode) and texture modification times, so repeated requests only
+return the paths. Frame t = k / (n + 1) for k = 1 .. n, the end points are the layouts themselves.
+
+Request objects (socket message or http arguments):
+    {"a": layout name or index, "b": layout name or index, "n": int, "mode": "linear" or "procrustes"}
+"""
+import hashlib
+import os
+import threading
+
+import numpy as np
+from PIL import Image
+from scipy.spatial.transform import Rotation, Slerp
+
+import GlobalData as GD
+import textures
+
+MORPH_DIR = "morphs"
+MORPH_MODES = ["linear", "procrustes"]
+MAX_FRAMES = 120
+
+
+def layout_paths(layout) -> tuple:
+    # returns (hi, low) texture paths of a layout given by name or index in pfile["layouts"]
+    if isinstance(layout, int) or (isinstance(layout, str) and layout.isdigit()):
+        layout = GD.pfile["layouts"][int(layout)]
+    if layout not in GD.pfile["layouts"]:
+        raise ValueError("unknown layout " + str(layout))
+    path = "static/projects/" + GD.data["actPro"]
+    return path + "/layouts/" + layout + ".bmp", path + "/layoutsl/" + layout + "l.bmp"
+
+
+def load_layout(layout) -> tuple:
+    # returns (positions, image_hi, image_low) of a stored layout, the images serve as templates of the frames
+    path_hi, path_low = layout_paths(layout)
+    image_hi = Image.open(path_hi, "r")
+    image_low = Image.open(path_low, "r")
+    image_hi.load()
+    image_low.load()
+    positions = textures.decode_positions(image_hi, image_low, len(GD.nodes["nodes"]))
+    return positions, image_hi, image_low
+
+
+def procrustes(source, target) -> tuple:
+    """
+    returns (rotation, scale, translation) with scale * rotation @ source_i + translation ~ target_i (Kabsch, no
+    reflections), rotation as scipy Rotation
+    """
+    source_center = source.mean(axis=0)
+    target_center = target.mean(axis=0)
+    centered_source = source - source_center
+    centered_target = target - target_center
+    u, singular, vt = np.linalg.svd(centered_target.T @ centered_source)
+    correction = np.diag([1.0, 1.0, np.sign(np.linalg.det(u @ vt)) or 1.0])
+    matrix = u @ correction @ vt
+    variance = np.einsum("ij,ij->", centered_source, centered_source)
+    scale = float(np.sum(singular * np.diag(correction)) / variance) if variance > 0 else 1.0
+    translation = target_center - scale * matrix @ source_center
+    return Rotation.from_matrix(matrix), scale, translation
+
+
+def interpolate(source, target, count, mode="linear") -> np.ndarray:
+    """
+    returns the (count, n, 3) array of intermediate positions between source and target (both (n, 3))
+    """
+    steps = np.arange(1, count + 1) / (count + 1)
+    if mode == "linear":
+        return (1 - steps)[:, None, None] * source[None] + steps[:, None, None] * target[None]
+
+    rotation, scale, translation = procrustes(source, target)
+    rotations = Slerp([0, 1], Rotation.concatenate([Rotation.identity(), rotation]))(steps).as_matrix()
+    scales = scale**steps
+    # T_t(a) = s^t R_t (a - c_a) + c_a + t (T_1(c_a) - c_a), the center moves on a straight line
+    center = source.mean(axis=0)
+    moved_center = scale * rotation.apply(center) + translation
+    centered = source - center
+    aligned = (
+        scales[:, None, None] * np.einsum("fij,nj->fni", rotations, centered)
+        + center
+        + steps[:, None, None] * (moved_center - center)
+    )
+    return (1 - steps)[:, None, None] * aligned + steps[:, None, None] * target[None]
+
+
+def morph_folder(path_a, path_b, count, mode) -> str:
+    # folder of the frames, keyed by layouts, their texture modification times, frame count and mode
+    key = "|".join(
+        [GD.data["actPro"], path_a[0], path_b[0], str(count), mode]
+        + [str(os.path.getmtime(path)) for path in path_a + path_b]
+    )
+    digest = hashlib.sha1(key.encode()).hexdigest()
+    return "static/projects/" + GD.data["actPro"] + "/" + MORPH_DIR + "/" + digest
+
+
+def frame_textures(folder, count) -> list:
+    # texture objects [low, hi] of every frame, as used in updateTempTex
+    return [
+        [
+            {"channel": "layoutNodesLow", "path": folder + "/" + str(k) + "l.bmp"},
+            {"channel": "layoutNodesHi", "path": folder + "/" + str(k) + ".bmp"},
+        ]
+        for k in range(count)
+    ]
+
+
+def morph(params) -> dict:
+    """
+    generates (or reuses) the frames of a morph between two layouts of the active project
+    params: dict, request object (see module docstring)
+    returns: {"success": True, "a": str, "b": str, "mode": str, "frames": list of [low, hi] texture objects}
+             or {"success": False, "error": str}
+    """
+    if GD.data["actPro"] == "none":
+        return {"success": False, "error": "No project loaded."}
+    mode = params.get("mode", "linear")
+    if mode not in MORPH_MODES:
+        return {"success": False, "error": "Unknown mode, use one of " + ", ".join(MORPH_MODES) + "."}
+    try:
+        count = int(params.get("n", 30))
+        if count < 1 or count > MAX_FRAMES:
+            raise ValueError("n must be between 1 and " + str(MAX_FRAMES))
+        path_a, path_b = layout_paths(params["a"]), layout_paths(params["b"])
+    except (KeyError, ValueError, TypeError, IndexError) as e:
+        return {"success": False, "error": "Invalid morph: " + str(e)}
+
+    name_a = os.path.basename(path_a[0])[: -len(".bmp")]
+    name_b = os.path.basename(path_b[0])[: -len(".bmp")]
+    folder = morph_folder(path_a, path_b, count, mode)
+    frames = frame_textures(folder, count)
+    result = {"success": True, "a": name_a, "b": name_b, "mode": mode, "frames": frames}
+    if os.path.exists(folder):
+        return result
+
+    source, template_hi, template_low = load_layout(name_a)
+    target, image_hi, image_low = load_layout(name_b)
+    image_hi.close()
+    image_low.close()
+    positions = interpolate(source, target, count, mode)
+
+    # write into a temp folder first, a half written sequence is never served
+    temp_folder = folder + ".tmp" + str(os.getpid()) + "_" + str(threading.get_ident())
+    os.makedirs(temp_folder, exist_ok=True)
+    for k in range(count):
+        frame_hi, frame_low = textures.position_images(positions[k], template_hi, template_low)
+        frame_hi.save(temp_folder + "/" + str(k) + ".bmp", "BMP")
+        frame_low.save(temp_folder + "/" + str(k) + "l.bmp", "BMP")
+        frame_hi.close()
+        frame_low.close()
+    template_hi.close()
+    template_low.close()
+    try:
+        os.replace(temp_folder, folder)
+    except OSError:
+        # another request finished the same sequence first
+        for file_name in os.listdir(temp_folder):
+            os.remove(temp_folder + "/" + file_name)
+        os.rmdir(temp_folder)
+    return result
@@ -0,0 +1,240 @@
+"""
+Concurrent client benchmark for the DataDiVR socket server
+
+Connects N socket.io clients to /main, every client sends M "chatmessage" events (which the server
+broadcasts to the whole room) and measures the round trip until its own message comes back.
+Prints message throughput and latency percentiles as one JSON line, so runs of different serving
+modes can be compared directly.
+
+Reproduce the comparison (same machine, same project, nothing else connected):
+
+    python app.py                                         # threading (default)
+    python python_tools/socket_benchmark.py --label threading --clients 5 --messages 200 --interval 0.05
+
+    DATADIVR_ASYNC_MODE=eventlet python app.py            # eventlet, requires `pip install eventlet`
+    python python_tools/socket_benchmark.py --label eventlet --clients 5 --messages 200 --interval 0.05
+
+Chat echoes never leave the hub, so they only show how the modes schedule cheap events. With --load a separate
+client keeps sending a blocking request (by default the Random layout Apply, which regenerates the layout textures
+through async_mode.run_blocking) and waits for its reply before sending the next one. The chat latencies then show
+how much one busy client stalls everybody else; the result line also reports the round trips of the load client.
+
+    python python_tools/socket_benchmark.py --label eventlet-layout --clients 5 --messages 200 --interval 0.05 --load
+
+Use --load-fn / --load-id / --load-val / --load-reply for other blocking buttons, e.g. a project change:
+
+    --load --load-fn dropdown --load-id projDD --load-val 0 --load-reply project
+
+Use --out to append the result lines to a file. Results of the reference machine are in the README.
+"""
+import argparse
+import json
+import statistics
+import threading
+import time
+
+import requests
+import socketio
+
+
+def connect_client(sio, url, usr):
+    # fetch a session cookie first, the server reads the room from the flask session
+    session = requests.Session()
+    session.get(url + "/home")
+    cookie = "; ".join(key + "=" + value for key, value in session.cookies.items())
+    sio.connect(url, namespaces=["/main"], headers={"Cookie": cookie})
+    sio.emit("join", {"usr": usr}, namespace="/main")
+
+
+class BenchClient:
+    def __init__(self, url, index, messages, interval):
+        self.url = url
+        self.index = index
+        self.usr = "bench" + str(index)
+        self.messages = messages
+        self.interval = interval
+        self.latencies = []
+        self.sent = {}
+        self.done = threading.Event()
+        self.sio = socketio.Client(reconnection=False)
+        self.sio.on("ex", self.on_ex, namespace="/main")
+
+    def connect(self):
+        connect_client(self.sio, self.url, self.usr)
+
+    def on_ex(self, data):
+        if data.get("usr") != self.usr or data.get("fn") != "chatmessage":
+            return
+        start = self.sent.pop(data.get("seq"), None)
+        if start is None:
+            return
+        self.latencies.append(time.perf_counter() - start)
+        if len(self.latencies) == self.messages:
+            self.done.set()
+
+    def run(self):
+        for seq in range(self.messages):
+            self.sent[seq] = time.perf_counter()
+            self.sio.emit(
+                "ex",
+                {"usr": self.usr, "id": "bench", "fn": "chatmessage", "seq": seq, "msg": "benchmark"},
+                namespace="/main",
+            )
+            if self.interval > 0:
+                time.sleep(self.interval)
+
+    def disconnect(self):
+        self.sio.disconnect()
+
+
+class LoadClient:
+    """
+    sends one blocking request after the other until stopped, a request counts as done when the server sends the
+    reply function (reply_fn) for this user, a warning log for this user counts as failed request
+    """
+
+    def __init__(self, url, fn, button_id, val, reply_fn):
+        self.url = url
+        self.usr = "benchload"
+        self.message = {"usr": self.usr, "fn": fn, "id": button_id, "val": val, "msg": "benchmark"}
+        self.reply_fn = reply_fn
+        self.durations = []
+        self.failed = 0
+        self.replied = threading.Event()
+        self.stopped = threading.Event()
+        self.sio = socketio.Client(reconnection=False)
+        self.sio.on("ex", self.on_ex, namespace="/main")
+
+    def connect(self):
+        connect_client(self.sio, self.url, self.usr)
+
+    def on_ex(self, data):
+        if data.get("usr") != self.usr:
+            return
+        if data.get("fn") == self.reply_fn:
+            self.replied.set()
+        elif data.get("id") == "addLog" and data.get("log", {}).get("type") == "warning":
+            self.failed += 1
+            self.replied.set()
+
+    def run(self, timeout):
+        while not self.stopped.is_set():
+            self.replied.clear()
+            failed = self.failed
+            start = time.perf_counter()
+            self.sio.emit("ex", self.message, namespace="/main")
+            if not self.replied.wait(timeout):
+                break
+            if self.failed == failed:
+                self.durations.append(time.perf_counter() - start)
+
+    def disconnect(self):
+        self.sio.disconnect()
+
+
+def percentile(values, p):
+    if len(values) == 0:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def main(url, clients, messages, interval, timeout, label, load=None):
+    """
+    load: dict of LoadClient arguments (fn, button_id, val, reply_fn) or None for chat traffic only
+    """
+    bench_clients = [BenchClient(url, i, messages, interval) for i in range(clients)]
+    for client in bench_clients:
+        client.connect()
+    load_client = None
+    if load is not None:
+        load_client = LoadClient(url, **load)
+        load_client.connect()
+    time.sleep(1)  # let all joins settle
+
+    load_thread = None
+    if load_client is not None:
+        load_thread = threading.Thread(target=load_client.run, args=(timeout,))
+        load_thread.start()
+        # the first request fills the session caches, measure from the second one on
+        while load_thread.is_alive() and len(load_client.durations) + load_client.failed == 0:
+            time.sleep(0.05)
+
+    threads = [threading.Thread(target=client.run) for client in bench_clients]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    deadline = start + timeout
+    for client in bench_clients:
+        client.done.wait(max(0, deadline - time.perf_counter()))
+    wall = time.perf_counter() - start
+
+    if load_client is not None:
+        load_client.stopped.set()
+        load_thread.join()
+        load_client.disconnect()
+    for client in bench_clients:
+        client.disconnect()
+
+    latencies = [l for client in bench_clients for l in client.latencies]
+    received = len(latencies)
+    result = {
+        "label": label,
+        "clients": clients,
+        "messages_per_client": messages,
+        "sent": clients * messages,
+        "received": received,
+        "lost": clients * messages - received,
+        "wall_s": round(wall, 3),
+        "throughput_msg_s": round(received / wall, 1) if wall > 0 else None,
+        # every message is broadcast to the room, so the server delivers clients times as many
+        "fanout_msg_s": round(received * clients / wall, 1) if wall > 0 else None,
+        "latency_ms": {
+            "mean": round(statistics.mean(latencies) * 1000, 2) if received else None,
+            "p50": round(percentile(latencies, 50) * 1000, 2) if received else None,
+            "p95": round(percentile(latencies, 95) * 1000, 2) if received else None,
+            "p99": round(percentile(latencies, 99) * 1000, 2) if received else None,
+            "max": round(max(latencies) * 1000, 2) if received else None,
+        },
+    }
+    if load_client is not None:
+        durations = load_client.durations[1:]
+        result["load"] = {
+            "fn": load_client.message["fn"],
+            "id": load_client.message["id"],
+            "requests": len(durations),
+            "failed": load_client.failed,
+            "mean_ms": round(statistics.mean(durations) * 1000, 2) if durations else None,
+            "max_ms": round(max(durations) * 1000, 2) if durations else None,
+        }
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--messages", type=int, default=100, help="messages per client")
+    parser.add_argument("--interval", type=float, default=0.0, help="seconds between two messages of one client")
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds to wait for outstanding replies")
+    parser.add_argument("--label", default="run", help="name of the serving mode under test")
+    parser.add_argument("--out", default=None, help="append the result line to this file")
+    parser.add_argument("--load", action="store_true", help="run a client that keeps sending a blocking request")
+    parser.add_argument("--load-fn", default="layout", help="fn of the blocking request")
+    parser.add_argument("--load-id", default="layoutRandomApply", help="id of the blocking request")
+    parser.add_argument("--load-val", default="", help="val of the blocking request")
+    parser.add_argument("--load-reply", default="updateTempTex", help="fn of the reply that ends a blocking request")
+    args = parser.parse_args()
+
+    load = None
+    if args.load:
+        load = {"fn": args.load_fn, "button_id": args.load_id, "val": args.load_val, "reply_fn": args.load_reply}
+    result = main(args.url, args.clients, args.messages, args.interval, args.timeout, args.label, load)
+    line = json.dumps(result)
+    print(line)
+    if args.out is not None:
+        with open(args.out, "a") as out_file:
+            out_file.write(line + "\n")
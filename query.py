@@ -0,0 +1,249 @@
+"""
+Attribute filter queries over the nodes of the active project
+
+A query is a boolean expression over node attributes, e.g.
+
+    degree >= 5 and (default:"Club: Mr. Hi" or not lat < 10)
+    id in [0, 100] and not has "apoptosis"
+
+    <field> <op> <number>           numeric comparison, op: < <= > >= == !=
+    <field> in [<low>, <high>]      numeric range, bounds included
+    <type>:<annotation>             node carries annotation of annotation type (GD.annotations[type])
+    has <annotation>                node carries annotation of any type
+    not, and, or, ( )               in this order of precedence
+
+Fields are "degree" (number of links) and every numeric key of the nodes in nodes.json (e.g. "id", "lat", "lon"),
+nodes without the key never match. Annotations and strings may be quoted with " or '.
+
+Queries are evaluated as numpy boolean masks over a columnar copy of the nodes (NodeStore), which is built once
+per project on load, so that queries only touch arrays.
+"""
+import re
+
+import numpy as np
+
+import GlobalData as GD
+
+TOKEN_PATTERN = re.compile(
+    r"""\s*(?:
+    (?P<number>-?\d+(?:\.\d*)?(?:[eE][-+]?\d+)?)
+    |(?P<string>"[^"]*"|'[^']*')
+    |(?P<op><=|>=|==|!=|<|>)
+    |(?P<punct>[()\[\],:])
+    |(?P<word>[^\s()\[\],:<>=!"']+)
+    )""",
+    re.VERBOSE,
+)
+KEYWORDS = ["and", "or", "not", "in", "has"]
+
+
+class QueryError(Exception):
+    pass
+
+
+def tokenize(text) -> list:
+    tokens = []
+    position = 0
+    text = text.strip()
+    while position < len(text):
+        match = TOKEN_PATTERN.match(text, position)
+        if match is None or match.end() == position:
+            raise QueryError("Unexpected character at " + str(position) + ": " + text[position])
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == "string":
+            value = value[1:-1]
+        elif kind == "word" and value.lower() in KEYWORDS:
+            kind, value = "keyword", value.lower()
+        tokens.append((kind, value))
+        position = match.end()
+    return tokens
+
+
+class NodeStore:
+    """columnar view of the nodes: numeric columns, degrees and annotation id arrays, all cached"""
+
+    def __init__(self, nodes, links, annotations):
+        self.nodes = nodes
+        self.count = len(nodes)
+        self.annotations = annotations
+        self.columns = {}
+        self.annotation_ids = {}
+
+        starts = np.fromiter((int(link["s"]) for link in links), dtype=np.int64, count=len(links))
+        ends = np.fromiter((int(link["e"]) for link in links), dtype=np.int64, count=len(links))
+        self.columns["degree"] = (
+            np.bincount(starts, minlength=self.count) + np.bincount(ends, minlength=self.count)
+        )[: self.count].astype(np.float64)
+
+        # one pass over the nodes for all numeric keys, NaN where a node has no (numeric) value
+        for i, node in enumerate(nodes):
+            for key, value in node.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    if key not in self.columns.keys():
+                        self.columns[key] = np.full(self.count, np.nan)
+                    self.columns[key][i] = value
+
+    def column(self, name) -> np.ndarray:
+        if name not in self.columns.keys():
+            raise QueryError("Unknown field: " + name)
+        return self.columns[name]
+
+    def annotation_mask(self, annotation_type, annotation) -> np.ndarray:
+        mask = np.zeros(self.count, dtype=bool)
+        types = [annotation_type] if annotation_type is not None else list(self.annotations.keys())
+        for anno_type in types:
+            if anno_type not in self.annotations.keys():
+                raise QueryError("Unknown annotation type: " + anno_type)
+            key = (anno_type, annotation)
+            if key not in self.annotation_ids.keys():
+                self.annotation_ids[key] = np.asarray(
+                    self.annotations[anno_type].get(annotation, []), dtype=np.int64
+                )
+            mask[self.annotation_ids[key]] = True
+        return mask
+
+
+class Parser:
+    # recursive descent over the tokens, evaluates every node of the expression to a mask right away
+    def __init__(self, tokens, store):
+        self.tokens = tokens
+        self.position = 0
+        self.store = store
+
+    def peek(self) -> tuple:
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return (None, None)
+
+    def take(self, kind=None, value=None) -> str:
+        token_kind, token_value = self.peek()
+        if token_kind is None:
+            raise QueryError("Unexpected end of query")
+        if (kind is not None and token_kind != kind) or (value is not None and token_value != value):
+            raise QueryError("Expected " + str(value or kind) + " but found " + str(token_value))
+        self.position += 1
+        return token_value
+
+    def parse(self) -> np.ndarray:
+        mask = self.parse_or()
+        if self.peek()[0] is not None:
+            raise QueryError("Unexpected " + str(self.peek()[1]))
+        return mask
+
+    def parse_or(self) -> np.ndarray:
+        mask = self.parse_and()
+        while self.peek() == ("keyword", "or"):
+            self.take()
+            mask = mask | self.parse_and()
+        return mask
+
+    def parse_and(self) -> np.ndarray:
+        mask = self.parse_not()
+        while self.peek() == ("keyword", "and"):
+            self.take()
+            mask = mask & self.parse_not()
+        return mask
+
+    def parse_not(self) -> np.ndarray:
+        if self.peek() == ("keyword", "not"):
+            self.take()
+            return ~self.parse_not()
+        return self.parse_atom()
+
+    def parse_atom(self) -> np.ndarray:
+        kind, value = self.peek()
+        if (kind, value) == ("punct", "("):
+            self.take()
+            mask = self.parse_or()
+            self.take("punct", ")")
+            return mask
+        if (kind, value) == ("keyword", "has"):
+            self.take()
+            return self.store.annotation_mask(None, self.take_text())
+
+        name = self.take_text()
+        kind, value = self.peek()
+        if (kind, value) == ("punct", ":"):
+            self.take()
+            return self.store.annotation_mask(name, self.take_text())
+        if kind == "op":
+            self.take()
+            return self.compare(self.store.column(name), value, self.take_number())
+        if (kind, value) == ("keyword", "in"):
+            self.take()
+            self.take("punct", "[")
+            low = self.take_number()
+            self.take("punct", ",")
+            high = self.take_number()
+            self.take("punct", "]")
+            values = self.store.column(name)
+            return (values >= low) & (values <= high)
+        raise QueryError("Expected comparison, range or annotation after " + name)
+
+    def take_text(self) -> str:
+        kind, value = self.peek()
+        if kind not in ["word", "string", "number"]:
+            raise QueryError("Expected name but found " + str(value))
+        self.position += 1
+        return value
+
+    def take_number(self) -> float:
+        try:
+            return float(self.take("number"))
+        except QueryError:
+            raise QueryError("Expected number")
+
+    @staticmethod
+    def compare(values, op, number) -> np.ndarray:
+        # comparisons with NaN are False, so nodes without the key never match (!= included)
+        with np.errstate(invalid="ignore"):
+            if op == "<":
+                return values < number
+            if op == "<=":
+                return values <= number
+            if op == ">":
+                return values > number
+            if op == ">=":
+                return values >= number
+            if op == "==":
+                return values == number
+            return (values != number) & ~np.isnan(values)
+
+
+def build_store():
+    """builds the node store of the active project, called on project load"""
+    GD.session_data["nodeStore"] = {
+        "project": GD.data["actPro"],
+        "store": NodeStore(GD.nodes.get("nodes", []), GD.links.get("links", []), GD.annotations),
+    }
+
+
+def get_store() -> NodeStore:
+    if "nodeStore" not in GD.session_data.keys() or GD.session_data["nodeStore"]["project"] != GD.data["actPro"]:
+        build_store()
+    return GD.session_data["nodeStore"]["store"]
+
+
+def evaluate(text, store=None) -> np.ndarray:
+    """returns the boolean node mask of query text, raises QueryError on invalid queries"""
+    if store is None:
+        store = get_store()
+    tokens = tokenize(text)
+    if len(tokens) == 0:
+        raise QueryError("Empty query")
+    return Parser(tokens, store).parse()
+
+
+def run(text) -> dict:
+    """
+    runs query text on the active project
+    returns: {"success": True, "ids": list of matching node ids} or {"success": False, "error": str}
+    """
+    if GD.data["actPro"] == "none":
+        return {"success": False, "error": "No project loaded."}
+    try:
+        mask = evaluate(text)
+    except QueryError as e:
+        return {"success": False, "error": str(e)}
+    return {"success": True, "ids": np.flatnonzero(mask).tolist()}
@@ -2,37 +2,333 @@ import json
 import os
 
 import csv
-import re
+from bisect import bisect_left
+
+import numpy as np
 
 import GlobalData as GD
 
-def search(term):
-    project = GD.data["actPro"]
-    if project != "none":
-        results = []
-        i = 0
-        
-        nodes = GD.nodes["nodes"]
+GRAM = 3  # length of the n-grams in the substring index
+PAD = "\x01"  # terms are padded (2 in front, 1 behind) so that their first and last characters form n-grams too
+FUZZY_CANDIDATES = 256  # terms sharing the most n-grams with a fuzzy query, rescored by edit distance
+FUZZY_THRESHOLD = 0.6  # minimum similarity of fuzzy matches
+FUZZY_PREFIX_WEIGHT = 0.9  # similarity to the beginning of a longer term counts a bit less than to the whole term
+
+# ranks of a matching term, lower is better
+RANK_EXACT = 0
+RANK_PREFIX = 1
+RANK_SUBSTRING = 2
+
+
+def node_terms(node) -> list:
+    """returns all searchable strings of a node: its name and all string annotations (flat list or typed dict)"""
+    terms = []
+    if isinstance(node.get("n"), str):
+        terms.append(node["n"])
+    attrlist = node.get("attrlist")
+    if isinstance(attrlist, dict):
+        attrlist = [anno for anno_list in attrlist.values() for anno in anno_list]
+    if isinstance(attrlist, list):
+        terms.extend(attr for attr in attrlist if isinstance(attr, str))
+    return terms
+
+
+def pad(term) -> str:
+    return PAD * (GRAM - 1) + term + PAD
+
+
+def edit_distance(a, b) -> int:
+    # optimal string alignment distance: insertions, deletions, substitutions and swaps of neighbours
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        previous2, previous = previous, current
+    return previous[len(b)]
+
+
+def fuzzy_similarity(query, term) -> float:
+    # 1 - normalized edit distance to the whole term or (weighted) to its beginning, for typeahead
+    similarity = 1 - edit_distance(query, term) / max(len(query), len(term))
+    if len(term) > len(query):
+        prefix_similarity = 1 - edit_distance(query, term[: len(query)]) / len(query)
+        similarity = max(similarity, FUZZY_PREFIX_WEIGHT * prefix_similarity)
+    return similarity
+
+
+def gram_codes(terms) -> tuple:
+    """
+    returns (codes, term_ids), one entry per n-gram occurrence in terms
+    an n-gram is packed into an int64 of its code points (21 bit each), terms are processed as fixed width
+    code point matrices, bucketed by length so that long annotations do not inflate the short ones
+    """
+    lengths = np.fromiter(map(len, terms), dtype=np.int64, count=len(terms))
+    widths = np.maximum(GRAM, 2 ** np.ceil(np.log2(np.maximum(lengths, 1))).astype(np.int64))
+    widths[lengths < GRAM] = 0
+    codes = [np.array([], dtype=np.int64)]
+    term_ids = [np.array([], dtype=np.int64)]
+    for width in np.unique(widths[widths > 0]):
+        ids = np.flatnonzero(widths == width)
+        chars = np.array([terms[i] for i in ids], dtype="U" + str(width)).view(np.uint32)
+        chars = chars.reshape(len(ids), width).astype(np.int64)
+        block = np.zeros((len(ids), width - GRAM + 1), dtype=np.int64)
+        for k in range(GRAM):
+            block = block << 21 | chars[:, k : width - GRAM + 1 + k]
+        valid = np.arange(width - GRAM + 1)[None, :] <= (lengths[ids] - GRAM)[:, None]
+        codes.append(block[valid])
+        term_ids.append(np.broadcast_to(ids[:, None], block.shape)[valid])
+    return np.concatenate(codes), np.concatenate(term_ids)
+
+
+class SearchIndex:
+    """
+    Case insensitive inverted n-gram index over node names and annotations.
+
+    The vocabulary holds every distinct lower case term once, each term points to the nodes carrying it
+    (CSR arrays term_ptr/term_nodes). Substring queries intersect the n-gram posting lists of the query and
+    verify the few remaining candidates, prefix queries are a binary search in the sorted vocabulary.
+    Fuzzy queries preselect the terms sharing the most n-grams with the query and rank them by edit distance,
+    which tolerates typos, missing and swapped characters.
+    """
+
+    def __init__(self, nodes):
+        term_ids = {}
+        pair_terms = []
+        pair_nodes = []
         for node in nodes:
-            if "attrlist" in node:
-                for attr in node["attrlist"]:
-                    #contains: 
-                    match = re.search(term, attr, re.IGNORECASE)
-                    #match = re.match(term, attr, re.IGNORECASE)
-                    if match:
-                        res = {"id": node["id"], "name": node["n"], "color": GD.pixel_valuesc[node["id"]] }
-                        results.append(res)
-                        break
-            #else:
-                #print(str(node["id"]) + " does not have attributes")
-        i += 1
-    
-    
+            for term in node_terms(node):
+                term = term.lower()
+                term_id = term_ids.get(term)
+                if term_id is None:
+                    term_id = term_ids[term] = len(term_ids)
+                pair_terms.append(term_id)
+                pair_nodes.append(node["id"])
+
+        self.terms = list(term_ids.keys())
+        self.term_lengths = np.array([len(term) for term in self.terms], dtype=np.int32)
+
+        # term -> nodes as CSR, sorted node ids per term without duplicates
+        pairs = np.unique(np.array(pair_terms, dtype=np.int64) << 32 | np.array(pair_nodes, dtype=np.int64))
+        self.term_nodes = pairs & 0xFFFFFFFF
+        self.term_ptr = np.zeros(len(self.terms) + 1, dtype=np.int64)
+        self.term_ptr[1:] = np.cumsum(np.bincount(pairs >> 32, minlength=len(self.terms)))
+
+        # n-gram code -> sorted term ids without duplicates, posting lists are slices of one array
+        codes, gram_terms = gram_codes([pad(term) for term in self.terms])
+        order = np.lexsort((gram_terms, codes))
+        codes, gram_terms = codes[order], gram_terms[order]
+        keep = np.ones(len(codes), dtype=bool)
+        keep[1:] = (codes[1:] != codes[:-1]) | (gram_terms[1:] != gram_terms[:-1])
+        codes, gram_terms = codes[keep], gram_terms[keep]
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]]) if len(codes) > 0 else np.array([], dtype=int)
+        ends = np.r_[starts[1:], len(codes)]
+        self.postings = {code: gram_terms[start:end] for code, start, end in zip(codes[starts].tolist(), starts, ends)}
+        self.term_gram_counts = np.bincount(gram_terms, minlength=len(self.terms))
+
+        # sorted vocabulary for prefix queries
+        self.sorted_ids = np.array(sorted(range(len(self.terms)), key=self.terms.__getitem__), dtype=np.int64)
+        self.sorted_terms = [self.terms[i] for i in self.sorted_ids]
+
+    def prefix_terms(self, query) -> np.ndarray:
+        start = bisect_left(self.sorted_terms, query)
+        end = bisect_left(self.sorted_terms, query + "\uffff", lo=start)
+        return self.sorted_ids[start:end]
+
+    def substring_terms(self, query) -> np.ndarray:
+        if len(query) < GRAM:
+            # too short for the n-gram index, scan the vocabulary (distinct terms only)
+            return np.array([i for i, term in enumerate(self.terms) if query in term], dtype=np.int64)
+
+        query_grams = set(gram_codes([query])[0].tolist())
+        if any(gram not in self.postings for gram in query_grams):
+            return np.array([], dtype=np.int64)
+        lists = sorted((self.postings[gram] for gram in query_grams), key=len)
+        candidates = lists[0]
+        for posting in lists[1:3]:  # the rarest lists already narrow it down, verification does the rest
+            candidates = np.intersect1d(candidates, posting, assume_unique=True)
+            if len(candidates) == 0:
+                return candidates
+        if len(lists) == 1 and len(query) == GRAM:
+            return candidates
+        return np.array([i for i in candidates if query in self.terms[i]], dtype=np.int64)
+
+    def rank_terms(self, query, term_ids) -> np.ndarray:
+        # sort matching terms by rank (exact, prefix, substring), then by length
+        ranks = np.full(len(term_ids), RANK_SUBSTRING, dtype=np.int8)
+        for k, term_id in enumerate(term_ids):
+            term = self.terms[term_id]
+            if term == query:
+                ranks[k] = RANK_EXACT
+            elif term.startswith(query):
+                ranks[k] = RANK_PREFIX
+        order = np.lexsort((term_ids, self.term_lengths[term_ids], ranks))
+        return term_ids[order]
+
+    def terms_to_nodes(self, term_ids) -> tuple:
+        # expand ranked terms to node ids, keep the first (best) occurrence of every node
+        # returns (node ids, position of the term in term_ids each node was found by)
+        if len(term_ids) == 0:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+        starts = self.term_ptr[term_ids]
+        counts = self.term_ptr[term_ids + 1] - starts
+        positions = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        node_ids = self.term_nodes[positions]
+        _, first = np.unique(node_ids, return_index=True)
+        first = np.sort(first)
+        return node_ids[first], np.repeat(np.arange(len(term_ids)), counts)[first]
+
+    def fuzzy_terms(self, query, threshold=FUZZY_THRESHOLD) -> tuple:
+        # returns (term ids, similarities) of all candidate terms at least threshold similar to query, best first
+        query_grams = np.unique(gram_codes([pad(query)])[0])
+        lists = [self.postings[gram] for gram in query_grams.tolist() if gram in self.postings]
+        if len(lists) == 0:
+            return np.array([], dtype=np.int64), np.array([])
+        term_ids, shared = np.unique(np.concatenate(lists), return_counts=True)
+        if len(term_ids) > FUZZY_CANDIDATES:
+            # most shared n-grams first, ties broken by trigram similarity (shared / all n-grams of both)
+            key = shared + shared / (len(query_grams) + self.term_gram_counts[term_ids] - shared)
+            term_ids = term_ids[np.argpartition(-key, FUZZY_CANDIDATES)[:FUZZY_CANDIDATES]]
+        similarity = np.array([fuzzy_similarity(query, self.terms[i]) for i in term_ids])
+        keep = similarity >= threshold
+        term_ids, similarity = term_ids[keep], similarity[keep]
+        order = np.lexsort((term_ids, self.term_lengths[term_ids], -similarity))
+        return term_ids[order], similarity[order]
+
+    def match_terms(self, query, mode="substring", candidates=None) -> np.ndarray:
+        # unranked ids of the terms matching query, candidates: term ids to filter instead of using the index
+        if candidates is not None:
+            if mode == "prefix":
+                return np.array([i for i in candidates if self.terms[i].startswith(query)], dtype=np.int64)
+            return np.array([i for i in candidates if query in self.terms[i]], dtype=np.int64)
+        if mode == "prefix":
+            return self.prefix_terms(query)
+        return self.substring_terms(query)
+
+    def query(self, term, limit=None, mode="substring", cache=None) -> tuple:
+        """
+        term: str, search term, matched case insensitive
+        limit: int, optional, return only the top limit nodes
+        mode: str, "substring" (term anywhere in a name/annotation), "prefix" (name/annotation starts with term)
+              or "fuzzy" (names/annotations similar to term)
+        cache: dict, optional, last query of a client, updated in place. If term extends that query only its
+               matches are filtered (typeahead), otherwise the index is used
+        returns: (node ids, scores), ranked by best matching term
+                 substring/prefix: exact > prefix > substring match, shorter terms first, score 1.0
+                 fuzzy: 1 - normalized edit distance, at least FUZZY_THRESHOLD
+        """
+        query = term.lower()
+        if len(query) == 0:
+            return [], []
+        if mode == "fuzzy":
+            term_ids, term_scores = self.fuzzy_terms(query)
+        else:
+            candidates = None
+            if cache is not None and cache.get("mode") == mode and cache.get("query") is not None:
+                # every term containing (starting with) the new query also contains (starts with) the old one
+                if (mode == "prefix" and query.startswith(cache["query"])) or (
+                    mode != "prefix" and cache["query"] in query
+                ):
+                    candidates = cache["terms"]
+            term_ids = np.asarray(self.match_terms(query, mode, candidates), dtype=np.int64)
+            if cache is not None:
+                cache.update({"query": query, "mode": mode, "terms": term_ids})
+            term_ids = self.rank_terms(query, term_ids)
+            term_scores = np.ones(len(term_ids))
+        node_ids, sources = self.terms_to_nodes(term_ids)
+        return node_ids[:limit].tolist(), term_scores[sources][:limit].tolist()
+
+
+def build_index():
+    """builds the search index of the active project, called on project load"""
+    GD.session_data["searchIndex"] = {
+        "project": GD.data["actPro"],
+        "index": SearchIndex(GD.nodes.get("nodes", [])),
+    }
+
+
+def get_index() -> SearchIndex:
+    if "searchIndex" not in GD.session_data.keys() or GD.session_data["searchIndex"]["project"] != GD.data["actPro"]:
+        build_index()
+    return GD.session_data["searchIndex"]["index"]
+
+
+def client_cache(client) -> dict:
+    # last substring/prefix query of a client, dropped with session_data on project change
+    if client is None:
+        return None
+    if "searchCache" not in GD.session_data.keys():
+        GD.session_data["searchCache"] = {}
+    if client not in GD.session_data["searchCache"].keys():
+        GD.session_data["searchCache"][client] = {}
+    return GD.session_data["searchCache"][client]
+
+
+def search_ids(term, limit=None, mode="substring", client=None) -> list:
+    """returns ranked node ids matching term, see SearchIndex.query"""
+    return search_scored(term, limit=limit, mode=mode, client=client)[0]
+
+
+def search_scored(term, limit=None, mode="substring", client=None) -> tuple:
+    """
+    returns (ranked node ids, scores) matching term, see SearchIndex.query
+    client: str, optional, id of the searching client, consecutive typeahead queries of a client refine its last result
+    """
+    project = GD.data["actPro"]
+    if project == "none":
+        return [], []
+    return get_index().query(term, limit=limit, mode=mode, cache=client_cache(client))
+
+
+def search(term, limit=None, mode="substring"):
+    results = []
+    node_ids, scores = search_scored(term, limit=limit, mode=mode)
+    for node_id, score in zip(node_ids, scores):
+        res = {
+            "id": node_id,
+            "name": GD.nodes["nodes"][node_id]["n"],
+            "color": GD.pixel_valuesc[node_id],
+            "score": score,
+        }
+        results.append(res)
     return results
 
 
+STRUCTURE_INFO_DIR = os.path.join(".", "static", "examplefiles", "protein_structure_info")
+STRUCTURE_SCALE_FILES = {
+    "cartoon": os.path.join(STRUCTURE_INFO_DIR, "scales_Cartoon.csv"),
+    "electrostatic": os.path.join(STRUCTURE_INFO_DIR, "scales_electrostatic_surface.csv"),
+}
+
+# mode -> {"mtime": float, "scales": {UniProtID: float}}, reloaded when the csv file changes
+structure_scale_tables = {}
 
 
+def load_structure_scales(mode) -> dict or None:
+    """returns the scale table {UniProtID: scale} of mode, None if the mode or its file is not available"""
+    scale_file = STRUCTURE_SCALE_FILES.get(mode)
+    if scale_file is None or not os.path.exists(scale_file):
+        structure_scale_tables.pop(mode, None)
+        return None
+
+    mtime = os.path.getmtime(scale_file)
+    table = structure_scale_tables.get(mode)
+    if table is None or table["mtime"] != mtime:
+        scales = {}
+        with open(scale_file, "r") as f:
+            csv_file = csv.reader(f)
+            next(csv_file, None)  # header
+            for row in csv_file:
+                if len(row) > 1:
+                    scales[row[0]] = float(row[1])
+        table = {"mtime": mtime, "scales": scales}
+        structure_scale_tables[mode] = table
+    return table["scales"]
+
 
 def get_structure_scale(uniprot, mode) -> float or str:
     """Return the scale of the structure as a float. If the structure is not found (or not provided), the size file is not available or the mode is not given, the function will return an error message as string. To provide the UniProtID add the 'uniprot=<UniProtID>', for the mode add 'mode=<mode>' to the URL. Currently available modes are 'cartoon' and 'electrostatic'. The default mode is 'cartoon'."""
@@ -45,28 +341,40 @@ def get_structure_scale(uniprot, mode) -> float or str:
     if uniprot is None:
         return "Error: No UniProtID provided."
 
-    possible_files = {
-        "cartoon": os.path.join(".", "static", "example_files", "protein_structure_info", "scales_Cartoon.csv"),
-        "electrostatic": os.path.join(
-            ".", "static", "example_files", "protein_structure_info", "scales_electrostatic_surface.csv"
-        ),
-    }
-    scale_file = possible_files.get(mode)
-
     # Prevent FileNotFound errors.
-    if scale_file is None:
+    if mode not in STRUCTURE_SCALE_FILES.keys():
         return "Error: Mode not available."
-    if not os.path.exists(scale_file):
+    scales = load_structure_scales(mode)
+    if scales is None:
         return "Error: File not found."
 
-    # Search for size of structure.
-    with open(scale_file, "r") as f:
-        csv_file = csv.reader(f)
-        for row in csv_file:
-            if row[0] == uniprot:
-                scale = row[1]
-                return scale
-
     # Structure not found in the scale file -> no available.
-    return "Error: No structure available for this UniProtID."
+    if uniprot not in scales.keys():
+        return "Error: No structure available for this UniProtID."
+    return scales[uniprot]
+
+
+def get_structure_scales(uniprots, mode) -> dict:
+    """
+    batch version of get_structure_scale
+    uniprots: list of UniProtIDs
+    mode: str, "cartoon" (default) or "electrostatic"
+    returns: {"success": True, "mode": str, "scales": {UniProtID: float}, "missing": [UniProtIDs without structure]}
+             or {"success": False, "error": str}
+    """
+    if mode is None:
+        mode = "cartoon"
+    if mode not in STRUCTURE_SCALE_FILES.keys():
+        return {"success": False, "error": "Mode not available."}
+    scales = load_structure_scales(mode)
+    if scales is None:
+        return {"success": False, "error": "File not found."}
 
+    found = {}
+    missing = []
+    for uniprot in uniprots:
+        if uniprot in scales.keys():
+            found[uniprot] = scales[uniprot]
+        else:
+            missing.append(uniprot)
+    return {"success": True, "mode": mode, "scales": found, "missing": missing}
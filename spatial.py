@@ -0,0 +1,173 @@
+"""
+Spatial index over the node positions of the active layout
+
+Positions are decoded from the active layout textures (or taken from a generated temp layout) and kept in a
+KD-tree, coordinates are the normalized layout coordinates in [0, 1] as stored in the textures.
+
+The index lives in GD.session_data["spatial"] and is keyed by project, layout and texture modification times,
+it is rebuilt lazily when one of them changes. Layouts that move only a few nodes are applied incrementally:
+up to MAX_MOVED moved nodes are kept outside of the tree and checked directly, beyond that the tree is rebuilt.
+
+Query objects (socket message or http arguments):
+    {"query": "knn", "point": [x, y, z], "k": int}
+    {"query": "radius" or "sphere", "point": [x, y, z], "radius": float}
+    {"query": "box", "min": [x, y, z], "max": [x, y, z]}
+"""
+import os
+
+import numpy as np
+from PIL import Image
+from scipy.spatial import cKDTree
+
+import GlobalData as GD
+import textures
+
+MAX_MOVED = 4096  # moved nodes checked outside of the tree before it is rebuilt
+QUERY_TYPES = ["knn", "radius", "sphere", "box"]
+
+
+class SpatialIndex:
+    def __init__(self, positions):
+        self.build(positions)
+
+    def build(self, positions):
+        self.positions = np.asarray(positions, dtype=np.float64)
+        self.tree = cKDTree(self.positions)
+        self.moved = np.array([], dtype=np.int64)
+        self.is_moved = np.zeros(len(self.positions), dtype=bool)
+
+    def update(self, positions):
+        """applies new positions, incrementally if only a few nodes moved"""
+        positions = np.asarray(positions, dtype=np.float64)
+        if positions.shape != self.tree.data.shape:
+            self.build(positions)
+            return
+        moved = np.flatnonzero(np.any(positions != self.tree.data, axis=1))
+        if len(moved) > MAX_MOVED:
+            self.build(positions)
+            return
+        self.positions = positions
+        self.moved = moved
+        self.is_moved = np.zeros(len(positions), dtype=bool)
+        self.is_moved[moved] = True
+
+    def merge(self, tree_ids, moved_mask) -> np.ndarray:
+        # tree results are stale for moved nodes, replace them by the moved nodes passing the test
+        tree_ids = np.asarray(tree_ids, dtype=np.int64)
+        tree_ids = tree_ids[~self.is_moved[tree_ids]]
+        return np.sort(np.concatenate([tree_ids, self.moved[moved_mask]]))
+
+    def knn(self, point, k) -> tuple:
+        """returns (ids, distances) of the k nodes nearest to point, nearest first"""
+        point = np.asarray(point, dtype=np.float64)
+        k = max(0, min(int(k), len(self.positions)))
+        if k == 0:
+            return np.array([], dtype=np.int64), np.array([])
+        # moved nodes may occupy some of the tree's nearest, ask for enough to be left with k
+        distances, ids = self.tree.query(point, k=min(len(self.positions), k + len(self.moved)))
+        distances, ids = np.atleast_1d(distances), np.atleast_1d(ids)
+        keep = ~self.is_moved[ids]
+        ids = np.concatenate([ids[keep], self.moved])
+        distances = np.concatenate([distances[keep], np.linalg.norm(self.positions[self.moved] - point, axis=1)])
+        order = np.argsort(distances, kind="stable")[:k]
+        return ids[order], distances[order]
+
+    def radius(self, point, radius) -> np.ndarray:
+        """returns the sorted ids of all nodes within radius of point (sphere selection)"""
+        point = np.asarray(point, dtype=np.float64)
+        tree_ids = self.tree.query_ball_point(point, float(radius))
+        moved_mask = np.linalg.norm(self.positions[self.moved] - point, axis=1) <= radius
+        return self.merge(tree_ids, moved_mask)
+
+    def box(self, low, high) -> np.ndarray:
+        """returns the sorted ids of all nodes inside the axis aligned box [low, high]"""
+        low = np.asarray(low, dtype=np.float64)
+        high = np.asarray(high, dtype=np.float64)
+        center = (low + high) / 2
+        half = np.abs(high - low) / 2
+        # the chebyshev ball around the center covers the box, cut it down to the box per axis
+        candidates = np.asarray(self.tree.query_ball_point(center, float(half.max()), p=np.inf), dtype=np.int64)
+        inside = np.all(np.abs(self.tree.data[candidates] - center) <= half, axis=1)
+        moved_mask = np.all(np.abs(self.positions[self.moved] - center) <= half, axis=1)
+        return self.merge(candidates[inside], moved_mask)
+
+
+def layout_paths() -> tuple:
+    # returns the (hi, low) texture paths of the active layout
+    layout = GD.pfile["layouts"][int(GD.pdata["layoutsDD"])]
+    path = "static/projects/" + GD.data["actPro"]
+    return path + "/layouts/" + layout + ".bmp", path + "/layoutsl/" + layout + "l.bmp"
+
+
+def layout_key() -> tuple:
+    path_hi, path_low = layout_paths()
+    return (GD.data["actPro"], path_hi, os.path.getmtime(path_hi), os.path.getmtime(path_low))
+
+
+def load_positions() -> np.ndarray:
+    path_hi, path_low = layout_paths()
+    image_hi = Image.open(path_hi, "r")
+    image_low = Image.open(path_low, "r")
+    positions = textures.decode_positions(image_hi, image_low, len(GD.nodes["nodes"]))
+    image_hi.close()
+    image_low.close()
+    return positions
+
+
+def set_positions(positions, key):
+    # updates (or creates) the index of the session
+    entry = GD.session_data.get("spatial")
+    if entry is None or entry["index"] is None:
+        GD.session_data["spatial"] = {"key": key, "index": SpatialIndex(positions)}
+        return
+    entry["index"].update(positions)
+    entry["key"] = key
+
+
+def update_positions(positions):
+    """called when a temp layout is generated, the index follows the layout the clients display"""
+    set_positions(np.asarray(positions, dtype=np.float64)[:, :3], layout_key())
+
+
+def get_index() -> SpatialIndex:
+    key = layout_key()
+    entry = GD.session_data.get("spatial")
+    if entry is None or entry["key"] != key:
+        set_positions(load_positions(), key)
+    return GD.session_data["spatial"]["index"]
+
+
+def parse_vector(value) -> list:
+    # accepts [x, y, z] or "x,y,z"
+    if isinstance(value, str):
+        value = value.split(",")
+    vector = [float(v) for v in value]
+    if len(vector) != 3:
+        raise ValueError("expected 3 coordinates")
+    return vector
+
+
+def query(params) -> dict:
+    """
+    runs a spatial query on the active layout
+    params: dict, query object (see module docstring)
+    returns: {"success": True, "ids": list, "distances": list (knn only)} or {"success": False, "error": str}
+    """
+    query_type = params.get("query")
+    if query_type not in QUERY_TYPES:
+        return {"success": False, "error": "Unknown query, use one of " + ", ".join(QUERY_TYPES) + "."}
+    if GD.data["actPro"] == "none":
+        return {"success": False, "error": "No project loaded."}
+
+    try:
+        index = get_index()
+        if query_type == "knn":
+            ids, distances = index.knn(parse_vector(params["point"]), int(params.get("k", 10)))
+            return {"success": True, "ids": ids.tolist(), "distances": distances.tolist()}
+        if query_type in ["radius", "sphere"]:
+            ids = index.radius(parse_vector(params["point"]), float(params["radius"]))
+        else:
+            ids = index.box(parse_vector(params["min"]), parse_vector(params["max"]))
+    except (KeyError, ValueError, TypeError) as e:
+        return {"success": False, "error": "Invalid query: " + str(e)}
+    return {"success": True, "ids": ids.tolist()}
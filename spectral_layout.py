@@ -0,0 +1,137 @@
+"""
+Randomized spectral embedding for very large graphs
+
+The spectral layout places node i at row i of the eigenvectors of the normalized Laplacian L for the smallest
+non trivial eigenvalues. These are the eigenvectors of M = (I + D^-1/2 A D^-1/2) / 2 for its largest eigenvalues
+(M is positive semidefinite, so they are also its largest singular vectors), found with the randomized subspace
+iteration of Halko, Martinsson and Tropp, "Finding structure with randomness" (2011):
+
+    Q = orth(Omega)                   Omega: (n, k + oversample) gaussian
+    B = Q^T M Q, B = V S V^T          small (k + oversample)^2 eigenproblem (rayleigh ritz), Q = Q V
+    Q = orth(p(M) Q), repeated        subspace iterations until the residuals of the first k vectors are small
+
+Spectral gaps of large graphs are tiny, plain power iterations (p(M) = M^q) barely separate the wanted
+eigenvectors. p is a chebyshev polynomial damping everything below the smallest ritz value instead (chebyshev
+filtered subspace iteration), its growth above the cut is much steeper than that of a power of the same degree.
+Blocks are orthonormalized over their small gram matrix instead of a householder QR of the tall block.
+
+The trivial eigenvectors (D^1/2 1 of every connected component, eigenvalue 1) are projected out of every block,
+so disconnected graphs do not waste the embedding. Memory stays at O(n (k + oversample)) next to the sparse
+adjacency, every iteration costs one sparse product with the block.
+"""
+import numpy as np
+import scipy.sparse as sp_sp
+from scipy.sparse import csgraph
+
+OVERSAMPLE = 10  # extra vectors of the random block
+FILTER_DEGREE = 20  # sparse products per subspace iteration
+MAX_ITERATIONS = 30  # subspace iterations
+TOLERANCE = 1e-4  # residual norm of the eigenvectors to stop at
+
+
+def normalized_operator(adjacency) -> tuple:
+    """
+    returns (M, inv_sqrt_degree): M = (I + D^-1/2 A D^-1/2) / 2 as sparse matrix and D^-1/2, both 0 for isolated nodes
+    """
+    degree = np.asarray(adjacency.sum(axis=1)).ravel()
+    inv_sqrt_degree = np.zeros(len(degree))
+    inv_sqrt_degree[degree > 0] = 1 / np.sqrt(degree[degree > 0])
+    scaled = sp_sp.diags(inv_sqrt_degree) @ adjacency @ sp_sp.diags(inv_sqrt_degree)
+    # identity on linked nodes only, isolated nodes get eigenvalue 0 and never enter the embedding
+    operator = (sp_sp.diags((degree > 0).astype(np.float64)) + scaled) * 0.5
+    return operator.tocsr(), inv_sqrt_degree
+
+
+def trivial_projector(adjacency, inv_sqrt_degree):
+    """
+    returns a function removing the trivial eigenvectors (D^1/2 1 per connected component) from a block
+    """
+    count, labels = csgraph.connected_components(adjacency, directed=False)
+    sqrt_degree = np.zeros(len(inv_sqrt_degree))
+    sqrt_degree[inv_sqrt_degree > 0] = 1 / inv_sqrt_degree[inv_sqrt_degree > 0]
+    norms = np.sqrt(np.bincount(labels, weights=sqrt_degree**2, minlength=count))
+    norms[norms == 0] = 1
+    unit = sqrt_degree / norms[labels]
+
+    def project(block):
+        # block - u u^T block for the unit vector u of every component, one pass per column
+        for column in range(block.shape[1]):
+            weights = np.bincount(labels, weights=unit * block[:, column], minlength=count)
+            block[:, column] -= unit * weights[labels]
+        return block
+
+    return project
+
+
+def orthonormalize(block) -> np.ndarray:
+    """
+    orthonormal basis of the columns of a tall block by two passes over the small gram matrix (CholeskyQR2 with
+    eigh), an order of magnitude faster than householder QR on millions of rows
+    """
+    for repeat in range(2):
+        values, vectors = np.linalg.eigh(block.T @ block)
+        values = np.maximum(values, values.max() * 1e-14)
+        block = block @ (vectors / np.sqrt(values))
+    return block
+
+
+def chebyshev_filter(operator, block, degree, low, high, project) -> np.ndarray:
+    """
+    applies the chebyshev polynomial of the given degree mapped to [low, high] to the block:
+    eigenvalues in [low, high] stay bounded by 1, eigenvalues above high grow like cosh(degree * acosh(x))
+    """
+    center = (high + low) / 2
+    half_width = max((high - low) / 2, 1e-12)
+    # T_{j+1} = 2 x T_j - T_{j-1} with x = (M - center) / half_width, the shift and scale folded into the matrix
+    shifted = ((operator - center * sp_sp.identity(operator.shape[0], format="csr")) * (2 / half_width)).tocsr()
+    previous = block
+    current = shifted @ block * 0.5
+    for order in range(2, degree + 1):
+        previous, current = current, shifted @ current - previous
+    return project(current)
+
+
+def randomized_eigenvectors(operator, k, project=None, oversample=OVERSAMPLE, iterations=MAX_ITERATIONS, seed=None) -> tuple:
+    """
+    returns (eigenvalues, eigenvectors) of the k largest eigenvalues of a symmetric positive semidefinite
+    sparse operator with eigenvalues in [0, 1], largest first, eigenvectors as (n, k) array
+    project: function(block) -> block, optional, removes known eigenvectors from every block
+    """
+    rng = np.random.default_rng(seed)
+    n = operator.shape[0]
+    width = min(n, k + oversample)
+    if project is None:
+        project = lambda block: block
+    basis = orthonormalize(project(rng.standard_normal((n, width))))
+    for iteration in range(iterations + 1):
+        # rayleigh ritz on the subspace, largest first
+        image = operator @ basis
+        values, vectors = np.linalg.eigh(basis.T @ image)
+        order = np.argsort(values)[::-1]
+        values, vectors = values[order], vectors[:, order]
+        basis, image = basis @ vectors, image @ vectors
+        residual = np.linalg.norm(image[:, :k] - basis[:, :k] * values[:k], axis=0)
+        if iteration == iterations or residual.max() < TOLERANCE:
+            break
+        # damp everything below the smallest ritz value, it bounds the unwanted part of the spectrum
+        basis = orthonormalize(chebyshev_filter(operator, basis, FILTER_DEGREE, 0.0, values[-1], project))
+    return values[:k], basis[:, :k]
+
+
+def spectral_embedding(adjacency, dim=3, seed=None) -> np.ndarray:
+    """
+    adjacency: scipy sparse, symmetric adjacency matrix
+    dim: int, dimensions of the embedding
+    seed: int, optional, random seed
+    returns: (n, dim) array of positions (not scaled), isolated nodes at the origin
+    """
+    adjacency = sp_sp.csr_matrix(adjacency, dtype=np.float64)
+    n = adjacency.shape[0]
+    if n <= dim + 1:
+        return np.random.default_rng(seed).random((n, dim))
+    operator, inv_sqrt_degree = normalized_operator(adjacency)
+    values, vectors = randomized_eigenvectors(
+        operator, dim, trivial_projector(adjacency, inv_sqrt_degree), seed=seed
+    )
+    # eigenvectors of the random walk Laplacian D^-1 L, as in the classic spectral layout
+    return vectors * inv_sqrt_degree[:, None]
@@ -427,17 +427,31 @@ $(document).ready(function () {
         //settextscroll(data.id, data.msg);
         break;
 
+      case "nodeButtonPage":
+        // refused page of a replaced list, stop paging until the new list arrives
+        console.log(data.error);
+        var pagedBox = document
+          .getElementById(data.parent)
+          .shadowRoot.getElementById("box");
+        pagedBox.dataset.cursor = "";
+        pagedBox.dataset.loading = "";
+        break;
+
       case "makeNodeButton":
         //console.log(data.val.length);
         document.getElementById(data.parent).style.display = "block";
         var content = document
           .getElementById(data.parent)
           .shadowRoot.getElementById("box");
-        removeAllChildNodes(content);
+        // responses are paginated, offset 0 starts a new list, further pages are appended
+        var offset = data.hasOwnProperty("offset") ? data.offset : 0;
+        if (offset == 0) {
+          removeAllChildNodes(content);
+        }
         for (let i = 0; i < data.val.length; i++) {
           $(content).append(
             "<mc-button id = 'button" +
-              i +
+              (offset + i) +
               " 'val= '" +
               data.val[i].id +
               "' name = '" +
@@ -451,16 +465,21 @@ $(document).ready(function () {
               "' ></mc-button>"
           );
         }
+        var total = data.hasOwnProperty("total") ? data.total : data.val.length;
+        initNodeButtonPaging(content, data.id, data.parent, data.cursor, data.token);
+        if (offset > 0) {
+          break;
+        }
         if (data.id == "search") {
           document.getElementById("searchcount").innerHTML =
-            "[" + data["val"].length + "]";
+            "[" + total + "]";
         }
         if (data.id == "children") {
           document.getElementById("linkL2").innerHTML =
             data["nid"] +
             "<br><h6>" +
             "[" +
-            data["val"].length +
+            total +
             " Links]</h6>";
         }
         break;
@@ -506,18 +525,19 @@ $(document).ready(function () {
       case "updateTempTex":
         if (isPreview) {
           // predefine layoutpaths here to send them afterwards to webgl if both are set within one socket connection
+          // textures either hold a path or their bytes inline (data, format, size)
           let layoutNodesHiPath, layoutNodesLowPath;
           for (let i = 0; i < data.textures.length; i++) {
             let textureData = data.textures[i];
             if (textureData.channel === "layoutNodesHi") {
-              layoutNodesHiPath = textureData.path;
+              layoutNodesHiPath = textureData;
               continue;
             }
             if (textureData.channel === "layoutNodesLow") {
-              layoutNodesLowPath = textureData.path;
+              layoutNodesLowPath = textureData;
               continue;
             }
-            downloadTempTexture(textureData.path, textureData.channel);
+            downloadTempTexture(textureData, textureData.channel);
           }
           if (
             layoutNodesHiPath !== undefined &&
@@ -530,6 +550,15 @@ $(document).ready(function () {
         }
         break;
 
+      case "morphFrames":
+        // intermediate layouts between data.a and data.b, played through the temp layout textures
+        playMorphFrames(data);
+        break;
+
+      case "morph":
+        console.log("morph failed: " + data.error);
+        break;
+
       case "node":
         if (document.getElementById("nodeL2")) {
           document.getElementById("nodeL2").innerHTML =
@@ -729,6 +758,12 @@ $(document).ready(function () {
                   "inline-block"
                 );
                 break;
+              case "PageRank":
+                $("#analyticsSelectedPageRank").css("display", "inline-block");
+                break;
+              case "Katz":
+                $("#analyticsSelectedKatz").css("display", "inline-block");
+                break;
               // add bindings for options display here
             }
           }
@@ -756,6 +791,15 @@ $(document).ready(function () {
               case "Spectral":
                 $("#layoutSelectSpectral").css("display", "inline-block");
                 break;
+              case "Multilevel Force":
+                $("#layoutSelectMultilevel").css("display", "inline-block");
+                break;
+              case "Components":
+                $("#layoutSelectComponents").css("display", "inline-block");
+                break;
+              case "Geo":
+                $("#layoutSelectGeo").css("display", "inline-block");
+                break;
               // add bindings for options display here
             }
           }
@@ -1205,6 +1249,44 @@ $(document).ready(function () {
             NavBar[i].style.visibility = "hidden";
           }
         }
+        if (data.id == "analyticsPageRankPlot" || data.id == "analyticsKatzPlot") {
+          const config = { displayModeBar: false };
+          const layout = {};
+          let plot_data = JSON.parse(data["val"]);
+
+          Plotly.newPlot(data["target"], plot_data, layout, config);
+
+          let plotIFrame = document.getElementById(data["target"]);
+
+          let user = data.usr;
+          let targetDiv = data.target;
+          let runId = data.id.replace("Plot", "Run");
+          plotIFrame.on("plotly_click", function (data) {
+            if (data.event.button !== 0) {
+              return;
+            }
+
+            let clickedBarX = data.points[0].x;
+
+            console.log(clickedBarX);
+
+            let request = {
+              fn: "analytics",
+              id: runId,
+              highlight: clickedBarX,
+              target: targetDiv,
+              usr: user,
+            };
+
+            socket.emit("ex", request);
+          });
+
+          plotIFrame.style.display = "inline-block";
+          const NavBar = document.getElementsByClassName("modebar-container");
+          for (let i = 0; i < NavBar.length; i++) {
+            NavBar[i].style.visibility = "hidden";
+          }
+        }
         if (data.id == "analyticsPathNode1") {
           let button = document
             .getElementById("analyticsPathNode1")
@@ -1437,6 +1519,61 @@ function removeAllChildNodes(parent) {
   }
 }
 
+var morphPlayback = 0; // id of the running morph playback, a new morph stops the previous one
+
+async function playMorphFrames(data, fps = 30) {
+  // plays the frames of a morphFrames message one after another, each frame is a [low, hi] texture pair
+  // preview: updateLayoutTemp like an updateTempTex message, otherwise every frame is forwarded as updateTempTex
+  let playback = ++morphPlayback;
+  for (let i = 0; i < data.frames.length; i++) {
+    if (playback !== morphPlayback) {
+      return;
+    }
+    let started = performance.now();
+    let frame = data.frames[i];
+    if (isPreview) {
+      await updateLayoutTemp(frame[0], frame[1]);
+    } else {
+      ue4("updateTempTex", { usr: data.usr, fn: "updateTempTex", textures: frame });
+    }
+    let wait = 1000 / fps - (performance.now() - started);
+    if (wait > 0) {
+      await new Promise((resolve) => setTimeout(resolve, wait));
+    }
+  }
+}
+
+function initNodeButtonPaging(box, listId, parent, cursor, token) {
+  // requests the next page of a paginated node button list when the box is scrolled to its end
+  // cursor: offset of the next page, null/undefined if the list is complete
+  // token: id of the list on the server, pages of a list replaced in the meantime are refused
+  box.dataset.listId = listId;
+  box.dataset.cursor = cursor === null || cursor === undefined ? "" : cursor;
+  box.dataset.token = token === null || token === undefined ? "" : token;
+  box.dataset.loading = "";
+  if (box.dataset.pagingInit) {
+    return;
+  }
+  box.dataset.pagingInit = "true";
+  box.addEventListener("scroll", function () {
+    if (box.dataset.cursor === "" || box.dataset.loading) {
+      return;
+    }
+    if (box.scrollTop + box.clientHeight < box.scrollHeight - 50) {
+      return;
+    }
+    box.dataset.loading = "true";
+    socket.emit("ex", {
+      usr: uid,
+      id: box.dataset.listId,
+      parent: parent,
+      fn: "nodeButtonPage",
+      offset: parseInt(box.dataset.cursor),
+      token: box.dataset.token,
+    });
+  });
+}
+
 function settextscroll(id, val) {
   console.log(id);
   var box = document.getElementById(id).shadowRoot.getElementById("box");
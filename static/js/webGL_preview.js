@@ -179,6 +179,7 @@
         }
 
         async function updateLayoutTemp(path_low, path_hi){
+            // path_low, path_hi: texture paths or texture objects of an updateTempTex message
 
             function getPositionFromTemp(index, temp_low, temp_hi){
                 var i = index * 4;
@@ -190,8 +191,8 @@
             }
 
             if (initialized){
-                let layout_hi = await DownloadImage(path_hi);
-                let layout_low = await DownloadImage(path_low);
+                let layout_hi = await DownloadTexture(path_hi);
+                let layout_low = await DownloadTexture(path_low);
 
 
                 //delete everything but sphere  
@@ -674,15 +675,34 @@
         
         }
         
+        function DownloadTexture(texture) {
+            // texture: path string or texture object of an updateTempTex message
+            // resolves to the RGBA pixel array like DownloadImage
+            if (typeof texture === "string") {
+                return DownloadImage(texture);
+            }
+            if (!texture.hasOwnProperty("data")) {
+                return DownloadImage(texture.path);
+            }
+            if (texture.format === "raw") {
+                return Promise.resolve(new Uint8ClampedArray(texture.data));
+            }
+            let url = URL.createObjectURL(new Blob([texture.data], { type: "image/" + texture.format }));
+            return DownloadImage(url).finally(function () {
+                URL.revokeObjectURL(url);
+            });
+        }
+
         async function downloadTempTexture(path, channel) {
+            // path: texture path or texture object of an updateTempTex message
             switch (channel){
                 case "nodeRGB":
-                    let nodesTempRGB = await DownloadImage(path);
+                    let nodesTempRGB = await DownloadTexture(path);
                     console.log(nodesTempRGB[0],nodesTempRGB[1],nodesTempRGB[2]);
                     updateNodeColors(nodesTempRGB);
                     break;
                 case "linkRGB":
-                    let linksTempRGB = await DownloadImage(path);
+                    let linksTempRGB = await DownloadTexture(path);
                     console.log(linksTempRGB[0], linksTempRGB[1], linksTempRGB[2]);
                     updateLinkColors(linksTempRGB);
                     break;
@@ -0,0 +1,55 @@
+"""
+Geo layout after re-uploading a project with corrected coordinates (run from the repository root: python -m pytest)
+"""
+import io
+import json
+
+import flask
+import numpy as np
+
+import GlobalData as GD
+import layout_module
+import uploaderGraph
+
+
+def upload(namespace, latlon):
+    graph = {
+        "directed": False,
+        "multigraph": False,
+        "graph": {"name": "01_geo", "graphtitle": namespace, "graphdesc": "geo test graph"},
+        "nodes": [
+            {"id": i, "pos": list(pos), "nodecolor": "#c90823", "annotation": ["Node: " + str(i)]}
+            for i, pos in enumerate(latlon)
+        ],
+        "links": [{"source": i, "target": i + 1, "linkcolor": "#909090"} for i in range(len(latlon) - 1)],
+    }
+    data = {"namespaceJSON": namespace, "graphJSON": (io.BytesIO(json.dumps(graph).encode()), "01_geo.json")}
+    app = flask.Flask(__name__)
+    with app.test_request_context("/uploadfilesJSON", method="POST", data=data, content_type="multipart/form-data"):
+        uploaderGraph.upload_filesJSON(flask.request)
+
+
+def apply_geo(projection):
+    engine, params = layout_module.get_layout_engine("layoutGeo" + projection + "Apply")
+    result = layout_module.generate_layout(engine, params)
+    assert result["success"] is True
+    return np.asarray(result["content"])
+
+
+def test_reupload_serves_new_coordinates(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "static" / "projects").mkdir(parents=True)
+    monkeypatch.setattr(GD, "plist", [])
+    monkeypatch.setattr(GD, "data", {"actPro": "geotest"})
+    monkeypatch.setattr(GD, "pdata", {})
+
+    upload("geotest", [[48.2, 16.4, 0.0], [52.5, 13.4, 0.0], [40.7, -74.0, 0.0]])
+    GD.loadPD()
+    before = apply_geo("Map")
+
+    upload("geotest", [[-33.9, 151.2, 0.0], [35.7, 139.7, 0.0], [40.7, -74.0, 0.0]])  # same graph, corrected coordinates
+    after = apply_geo("Map")
+
+    assert not np.allclose(before, after)
+    monkeypatch.setattr(GD, "session_data", {})
+    np.testing.assert_allclose(after, apply_geo("Map"))
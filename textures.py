@@ -0,0 +1,126 @@
+"""
+Functions to ship temporary textures to the clients
+
+Temporary textures (highlights, generated layouts, ...) are sent to the clients with an "updateTempTex" message
+containing a list of texture objects:
+
+    {"channel": str, "path": str}                                   texture saved to disk, clients fetch it via http
+    {"channel": str, "data": bytes, "format": str, "size": [w, h]}  texture sent inline as binary attachment
+
+Sending textures inline saves the disk write and one http request per client and texture. It is enabled by
+"inlineTempTextures" in GD.json (default: off, the UE4 client only reads paths) and only used for textures whose
+encoded size does not exceed "inlineTempTexturesMaxBytes". Bigger textures always take the path route.
+"inlineTempTexturesFormat" selects the encoding: "png" (default, compressed) or "raw" (uncompressed RGBA pixels,
+no decoding on the client).
+"""
+import io
+
+import numpy as np
+from PIL import Image
+
+import GlobalData as GD
+
+POSITION_SCALE = 65280  # positions in [0, 1] are stored as value * 65280 = hi * 255 + low per channel
+INLINE_MAX_BYTES = 512 * 1024
+INLINE_FORMATS = ["png", "raw"]
+
+
+def inline_settings() -> tuple:
+    # returns (enabled, max_bytes, format) of inline texture transfer
+    enabled = bool(GD.data.get("inlineTempTextures", False))
+    max_bytes = int(GD.data.get("inlineTempTexturesMaxBytes", INLINE_MAX_BYTES))
+    inline_format = GD.data.get("inlineTempTexturesFormat", "png")
+    if inline_format not in INLINE_FORMATS:
+        inline_format = "png"
+    return enabled, max_bytes, inline_format
+
+
+def encode_inline(image: Image.Image, inline_format: str) -> bytes:
+    if inline_format == "raw":
+        return image.convert("RGBA").tobytes()
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def temp_texture(image: Image.Image, path: str, channel: str, file_format: str = "PNG") -> dict:
+    """
+    returns the texture object for an updateTempTex message
+    image: PIL image of the texture
+    path: str, where to save the texture if it is not sent inline
+    channel: str, ("nodeRGB", "linkRGB", "layoutNodesHi", "layoutNodesLow"), type of texture
+    file_format: str, PIL format used when saving to path
+    """
+    enabled, max_bytes, inline_format = inline_settings()
+    if enabled:
+        # raw size is known without encoding, skip the work for big textures
+        if inline_format == "raw" and image.width * image.height * 4 > max_bytes:
+            enabled = False
+    if enabled:
+        data = encode_inline(image, inline_format)
+        if len(data) <= max_bytes:
+            return {"channel": channel, "data": data, "format": inline_format, "size": [image.width, image.height]}
+
+    image.save(path, file_format)
+    return {"channel": channel, "path": path}
+
+
+def encode_positions(positions) -> tuple:
+    """
+    returns (hi, low) uint8 arrays (n, 3) of node positions in [0, 1] as stored in the layout textures
+    """
+    values = (np.clip(np.asarray(positions, dtype=np.float64)[:, :3], 0, 1) * POSITION_SCALE).astype(np.int64)
+    return (values // 255).astype(np.uint8), (values % 255).astype(np.uint8)
+
+
+def position_images(positions, template_hi: Image.Image, template_low: Image.Image) -> tuple:
+    """
+    returns new (hi, low) layout images with the first pixels set to positions, size and remaining pixels of
+    the templates (the active layout textures)
+    """
+    hi, low = encode_positions(positions)
+    images = []
+    for template, values in [(template_hi, hi), (template_low, low)]:
+        pixels = np.array(template.convert("RGB"))
+        flat = pixels.reshape(-1, 3)
+        flat[: len(values)] = values[: len(flat)]
+        images.append(Image.fromarray(pixels))
+    return images[0], images[1]
+
+
+def decode_positions(image_hi: Image.Image, image_low: Image.Image, count: int) -> np.ndarray:
+    """
+    returns the (count, 3) float array of node positions in [0, 1] stored in a pair of layout textures
+    image_hi: layout texture of folder "layouts", image_low: texture of folder "layoutsl"
+    """
+    hi = np.asarray(image_hi.convert("RGB"), dtype=np.float64).reshape(-1, 3)[:count]
+    low = np.asarray(image_low.convert("RGB"), dtype=np.float64).reshape(-1, 3)[:count]
+    return (hi * 255 + low) / POSITION_SCALE
+
+
+def node_highlight(ids, color) -> dict:
+    """
+    returns the texture object of the active node color texture with the nodes ids set to color
+    ids: list or array of node ids
+    color: (r, g, b) or (r, g, b, a)
+    """
+    image = Image.open(
+        "static/projects/"
+        + GD.data["actPro"]
+        + "/layoutsRGB/"
+        + GD.pfile["layoutsRGB"][int(GD.pdata["layoutsRGBDD"])]
+        + ".png",
+        "r",
+    )
+    pixels = np.array(image)
+    image.close()
+    channels = pixels.shape[2] if pixels.ndim == 3 else 1
+    color = list(color) + [255] * (channels - len(color))
+    flat = pixels.reshape(-1, channels)
+    flat[np.asarray(ids, dtype=np.int64)] = color[:channels]
+    highlighted = Image.fromarray(pixels)
+
+    path = "static/projects/" + GD.data["actPro"] + "/layoutsRGB/temp1.png"
+    texture = temp_texture(highlighted, path, "nodeRGB")
+    highlighted.close()
+    return texture
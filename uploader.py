@@ -2,6 +2,8 @@ from flask import Flask, render_template, request, redirect, url_for, session
 import json
 import os
 import GlobalData as GD
+import geo
+import textures
 from flask import jsonify
 from engineio.payload import Payload
 from PIL import Image
@@ -136,7 +138,8 @@ def loadAnnotations(name):
 
 
 
-def makeXYZTexture(project, pixeldata, name=None): 
+def makeXYZTexture(project, pixeldata, name=None, projection="geocentric"): 
+    # projection: str, used for "_geo" layouts (lat, lon), see geo.PROJECTIONS
 
     hight = 128 * (int((len(pixeldata["data"])) / 16384) + 1)
 
@@ -148,34 +151,11 @@ def makeXYZTexture(project, pixeldata, name=None):
     texl = [(0,0,0)] * size
 
     if "_geo" in pixeldata["name"]:
-        #print("is geo")
-        unscaled = []
-        # convert lat lon to XYZ
-        for x in pixeldata["data"]:
-            unscaled.append(geodetic_to_geocentric(float(x[0]), float(x[1])))
-        # Normalize to 0-1 range
-        scaled = normalize_xyz(unscaled)
-        
-        for i in range(len(scaled[0])):
-            
-            x = int(float(scaled[0][i])*65280)
-            y = int(float(scaled[1][i])*65280)
-            z = int(float(scaled[2][i])*65280)
-
-            xh = int(x / 255)
-            yh = int(y / 255)
-            zh = int(z / 255)
-
-            xl = x % 255
-            yl = y % 255
-            zl = z % 255
-
-            pixelh = (xh,yh,zh)
-            pixell = (xl,yl,zl)
-
-            texh[i] = pixelh
-            texl[i] = pixell
-            #print(pixelh)
+        # lat lon to XYZ in [0, 1], vectorized, see geo.py
+        lat, lon = geo.parse_latlon(pixeldata["data"])
+        hi, low = textures.encode_positions(geo.project(lat, lon, projection))
+        texh[:len(hi)] = list(map(tuple, hi.tolist()))
+        texl[:len(low)] = list(map(tuple, low.tolist()))
     
     else:
        
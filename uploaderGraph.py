@@ -5,6 +5,8 @@ import re
 import math 
 
 from uploader import *
+import util
+import geo
 
 
 
@@ -23,6 +25,10 @@ def upload_filesJSON(request):
     prolist = GD.plist
 
     namespace = form["namespaceJSON"]
+    # projection of "_geo" layouts, see geo.PROJECTIONS
+    geo_projection = form.get("geoProjection", "geocentric")
+    if geo_projection not in geo.PROJECTIONS:
+        geo_projection = "geocentric"
     
     if not namespace:
         return "namespace fail"
@@ -104,8 +110,8 @@ def upload_filesJSON(request):
             thisnode = {}
             thisnode["id"] = i
             if "_geo" in nodepositions[0]["name"]:
-                thisnode["lat"] = nodepositions[0]["data"][i][0]
-                thisnode["lon"] = nodepositions[0]["data"][i][1]
+                thisnode["lat"] = float(nodepositions[0]["data"][i][0])
+                thisnode["lon"] = float(nodepositions[0]["data"][i][1])
 
             if len(nodeinfo[0]["data"]) == len(nodepositions[0]["data"]):
                 thisnode["attrlist"] = nodeinfo[0]["data"][i]
@@ -117,7 +123,14 @@ def upload_filesJSON(request):
 
             nodelist["nodes"].append(thisnode)
     
-    else: # complex_annotations is True -> annotation types and name specified
+    if len(nodepositions) > 0 and "_geo" in nodepositions[0]["name"]:
+        # coordinates as arrays for the geo layouts, see geo.load_latlon
+        lat, lon = geo.parse_latlon(nodepositions[0]["data"])
+        geo.save_latlon(namespace, lat, lon)
+    else:
+        geo.remove_latlon(namespace)
+
+    if complex_annotations is True: # annotation types and name specified
         for i in range(len(nodeinfo)):
             this_node = {}
             this_node["id"] = i
@@ -149,29 +162,6 @@ def upload_filesJSON(request):
                 #print("C_DEBUG : pfile selections= ", pfile["selections"])
 
 
-                # get average pos for Each layout            
-                for layout in nodepositions:
-                    accPos = [0,0,0]
-                    pos = [0,0,0]
-
-                    for x in row:
-
-                        # catch for 2D positions for labels and for empty rows
-                        if len(x) > 0 and len(layout["data"][int(x)]) == 3:
-                            accPos[0] += float(layout["data"][int(x)][0])
-                            accPos[1] += float(layout["data"][int(x)][1])
-                            accPos[2] += float(layout["data"][int(x)][2])
-                        
-                        elif len(x) > 0 and len(layout["data"][int(x)]) == 2: 
-                            accPos[0] += float(layout["data"][int(x)][0])
-                            accPos[1] += float(layout["data"][int(x)][1])
-                            accPos[2] += 0.0
-
-                    pos[0] = str(accPos[0] / len(row))
-                    pos[1] = str(accPos[1] / len(row))
-                    pos[2] = str(accPos[2] / len(row))
-                    layout["data"].append(pos)
-
                 # label nodes to be black
                 for color in nodecolors:
                     color["data"].append((0,0,0,0)) # 60,60,60,60
@@ -179,6 +169,24 @@ def upload_filesJSON(request):
                 i += 1
         else: 
             pass
+
+    # label nodes sit at the centroid of their members in every layout
+    membership = util.label_membership(nodelist["nodes"])
+    if len(membership[0]) > 0:
+        for layout in nodepositions:
+            if len(layout["data"]) == 0:
+                continue
+            # 2D positions are placed at z = 0
+            positions = np.zeros((len(layout["data"]), 3))
+            try:
+                parsed = np.asarray(layout["data"], dtype=np.float64)[:, :3]
+                positions[:, :parsed.shape[1]] = parsed
+            except (ValueError, IndexError):
+                # rows of mixed length
+                for node_index, pos in enumerate(layout["data"]):
+                    positions[node_index, :len(pos[:3])] = [float(v) for v in pos[:3]]
+            centroids, _ = util.label_centroids(positions, membership)
+            layout["data"].extend([[str(v) for v in centroid] for centroid in centroids.tolist()])
         
 
     for file_index in range(len(nodepositions)):  # for layout in nodepositions:
@@ -187,23 +195,23 @@ def upload_filesJSON(request):
 
             if names[file_index] is not None:
                 # if texture name specified
-                state =  state + makeXYZTexture(namespace, layout, names[file_index]) + '<br>'
+                state =  state + makeXYZTexture(namespace, layout, names[file_index], projection=geo_projection) + '<br>'
                 pfile["layouts"].append(names[file_index])    
                 continue
-            state =  state + makeXYZTexture(namespace, layout) + '<br>'
+            state =  state + makeXYZTexture(namespace, layout, projection=geo_projection) + '<br>'
             pfile["layouts"].append(layout["name"] + "XYZ")
 
         # catch for 2D positions and for empty rows
-        elif len(layout["data"]) > 0 and len(layout["data"][int(x)]) == 2:
+        elif len(layout["data"]) > 0 and len(layout["data"][int(0)]) == 2:
             for i,xy in enumerate(layout["data"]):
                 layout["data"][i] = (xy[0],xy[1],0.0)
             
             if names[file_index] is not None:
                 # if texture name specified
-                state =  state + makeXYZTexture(namespace, layout, names[file_index]) + '<br>'
+                state =  state + makeXYZTexture(namespace, layout, names[file_index], projection=geo_projection) + '<br>'
                 pfile["layouts"].append(names[file_index])    
                 continue 
-            state =  state + makeXYZTexture(namespace, layout) + '<br>'
+            state =  state + makeXYZTexture(namespace, layout, projection=geo_projection) + '<br>'
             pfile["layouts"].append(layout["name"] + "XYZ")
 
         else: state = "upload must contain at least 1 node position list"
@@ -1,14 +1,18 @@
 import colorsys
+import hashlib
 import json
 import os
 import random
 import shutil
+import uuid
 from collections import OrderedDict
 
 import flask
 import matplotlib.cm as cm
 import networkx as nx
+import numpy as np
 import pandas as pd
+import scipy.sparse as sp_sp
 
 import GlobalData as GD
 import uploader
@@ -171,6 +175,152 @@ def project_to_graph(project):
     return graph
 
 
+def graph_edges() -> np.ndarray:
+    """
+    returns the links of the active project as (E, 2) int64 array of node ids (start, end)
+    cached in session_data, so it is parsed once per project
+    """
+    if "edges" not in GD.session_data.keys():
+        links = GD.links.get("links", [])
+        edges = np.zeros((len(links), 2), dtype=np.int64)
+        edges[:, 0] = np.fromiter((int(link["s"]) for link in links), dtype=np.int64, count=len(links))
+        edges[:, 1] = np.fromiter((int(link["e"]) for link in links), dtype=np.int64, count=len(links))
+        GD.session_data["edges"] = edges
+    return GD.session_data["edges"]
+
+
+def graph_csr() -> sp_sp.csr_matrix:
+    """
+    returns the symmetric, unweighted adjacency matrix of the active project (nodes x nodes, labels included)
+    as scipy CSR matrix without self loops and duplicate links, cached in session_data
+    """
+    if "csr" not in GD.session_data.keys():
+        edges = graph_edges()
+        edges = edges[edges[:, 0] != edges[:, 1]]
+        count = len(GD.nodes["nodes"])
+        rows = np.concatenate([edges[:, 0], edges[:, 1]])
+        cols = np.concatenate([edges[:, 1], edges[:, 0]])
+        csr = sp_sp.csr_matrix((np.ones(len(rows), dtype=np.float64), (rows, cols)), shape=(count, count))
+        csr.sum_duplicates()
+        csr.data[:] = 1.0
+        GD.session_data["csr"] = csr
+    return GD.session_data["csr"]
+
+
+def graph_fingerprint() -> str:
+    """returns a hash of node count and links of the active project, changes whenever the graph changes"""
+    if "fingerprint" not in GD.session_data.keys():
+        digest = hashlib.sha1()
+        digest.update(str(len(GD.nodes["nodes"])).encode())
+        digest.update(np.ascontiguousarray(graph_edges()).tobytes())
+        GD.session_data["fingerprint"] = digest.hexdigest()
+    return GD.session_data["fingerprint"]
+
+
+def label_membership(nodes) -> tuple:
+    """
+    returns (label_ids, member_label, member_node) int64 arrays of the label/cluster nodes (nodes with a "group" key):
+    node ids of the labels and per membership the index of the label in label_ids and the id of the member node
+    nodes: list of node dicts as in nodes.json, members in "group" may be str, empty entries are skipped
+    """
+    label_ids, member_label, member_node = [], [], []
+    for node in nodes:
+        if "group" not in node.keys():
+            continue
+        members = [int(member) for member in node["group"] if str(member) != ""]
+        member_label.extend([len(label_ids)] * len(members))
+        member_node.extend(members)
+        label_ids.append(int(node["id"]))
+    return (
+        np.asarray(label_ids, dtype=np.int64),
+        np.asarray(member_label, dtype=np.int64),
+        np.asarray(member_node, dtype=np.int64),
+    )
+
+
+def active_label_membership() -> tuple:
+    # label_membership of the active project, cached in session_data
+    if "labelMembership" not in GD.session_data.keys():
+        GD.session_data["labelMembership"] = label_membership(GD.nodes.get("nodes", []))
+    return GD.session_data["labelMembership"]
+
+
+def label_centroids(positions, membership) -> tuple:
+    """
+    returns (centroids, counts): mean position of the members of every label and the number of members
+    positions: (n, d) array of node positions, membership: see label_membership
+    """
+    label_ids, member_label, member_node = membership
+    positions = np.asarray(positions, dtype=np.float64)
+    sums = np.zeros((len(label_ids), positions.shape[1]))
+    np.add.at(sums, member_label, positions[member_node])
+    counts = np.bincount(member_label, minlength=len(label_ids))
+    return sums / np.maximum(counts, 1)[:, None], counts
+
+
+def place_label_nodes(positions, membership=None) -> np.ndarray:
+    """
+    returns a copy of positions with every label node moved to the centroid of its members
+    membership: optional, default: labels of the active project, labels without members keep their position
+    """
+    if membership is None:
+        membership = active_label_membership()
+    positions = np.array(positions, dtype=np.float64)
+    label_ids = membership[0]
+    if len(label_ids) == 0:
+        return positions
+    centroids, counts = label_centroids(positions, membership)
+    placed = (counts > 0) & (label_ids < len(positions))
+    positions[label_ids[placed]] = centroids[placed]
+    return positions
+
+
+NODE_BUTTON_PAGE_SIZE = 200  # node buttons per makeNodeButton response, panels request further pages on scroll
+
+
+def node_button_page(list_id, ids=None, offset=0, page_size=NODE_BUTTON_PAGE_SIZE, room=None, token=None) -> dict:
+    """
+    returns one page of a node button list as needed by the makeNodeButton response
+    list_id: str, id of the list (e.g. "selectionsDD", "children", "search")
+    ids: list, optional, ordered node ids of the list, replaces the cached list of the room if given
+    offset: int, index of the first node of the page
+    room: str, room of the list, lists are cached per (room, list_id) so rooms do not overwrite each other
+    token: str, optional, token of the list the client is paging through, a page of a replaced list is refused
+    returns: dict with "success", "val" (name, color, id per node), "offset", "pageSize", "total", "cursor" (offset of
+    the next page or None if this is the last page) and "token" of the list
+    or {"success": False, "error": str} if the list is unknown or was replaced since the client got its token
+    """
+    if "nodeButtons" not in GD.session_data.keys():
+        GD.session_data["nodeButtons"] = {}
+    key = (room, list_id)
+    if ids is not None:
+        GD.session_data["nodeButtons"][key] = {"ids": list(ids), "token": uuid.uuid4().hex}
+    cached = GD.session_data["nodeButtons"].get(key)
+    if cached is None or (token is not None and token != cached["token"]):
+        return {"success": False, "error": "The node list " + str(list_id) + " has changed, reload it."}
+    ids = cached["ids"]
+
+    offset = max(0, int(offset))
+    page = []
+    for d in ids[offset : offset + page_size]:
+        node = {}
+        node["name"] = GD.nodes["nodes"][int(d)]["n"]
+        node["color"] = GD.pixel_valuesc[int(d)]
+        node["id"] = d
+        page.append(node)
+
+    cursor = offset + page_size if offset + page_size < len(ids) else None
+    return {
+        "success": True,
+        "val": page,
+        "offset": offset,
+        "pageSize": page_size,
+        "total": len(ids),
+        "cursor": cursor,
+        "token": cached["token"],
+    }
+
+
 def rgb_to_hex(color):
     if len(color) == 3:
         r, g, b = color
@@ -1,3 +1,5 @@
+import threading
+
 import requests
 from flask import Flask, render_template, request, redirect, url_for, session
 from flask_socketio import SocketIO, join_room, leave_room, emit
@@ -14,6 +16,38 @@ class bcolors:
     UNDERLINE = '\033[4m'
 
 
+class EventCoalescer:
+    """
+    Last-value-wins coalescing of high frequency socket events (slider drags, selections from VR controllers).
+    Messages are keyed by (room, message id). The first message of a key schedules a flush one tick later,
+    every further message within that tick only replaces the pending one. On flush the callback
+    flush(room, message) is called once with the latest message, so persisting and broadcasting is capped
+    at 1 / tick per key regardless of how fast clients send.
+    """
+
+    def __init__(self, socketio: SocketIO, flush, tick: float = 1 / 30):
+        self.socketio = socketio
+        self.flush = flush
+        self.tick = tick
+        self._pending = {}  # key: (room, id), value: latest message
+        self._lock = threading.Lock()
+
+    def push(self, room, message):
+        key = (room, message["id"])
+        with self._lock:
+            scheduled = key in self._pending
+            self._pending[key] = message
+        if not scheduled:
+            self.socketio.start_background_task(self._flush_later, key)
+
+    def _flush_later(self, key):
+        self.socketio.sleep(self.tick)
+        with self._lock:
+            message = self._pending.pop(key, None)
+        if message is not None:
+            self.flush(key[0], message)
+
+
 def sendUE4(adress, data):
     # The POST request to our node server
     res = requests.post('http://127.0.0.1:3000/in', json=data)